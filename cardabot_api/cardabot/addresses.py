@@ -0,0 +1,58 @@
+"""Validate bech32 pool ids and stake addresses offline.
+
+Both are bech32 strings (CIP-5) of a binary payload:
+
+    pool id = "pool" + pool key hash (28 bytes)
+    stake address = "stake" / "stake_test" + header (1 byte) + stake credential (28 bytes)
+
+where the header of a stake address (CIP-19) is `1110` (key) or `1111` (script) followed
+by the network id (`0001` mainnet, `0000` testnet).
+"""
+
+import os
+
+from pycardano.crypto.bech32 import Encoding, bech32_decode, convertbits
+
+HASH_SIZE = 28  # bytes, blake2b-224
+
+MAINNET_ID, TESTNET_ID = 1, 0
+NETWORK_ID = (
+    TESTNET_ID if os.environ.get("NETWORK", "").lower() == "testnet" else MAINNET_ID
+)
+
+STAKE_HRPS = {MAINNET_ID: "stake", TESTNET_ID: "stake_test"}
+STAKE_KEY_HEADER, STAKE_SCRIPT_HEADER = 0b1110, 0b1111
+
+
+def decode(bech: str) -> tuple[str, bytes] or tuple[None, None]:
+    """Decode a bech32 string (checksum included).
+
+    Returns:
+        The human readable part and the payload, `(None, None)` if not valid bech32.
+    """
+    hrp, data, spec = bech32_decode(bech)
+    if hrp is None or spec != Encoding.BECH32:
+        return None, None
+
+    payload = convertbits(data, 5, 8, False)
+    if payload is None:
+        return None, None
+    return hrp, bytes(payload)
+
+
+def is_valid_pool_id(pool_id: str) -> bool:
+    """Check that `pool_id` is a well-formed bech32 pool id."""
+    hrp, payload = decode(pool_id)
+    return hrp == "pool" and len(payload) == HASH_SIZE
+
+
+def is_valid_stake_address(stake_addr: str, network_id: int = NETWORK_ID) -> bool:
+    """Check that `stake_addr` is a well-formed stake address of the network."""
+    hrp, payload = decode(stake_addr)
+    if hrp != STAKE_HRPS[network_id] or len(payload) != 1 + HASH_SIZE:
+        return False
+
+    header = payload[0]
+    return header >> 4 in (STAKE_KEY_HEADER, STAKE_SCRIPT_HEADER) and (
+        header & 0x0F == network_id
+    )
@@ -5,5 +5,13 @@ from .models import *
 admin.site.register(CardaBotUser)
 admin.site.register(Chat)
 admin.site.register(UnsignedTransaction)
+admin.site.register(EpochSnapshot)
+admin.site.register(PoolMetadata)
+admin.site.register(StakePoolIndex)
+admin.site.register(CustodyUtxo)
+admin.site.register(SyncCursor)
+admin.site.register(TxData)
+admin.site.register(Claim)
+admin.site.register(TrackedTransaction)
 admin.site.register(FaqCategory)
 admin.site.register(FaqQuestion)
\ No newline at end of file
@@ -1,3 +1,6 @@
+import os
+import sys
+
 from django.apps import AppConfig
 
 class CardabotConfig(AppConfig):
@@ -7,6 +10,29 @@ class CardabotConfig(AppConfig):
     def ready(self):
         """ Loads the scheduler. """
         from datetime import datetime
-        from cardabot_api.cardabot import cron
+        from cardabot_api.cardabot import (
+            chat_cache,  # connects its signals
+            claims,
+            cron,
+            custody,
+            epochs,
+            pay_addresses,
+            pool_index,
+            pool_metadata,
+            refresher,
+            tx_tracker,
+        )
+
+        command = sys.argv[1:2]
+        if os.path.basename(sys.argv[0]) == "manage.py" and command != ["runserver"]:
+            return  # management commands (migrate, createcachetable...) don't sync
 
         cron.reset_cardabot_tmp_token_cron()
+        custody.sync_custody_ledger_cron()
+        claims.process_claims_cron()
+        epochs.sync_epoch_snapshots_cron()
+        pay_addresses.revalidate_pay_addresses_cron()
+        pool_index.sync_stake_pool_index_cron()
+        pool_metadata.prefetch_default_pools_cron()
+        refresher.refresh_read_models_cron()
+        tx_tracker.track_transactions_cron()
@@ -0,0 +1,79 @@
+"""Aggregate the balances of many chats concurrently.
+
+The balance of a chat has two parts (see `ChatIdBalance`):
+    - controlled: balance of the stake address of the connected CardaBot user, from the
+        account totals (one request per stake address, cached for `BALANCE_TTL`).
+    - claimable: lovelace held by the custody wallet for the chat (see `custody.py`).
+
+Controlled balances are requested concurrently (at most `MAX_CONCURRENCY` at once),
+and the claimable ones of all chats are read in a single query.
+"""
+
+import asyncio
+
+from asgiref.sync import sync_to_async
+from django.core.cache import cache
+from django.db.models import Sum
+
+from . import tx
+from .models import CustodyUtxo
+
+BALANCE_TTL = 30  # seconds
+MAX_CONCURRENCY = 10  # concurrent account requests
+
+
+async def _agather(coros, limit: int = MAX_CONCURRENCY) -> list:
+    """Like `asyncio.gather`, but with at most `limit` coroutines running at once."""
+    semaphore = asyncio.Semaphore(limit)
+
+    async def bounded(coro):
+        async with semaphore:
+            return await coro
+
+    return await asyncio.gather(*(bounded(coro) for coro in coros))
+
+
+async def acontrolled_lovelace(stake_addr: str) -> int:
+    """Return the balance (lovelace) of a stake address, cached for `BALANCE_TTL`."""
+    key = f"balance:{stake_addr}"
+    lovelace = await cache.aget(key)
+    if lovelace is None:
+        lovelace = await tx.astake_addr_balance(stake_addr)
+        await cache.aset(key, lovelace, timeout=BALANCE_TTL)
+    return lovelace
+
+
+def claimable_lovelace(chat_ids: list[str]) -> dict[str, int]:
+    """Return the lovelace held by the custody wallet for each chat."""
+    totals = dict(
+        CustodyUtxo.objects.filter(chat_id__in=chat_ids, spent=False)
+        .values("chat_id")
+        .annotate(total=Sum("lovelace"))
+        .values_list("chat_id", "total")
+    )
+    return {chat_id: totals.get(chat_id, 0) for chat_id in chat_ids}
+
+
+async def abalances(stake_keys: dict[str, str or None]) -> dict[str, dict]:
+    """Return the balances (lovelace) of chats.
+
+    Args:
+        stake_keys: chat id -> stake key of the connected user (`None` if any).
+
+    Returns:
+        chat id -> `{"controlled": ..., "claimable": ...}`.
+    """
+    unique = list({key for key in stake_keys.values() if key})
+    controlled, claimable = await asyncio.gather(
+        _agather(acontrolled_lovelace(key) for key in unique),
+        sync_to_async(claimable_lovelace)(list(stake_keys)),
+    )
+    controlled = dict(zip(unique, controlled))
+
+    return {
+        chat_id: {
+            "controlled": controlled.get(stake_key, 0),
+            "claimable": claimable[chat_id],
+        }
+        for chat_id, stake_key in stake_keys.items()
+    }
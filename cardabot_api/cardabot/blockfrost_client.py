@@ -0,0 +1,356 @@
+"""Shared blockfrost client: pooled connections, project rate limits and 429 retries.
+
+Every blockfrost request of the app (both `utils.BlockFrostAPI.api` and
+`tx.ChainContext`) goes through `BLOCKFROST`, which keeps a pool of keep-alive
+connections and respects the project limits (`RATE_LIMIT` requests per second and
+`DAILY_LIMIT` per day) across all workers: tokens are counted in redis, or per
+process (a share of the limits) without it (see `rate_limiter`).
+
+Requests are sent in one of two lanes (`Priority`). Low priority requests (balance
+display and other reads) can only use `LOW_PRIORITY_SHARE` of the limits, so near the
+limit the remaining tokens go to the high priority ones (building, submitting and
+claiming transactions). A 429 response pauses the workers for a while (its
+`Retry-After`, or an exponential backoff) and the request is retried.
+"""
+
+import asyncio
+import math
+import os
+import threading
+import time
+from dataclasses import dataclass
+from datetime import date
+
+import requests
+from asgiref.sync import sync_to_async
+from blockfrost import ApiError, ApiUrls
+from blockfrost.config import USER_AGENT
+from blockfrost.utils import convert_json_to_object
+from django.core.cache import cache, caches
+from django.core.cache.backends.redis import RedisCache
+from requests.adapters import HTTPAdapter
+
+RATE_LIMIT = 10  # requests per second, per project
+DAILY_LIMIT = int(os.environ.get("BLOCKFROST_DAILY_LIMIT", 50_000))  # per project
+LOW_PRIORITY_SHARE = 0.7  # share of the limits usable by low priority requests
+MAX_RETRIES = 4  # on 429 responses
+BACKOFF = 0.5  # seconds, doubled on every retry
+TIMEOUT = (5, 20)  # seconds, connect and read
+POOL_SIZE = 32  # keep-alive connections
+WORKERS = int(os.environ.get("WEB_CONCURRENCY", 1))  # processes sharing the project
+WINDOW_TTL = {"s": 2, "d": 60 * 60 * 25}  # seconds, of the per second/day buckets
+
+
+@dataclass
+class Priority:
+    """Set of possible request lanes."""
+
+    high = "high"  # building, submitting and claiming transactions
+    low = "low"  # balance display and other reads
+
+
+class RateLimited(Exception):
+    """Raised when the daily requests budget of a lane is exhausted."""
+
+
+class RateLimiter:
+    """Token buckets (per second and per day) of this process.
+
+    Each bucket is a counter of the tokens taken in the current window, refilled when
+    the window changes. Buckets aren't shared, so each of the `workers` processes gets
+    its share of the limits (see `SharedRateLimiter`).
+    """
+
+    def __init__(
+        self,
+        rate: int = RATE_LIMIT,
+        daily_limit: int = DAILY_LIMIT,
+        low_priority_share: float = LOW_PRIORITY_SHARE,
+        workers: int = 1,
+    ) -> None:
+        self.rate = max(rate // workers, 1)
+        self.daily_limit = max(daily_limit // workers, 1)
+        self.low_priority_share = low_priority_share
+        self._lock = threading.Lock()
+        self._taken = {}  # window -> tokens taken
+        self._paused_until = 0.0
+
+    def _budget(self, limit: int, priority: str) -> int:
+        if priority == Priority.high:
+            return limit
+        return max(int(limit * self.low_priority_share), 1)
+
+    def _take(self, *windows: str) -> tuple:
+        """Take a token from the bucket of each window.
+
+        Returns:
+            The end of the pause (see `pause`) and the tokens taken in each window.
+        """
+        with self._lock:
+            if len(self._taken) > 2 * len(windows):  # drop the past windows
+                self._taken = {w: self._taken[w] for w in windows if w in self._taken}
+            for window in windows:
+                self._taken[window] = self._taken.get(window, 0) + 1
+            return (self._paused_until, *(self._taken[w] for w in windows))
+
+    def _give_back(self, *windows: str) -> None:
+        """Give back the tokens of a rejected request (see `_take`)."""
+        with self._lock:
+            for window in windows:
+                if window in self._taken:
+                    self._taken[window] -= 1
+
+    def try_acquire(self, priority: str) -> float:
+        """Take a token for a request.
+
+        Returns:
+            0 if the request can be sent, otherwise the seconds to wait before trying
+            again.
+
+        Raises:
+            RateLimited: When the daily budget of the lane is exhausted.
+        """
+        now = time.time()
+        second = int(now)
+        windows = (f"s:{second}", f"d:{date.today()}")
+        paused_until, per_second, per_day = self._take(*windows)
+        if paused_until > now:
+            self._give_back(*windows)
+            return paused_until - now
+
+        if per_second > self._budget(self.rate, priority):
+            self._give_back(*windows)
+            return second + 1 - now
+
+        if per_day > self._budget(self.daily_limit, priority):
+            self._give_back(*windows)
+            raise RateLimited(f"Daily blockfrost budget exhausted ({priority} lane).")
+
+        return 0
+
+    def acquire(self, priority: str) -> None:
+        """Wait for a token for a request (see `try_acquire`)."""
+        while delay := self.try_acquire(priority):
+            time.sleep(delay)
+
+    async def aacquire(self, priority: str) -> None:
+        """Async counterpart of `acquire`."""
+        while delay := await sync_to_async(self.try_acquire, thread_sensitive=False)(
+            priority
+        ):
+            await asyncio.sleep(delay)
+
+    def pause(self, seconds: float) -> None:
+        """Stop sending requests for a while (e.g. after a 429)."""
+        with self._lock:
+            self._paused_until = max(self._paused_until, time.time() + seconds)
+
+
+class SharedRateLimiter(RateLimiter):
+    """Token buckets shared by all workers, counted in redis.
+
+    Counters are only updated with atomic `INCR`/`DECR`, and a token is taken in a
+    single round trip (pipelined). A 429 pauses every worker.
+    """
+
+    def __init__(
+        self,
+        rate: int = RATE_LIMIT,
+        daily_limit: int = DAILY_LIMIT,
+        low_priority_share: float = LOW_PRIORITY_SHARE,
+        prefix: str = "blockfrost:rate",
+    ) -> None:
+        super().__init__(rate, daily_limit, low_priority_share)
+        self.prefix = prefix
+
+    def _key(self, name: str) -> str:
+        return cache.make_key(f"{self.prefix}:{name}")
+
+    @staticmethod
+    def _client():
+        return cache._cache.get_client(write=True)
+
+    def _take(self, *windows: str) -> tuple:
+        pipe = self._client().pipeline()
+        pipe.get(self._key("paused"))
+        for window in windows:
+            pipe.incr(self._key(window))
+            pipe.expire(self._key(window), WINDOW_TTL[window[0]])
+        paused_until, *taken = pipe.execute()
+        return (int(paused_until or 0) / 1000, *taken[::2])
+
+    def _give_back(self, *windows: str) -> None:
+        pipe = self._client().pipeline()
+        for window in windows:
+            pipe.decr(self._key(window))
+            pipe.expire(self._key(window), WINDOW_TTL[window[0]])  # if just expired
+        pipe.execute()
+
+    def pause(self, seconds: float) -> None:
+        """Stop all workers from sending requests for a while (e.g. after a 429)."""
+        self._client().set(
+            self._key("paused"),
+            int((time.time() + seconds) * 1000),  # ms
+            ex=max(1, math.ceil(seconds)),  # redis rejects expire times below 1
+        )
+
+
+def rate_limiter() -> RateLimiter:
+    """Return the limiter of the blockfrost project for this process.
+
+    Only redis counts tokens atomically across workers (the database cache doesn't),
+    otherwise each worker limits its own requests to its share (`WORKERS`).
+    """
+    if isinstance(caches["default"], RedisCache):
+        return SharedRateLimiter()
+    return RateLimiter(workers=WORKERS)
+
+
+def retry_delay(response, attempt: int) -> float:
+    """Return the seconds to wait before retrying a 429 response."""
+    try:
+        return max(0.0, float(response.headers["Retry-After"]))
+    except (KeyError, ValueError):
+        return BACKOFF * 2**attempt
+
+
+class BlockFrostClient:
+    """Blockfrost client for the endpoints used by cardabot and `BlockFrostChainContext`.
+
+    Endpoints have the signatures and return types of `blockfrost.BlockFrostApi` (but
+    `return_type="pandas"`), and failed requests raise `ApiError` as well. Lanes (see
+    `lane`) share the connection pool and the rate limiter.
+    """
+
+    def __init__(
+        self,
+        project_id: str,
+        base_url: str,
+        limiter: RateLimiter = None,
+        priority: str = Priority.low,
+    ) -> None:
+        self.project_id = project_id
+        self.url = f"{base_url}/v0"
+        self.limiter = limiter or rate_limiter()
+        self.priority = priority
+
+        self.session = requests.Session()
+        self.session.mount("https://", HTTPAdapter(pool_maxsize=POOL_SIZE))
+        self.session.headers.update(self.default_headers)
+
+    @property
+    def default_headers(self) -> dict:
+        return {"project_id": self.project_id, "User-Agent": USER_AGENT}
+
+    def lane(self, priority: str) -> "BlockFrostClient":
+        """Return a client sending its requests with `priority` (see `Priority`)."""
+        client = object.__new__(BlockFrostClient)
+        client.__dict__.update({**self.__dict__, "priority": priority})
+        return client
+
+    def _request(self, method: str, path: str, **kwargs) -> requests.Response:
+        for attempt in range(MAX_RETRIES + 1):
+            self.limiter.acquire(self.priority)
+            res = self.session.request(
+                method, f"{self.url}{path}", timeout=TIMEOUT, **kwargs
+            )
+            if res.status_code != 429 or attempt == MAX_RETRIES:
+                break
+            self.limiter.pause(retry_delay(res, attempt))
+
+        if res.status_code != 200:
+            raise ApiError(res)
+        return res
+
+    def _get(
+        self,
+        path: str,
+        return_type: str = "object",
+        gather_pages: bool = False,
+        **params,
+    ):
+        params = {key: value for key, value in params.items() if value is not None}
+        if gather_pages:
+            data, params["page"] = [], params.get("page", 1)
+            while True:
+                items = self._request("GET", path, params=params).json()
+                data += items
+                if len(items) < params.get("count", 100):
+                    break
+                params["page"] += 1
+        else:
+            data = self._request("GET", path, params=params).json()
+
+        return data if return_type == "json" else convert_json_to_object(data)
+
+    def _post_cbor(self, path: str, file_path: str, return_type: str = "object"):
+        with open(file_path, "rb") as file:
+            data = self._request(
+                "POST",
+                path,
+                data=file.read(),
+                headers={"Content-Type": "application/cbor"},
+            ).json()
+        return data if return_type == "json" else convert_json_to_object(data)
+
+    def accounts(self, stake_address: str, **kwargs):
+        return self._get(f"/accounts/{stake_address}", **kwargs)
+
+    def account_addresses(self, stake_address: str, **kwargs):
+        return self._get(f"/accounts/{stake_address}/addresses", **kwargs)
+
+    def account_addresses_total(self, stake_address: str, **kwargs):
+        return self._get(f"/accounts/{stake_address}/addresses/total", **kwargs)
+
+    def address(self, address: str, **kwargs):
+        return self._get(f"/addresses/{address}", **kwargs)
+
+    def address_utxos(self, address: str, **kwargs):
+        return self._get(f"/addresses/{address}/utxos", **kwargs)
+
+    def address_transactions(
+        self, address: str, from_block: str = None, to_block: str = None, **kwargs
+    ):
+        return self._get(
+            f"/addresses/{address}/transactions",
+            **{"from": from_block, "to": to_block},
+            **kwargs,
+        )
+
+    def block_latest(self, **kwargs):
+        return self._get("/blocks/latest", **kwargs)
+
+    def epoch_latest(self, **kwargs):
+        return self._get("/epochs/latest", **kwargs)
+
+    def epoch_latest_parameters(self, **kwargs):
+        return self._get("/epochs/latest/parameters", **kwargs)
+
+    def genesis(self, **kwargs):
+        return self._get("/genesis", **kwargs)
+
+    def pool(self, pool_id: str, **kwargs):
+        return self._get(f"/pools/{pool_id}", **kwargs)
+
+    def transaction(self, hash: str, **kwargs):
+        return self._get(f"/txs/{hash}", **kwargs)
+
+    def transaction_utxos(self, hash: str, **kwargs):
+        return self._get(f"/txs/{hash}/utxos", **kwargs)
+
+    def transaction_metadata(self, hash: str, **kwargs):
+        return self._get(f"/txs/{hash}/metadata", **kwargs)
+
+    def transaction_submit(self, file_path: str, **kwargs):
+        return self._post_cbor("/tx/submit", file_path, **kwargs)
+
+    def transaction_evaluate(self, file_path: str, **kwargs):
+        return self._post_cbor("/utils/txs/evaluate", file_path, **kwargs)
+
+
+BLOCKFROST = BlockFrostClient(
+    os.environ.get("BLOCKFROST_ID"),
+    ApiUrls.testnet.value
+    if os.environ["NETWORK"] == "testnet"
+    else ApiUrls.mainnet.value,
+)
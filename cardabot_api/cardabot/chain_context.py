@@ -0,0 +1,94 @@
+"""Chain context caching the (slowly changing) chain data used to build transactions.
+
+Protocol and genesis parameters can only change at an epoch boundary, so they are
+kept until the end of the epoch (local chain clock, see `chain_time.py`), in memory
+and in the shared cache, for all workers. The tip is kept for a few seconds. Building
+a transaction then only costs the requests of its utxos.
+"""
+
+import time
+from typing import Callable, Dict, List, Union
+
+from django.core.cache import cache
+from pycardano import ChainContext, Network, UTxO
+from pycardano.backend.base import GenesisParameters, ProtocolParameters
+from pycardano.plutus import ExecutionUnits
+
+from .chain_time import CHAIN_TIME
+
+TIP_TTL = 10  # seconds
+
+
+class CachingChainContext(ChainContext):
+    """Wrap a chain context (e.g. `BlockFrostChainContext`), caching its parameters."""
+
+    def __init__(self, context: ChainContext, prefix: str = "chain_context") -> None:
+        self.context = context
+        self.prefix = prefix
+        self._memo = {}  # name -> (expires_at, value)
+
+    def _cached(self, name: str, key: str, ttl: float, fetch: Callable):
+        """Return a value from memory, the shared cache or `fetch`, kept for `ttl`."""
+        now = time.monotonic()
+        expires_at, value = self._memo.get(name, (0, None))
+        if expires_at > now and value is not None:
+            return value
+
+        cache_key = f"{self.prefix}:{name}:{key}"
+        value = cache.get(cache_key)
+        if value is None:
+            value = fetch()
+            cache.set(cache_key, value, timeout=max(int(ttl), 1))
+
+        self._memo[name] = (now + ttl, value)
+        return value
+
+    def _per_epoch(self, name: str, fetch: Callable):
+        epoch = CHAIN_TIME.epoch()
+        return self._cached(name, str(epoch), CHAIN_TIME.remaining_time(), fetch)
+
+    @property
+    def api(self):
+        return self.context.api
+
+    @property
+    def protocol_param(self) -> ProtocolParameters:
+        def fetch():
+            self.context._protocol_param = None  # force a request
+            return self.context.protocol_param
+
+        return self._per_epoch("protocol_param", fetch)
+
+    @property
+    def genesis_param(self) -> GenesisParameters:
+        def fetch():
+            self.context._genesis_param = None  # force a request
+            return self.context.genesis_param
+
+        return self._per_epoch("genesis_param", fetch)
+
+    @property
+    def network(self) -> Network:
+        return self.context.network
+
+    @property
+    def epoch(self) -> int:
+        return CHAIN_TIME.epoch()
+
+    @property
+    def last_block_slot(self) -> int:
+        return self._cached(
+            "last_block_slot",
+            "tip",
+            TIP_TTL,
+            lambda: self.context.last_block_slot,
+        )
+
+    def utxos(self, address: str) -> List[UTxO]:
+        return self.context.utxos(address)
+
+    def submit_tx(self, cbor: Union[bytes, str]):
+        return self.context.submit_tx(cbor)
+
+    def evaluate_tx(self, cbor: Union[bytes, str]) -> Dict[str, ExecutionUnits]:
+        return self.context.evaluate_tx(cbor)
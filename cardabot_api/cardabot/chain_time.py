@@ -0,0 +1,123 @@
+"""Local slot/epoch clock of the Cardano chain.
+
+Slot and epoch numbers are a function of wall-clock time and the genesis parameters
+of the network, so they can be computed without asking the chain.
+"""
+
+import os
+from dataclasses import dataclass
+from datetime import datetime, timedelta, timezone
+
+# time for the data of a finished epoch to become immutable: its last blocks can still
+# be rolled back (up to k = 2160 blocks, ~12h) or not be indexed yet
+SETTLE_DELAY = timedelta(hours=12)
+
+
+@dataclass(frozen=True)
+class Genesis:
+    """Genesis (time) parameters of a Cardano network."""
+
+    system_start: datetime  # start of the Byron era
+    byron_slot_length: int  # seconds
+    byron_epoch_length: int  # slots
+    shelley_start_epoch: int  # first epoch of the Shelley era
+    slot_length: int  # seconds (Shelley onwards)
+    epoch_length: int  # slots (Shelley onwards)
+
+    @property
+    def shelley_start_slot(self) -> int:
+        return self.shelley_start_epoch * self.byron_epoch_length
+
+    @property
+    def shelley_start_time(self) -> datetime:
+        return self.system_start + timedelta(
+            seconds=self.shelley_start_slot * self.byron_slot_length
+        )
+
+
+GENESIS = {
+    "mainnet": Genesis(
+        system_start=datetime(2017, 9, 23, 21, 44, 51, tzinfo=timezone.utc),
+        byron_slot_length=20,
+        byron_epoch_length=21600,
+        shelley_start_epoch=208,
+        slot_length=1,
+        epoch_length=432000,
+    ),
+    "testnet": Genesis(
+        system_start=datetime(2019, 7, 24, 20, 20, 16, tzinfo=timezone.utc),
+        byron_slot_length=20,
+        byron_epoch_length=21600,
+        shelley_start_epoch=74,
+        slot_length=1,
+        epoch_length=432000,
+    ),
+}
+
+
+class ChainTime:
+    """Convert between wall-clock time, slots and epochs (Shelley era onwards)."""
+
+    def __init__(self, genesis: Genesis) -> None:
+        self.genesis = genesis
+
+    @staticmethod
+    def _now() -> datetime:
+        return datetime.now(timezone.utc)
+
+    def slot(self, when: datetime = None) -> int:
+        """Return the absolute slot number at `when` (default: now)."""
+        elapsed = (
+            (when or self._now()) - self.genesis.shelley_start_time
+        ).total_seconds()
+        return self.genesis.shelley_start_slot + int(
+            elapsed // self.genesis.slot_length
+        )
+
+    def epoch_of(self, slot: int) -> int:
+        """Return the epoch number of an absolute slot."""
+        return self.genesis.shelley_start_epoch + (
+            (slot - self.genesis.shelley_start_slot) // self.genesis.epoch_length
+        )
+
+    def slot_in_epoch(self, slot: int) -> int:
+        """Return the position of an absolute slot within its epoch."""
+        return (slot - self.genesis.shelley_start_slot) % self.genesis.epoch_length
+
+    def epoch(self, when: datetime = None) -> int:
+        """Return the epoch number at `when` (default: now)."""
+        return self.epoch_of(self.slot(when))
+
+    def settled(self, epoch: int, when: datetime = None) -> bool:
+        """Check whether an epoch ended `SETTLE_DELAY` before `when` (default: now)."""
+        end = self.epoch_start(epoch + 1)
+        return end + SETTLE_DELAY <= (when or self._now())
+
+    def epoch_start(self, epoch: int) -> datetime:
+        """Return the (UTC) time an epoch started at."""
+        slots = (epoch - self.genesis.shelley_start_epoch) * self.genesis.epoch_length
+        return self.genesis.shelley_start_time + timedelta(
+            seconds=slots * self.genesis.slot_length
+        )
+
+    @property
+    def epoch_duration(self) -> int:
+        """Duration of one epoch, in seconds."""
+        return self.genesis.epoch_length * self.genesis.slot_length
+
+    def remaining_time(self, when: datetime = None) -> float:
+        """Return the seconds left until the end of the epoch at `when` (default: now)."""
+        when = when or self._now()
+        end = self.epoch_start(self.epoch(when)) + timedelta(
+            seconds=self.epoch_duration
+        )
+        return (end - when).total_seconds()
+
+    def progress(self, when: datetime = None) -> float:
+        """Return the elapsed fraction (0 to 1) of the epoch at `when` (default: now)."""
+        return self.slot_in_epoch(self.slot(when)) / self.genesis.epoch_length
+
+
+CHAIN_TIME = ChainTime(
+    GENESIS["testnet" if os.environ["NETWORK"] == "testnet" else "mainnet"]
+)
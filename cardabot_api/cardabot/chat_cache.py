@@ -0,0 +1,86 @@
+"""Read-through cache of the chat lookups (by chat id and client).
+
+Almost every bot command resolves its chat(s) first, so chats are kept in the shared
+cache along with their CardaBot user (and its stake key). Cached chats are invalidated
+by the signals of `Chat` and `CardaBotUser`; bulk updates (`QuerySet.update`) don't send
+signals and must call `invalidate` themselves (see `cron.py`).
+
+Cached chats are versioned per chat id: an invalidation sets a new version, so a chat
+read from the database before it (and stored after it) is never served. Cached chats
+are for reading only, writes must `load_chat` from the database.
+"""
+
+import time
+
+from django.core.cache import cache
+from django.db.models.signals import post_delete, post_save, pre_delete
+from django.dispatch import receiver
+
+from .models import CardaBotUser, Chat
+
+CHAT_TTL = 10 * 60  # seconds, in case an invalidation is missed
+
+
+def _key(chat_id: str, client: str = None) -> str:
+    return f"chat:{chat_id}:{client}"
+
+
+def _version_key(chat_id: str) -> str:
+    return f"chat:{chat_id}:version"
+
+
+def load_chat(chat_id: str, client: str = None) -> Chat:
+    """Return the chat by chat_id and client (if provided) from the database.
+
+    Raises:
+        Chat.DoesNotExist: if the chat is not found.
+    """
+    chats = Chat.objects.select_related("cardabot_user")
+    if client is not None:
+        chats = chats.filter(client=client)
+
+    return chats.get(chat_id=chat_id)
+
+
+def get_chat(chat_id: str, client: str = None) -> Chat:
+    """Return the chat by chat_id and client (if provided), with its CardaBot user.
+
+    Raises:
+        Chat.DoesNotExist: if the chat is not found (not cached).
+    """
+    key, version_key = _key(chat_id, client), _version_key(chat_id)
+    cached = cache.get_many([key, version_key])
+    version = cached.get(version_key)
+    if version is not None and cached.get(key, (None,))[0] == version:
+        return cached[key][1]
+
+    chat = load_chat(chat_id, client)
+    if version is None:  # first lookup (or expired), start a version
+        version = time.time_ns()
+        if not cache.add(version_key, version, CHAT_TTL):
+            return chat  # invalidated meanwhile
+
+    cache.set(key, (version, chat), CHAT_TTL)
+    return chat
+
+
+def invalidate(chat_ids: list[str]) -> None:
+    """Drop the cached lookups of chats (any client)."""
+    version = time.time_ns()
+    cache.set_many(
+        {_version_key(chat_id): version for chat_id in set(chat_ids)}, CHAT_TTL
+    )
+
+
+@receiver(post_save, sender=Chat)
+@receiver(post_delete, sender=Chat)
+def _invalidate_chat(sender, instance: Chat, **kwargs) -> None:
+    invalidate([instance.chat_id])
+
+
+@receiver(post_save, sender=CardaBotUser)
+@receiver(pre_delete, sender=CardaBotUser)  # the chats are unlinked before post_delete
+def _invalidate_user_chats(sender, instance: CardaBotUser, **kwargs) -> None:
+    invalidate(
+        Chat.objects.filter(cardabot_user=instance).values_list("chat_id", flat=True)
+    )
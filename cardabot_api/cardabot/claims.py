@@ -0,0 +1,227 @@
+"""Queue claims of custody funds and pay them out in batches.
+
+Claims (`Claim` rows) are queued by the `claim/` endpoint, which returns a ticket to
+poll. Every `CLAIM_WINDOW` seconds the batcher pays out the pending claims in a single
+transaction from the custody wallet (one output per claim, as many as fit in the max
+tx size, the rest wait for the next window), so claims share the fee and don't race
+for the same custody utxos. A payout spends at most `MAX_INPUTS` custody utxos: the
+rest of the funds of a chat are queued as a new claim, for the next window.
+
+Payouts are valid until a `ttl` slot, and their custody utxos are reserved (`spent_by`
+the payout tx) until the tracker settles the tx (see `tx_tracker.py`): claims of
+confirmed payouts are confirmed, and expired or failed payouts release their utxos,
+so they can be claimed again.
+"""
+
+import logging
+from collections import defaultdict
+from datetime import datetime
+
+from django.core.cache import cache
+from django.db import transaction
+from django.dispatch import receiver
+from pycardano import TransactionOutput
+
+from . import fees, tx, tx_tracker
+from .models import Claim, CustodyUtxo, TrackedTransaction
+from .utils import Scheduler
+
+CLAIM_WINDOW = 30  # seconds
+SIZE_MARGIN = 256  # bytes kept below the max tx size
+MAX_INPUTS = 100  # custody utxos per payout, chats with more are paid in several
+
+
+def enqueue_claim(chat_id: str, receiver_address: str) -> Claim or None:
+    """Queue a claim of the custody funds of a chat.
+
+    Returns:
+        The pending claim of the chat (an already queued one, if any), `None` if the
+        chat doesn't have any funds to claim.
+    """
+    if not CustodyUtxo.objects.filter(chat_id=chat_id, spent=False).exists():
+        return None
+
+    claim, _ = Claim.objects.get_or_create(
+        chat_id=chat_id,
+        status=Claim.PENDING,
+        defaults={"receiver_address": receiver_address},
+    )
+    return claim
+
+
+def _claimable(utxos: list[CustodyUtxo], receiver_address: str, ttl: int) -> bool:
+    """Check whether custody utxos cover the fee and min ada of their payout."""
+    context = tx.ChainContext.context
+    indexes = [utxo.index for utxo in utxos]
+    amount = sum(utxo.lovelace for utxo in utxos)
+    output = TransactionOutput.from_primitive([receiver_address, amount])
+
+    amount -= fees.estimate_fee(context, indexes, [output], ttl=ttl)  # fee on its own
+    return amount >= tx.MIN_CHANGE  # min ada of an output
+
+
+def _set_status(claims: list[Claim], status: str, **fields) -> None:
+    Claim.objects.filter(pk__in=[claim.pk for claim in claims]).update(
+        status=status, **fields
+    )
+
+
+def _batch(claims: list[Claim], ttl: int) -> tuple[dict, list]:
+    """Select the claims of the next payout tx.
+
+    Claims which don't fit in the tx wait for the next window, later (smaller) claims
+    may still fit. Each payout spends at most `MAX_INPUTS` utxos, the largest ones.
+
+    Returns:
+        The selected claims (chat id -> claims, duplicates of a chat share its payout)
+        and their payouts (custody utxos and receiver address), in the same order.
+    """
+    utxos_by_chat = defaultdict(list)
+    for utxo in CustodyUtxo.objects.filter(
+        chat_id__in={claim.chat_id for claim in claims}, spent=False
+    ).order_by("-lovelace"):
+        utxos_by_chat[utxo.chat_id].append(utxo)
+
+    max_size = tx.ChainContext.context.protocol_param.max_tx_size - SIZE_MARGIN
+    batch, payouts = {}, []
+    for claim in claims:
+        if claim.chat_id in batch:
+            batch[claim.chat_id].append(claim)
+            continue
+
+        utxos = utxos_by_chat.get(claim.chat_id, [])[:MAX_INPUTS]
+        if not utxos:
+            _set_status([claim], Claim.FAILED, detail="No funds to claim.")
+            continue
+        if not _claimable(utxos, claim.receiver_address, ttl):
+            _set_status([claim], Claim.FAILED, detail="Funds don't cover the fee.")
+            continue
+
+        candidate = payouts + [(utxos, claim.receiver_address)]
+        size = fees.tx_size(
+            [utxo.index for utxos, _ in candidate for utxo in utxos],
+            [
+                TransactionOutput.from_primitive(
+                    [address, sum(utxo.lovelace for utxo in utxos)]
+                )
+                for utxos, address in candidate
+            ],
+            ttl=ttl,
+        )
+        if size > max_size:
+            continue  # waits for the next window
+
+        batch[claim.chat_id], payouts = [claim], candidate
+
+    return batch, payouts
+
+
+def process_claims() -> int:
+    """Pay out the pending claims (see module docstring).
+
+    Returns:
+        The number of claims paid out.
+    """
+    lock_key = "claims:process:lock"
+    if not cache.add(lock_key, True, timeout=CLAIM_WINDOW * 10):
+        return 0  # another worker is paying out
+
+    try:
+        claims = list(Claim.objects.filter(status=Claim.PENDING).order_by("created_at"))
+        if not claims:
+            return 0
+
+        ttl = tx.payout_ttl()
+        batch, payouts = _batch(claims, ttl)
+        if not payouts:
+            return 0
+
+        signed_tx, amounts = tx.build_payout_transaction(payouts, ttl)
+        try:
+            tx.ChainContext.context.submit_tx(signed_tx.to_cbor())
+        except Exception as e:
+            logging.exception(
+                repr({"message": "Payout tx failed.", "data": {"claims": len(batch)}})
+            )
+            for chat_claims in batch.values():
+                _set_status(chat_claims, Claim.FAILED, detail=repr(e)[:256])
+            return 0
+
+        with transaction.atomic():
+            # reserved until the payout settles (see `settle_payouts`)
+            CustodyUtxo.objects.filter(
+                pk__in=[utxo.pk for utxos, _ in payouts for utxo in utxos]
+            ).update(spent=True, spent_by=str(signed_tx.id))
+            for chat_claims, amount in zip(batch.values(), amounts):
+                _set_status(
+                    chat_claims,
+                    Claim.SUBMITTED,
+                    amount=amount,
+                    tx_id=str(signed_tx.id),
+                )
+            tx_tracker.track_submitted(str(signed_tx.id), ttl=ttl)
+
+        # chats with more than `MAX_INPUTS` utxos: the rest is paid out next window
+        for chat_claims in batch.values():
+            rest = enqueue_claim(
+                chat_claims[0].chat_id, chat_claims[0].receiver_address
+            )
+            if rest is not None:
+                _set_status(
+                    chat_claims,
+                    Claim.SUBMITTED,
+                    detail=f"Partial payout, the rest is claim {rest.ticket}.",
+                )
+    finally:
+        cache.delete(lock_key)
+
+    logging.debug(
+        repr(
+            {
+                "message": "Claims paid out.",
+                "data": {"tx_id": signed_tx.id, "claims": len(batch)},
+            }
+        )
+    )
+    return len(batch)
+
+
+@receiver(tx_tracker.tx_settled)
+def settle_payouts(sender, tx_ids: list[str], status: str, **kwargs) -> None:
+    """Confirm the claims of confirmed payouts, release the expired or failed ones."""
+    claims = Claim.objects.filter(tx_id__in=tx_ids, status=Claim.SUBMITTED)
+    if status == TrackedTransaction.CONFIRMED:
+        claims.update(status=Claim.CONFIRMED)
+        return
+
+    with transaction.atomic():
+        # a payout past its ttl (or rejected) can't spend the utxos anymore
+        released = CustodyUtxo.objects.filter(spent_by__in=tx_ids).update(
+            spent=False, spent_by=None
+        )
+        failed = claims.update(
+            status=Claim.FAILED, detail=f"Payout tx {status.lower()}, claim again."
+        )
+    if not released and not failed:
+        return  # not payouts
+
+    logging.warning(
+        repr(
+            {
+                "message": "Payouts released.",
+                "data": {"txs": len(tx_ids), "utxos": released, "claims": failed},
+            }
+        )
+    )
+
+
+def process_claims_cron():
+    """Pay out the pending claims periodically."""
+
+    Scheduler.queue.add_job(
+        process_claims,
+        "interval",
+        seconds=CLAIM_WINDOW,
+        start_date=datetime.now(),
+        id="process_claims",
+    )
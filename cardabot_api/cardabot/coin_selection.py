@@ -0,0 +1,124 @@
+"""Select the UTxOs (inputs) of a transaction.
+
+UTxOs are fetched concurrently, address by address, in a bounded thread pool, and
+fetching stops as soon as the funds found cover the target a few times over (addresses
+are consumed lazily, so no more address pages are requested either). Inputs are
+then chosen among them with one of the CIP-2 strategies (`Strategy`):
+https://cips.cardano.org/cips/cip2/
+"""
+
+import random
+from concurrent.futures import FIRST_COMPLETED, ThreadPoolExecutor, wait
+from dataclasses import dataclass
+from itertools import islice
+from typing import Callable, Iterable
+
+from pycardano import UTxO
+
+MAX_WORKERS = 8  # concurrent utxo requests (all transactions)
+EARLY_STOP_FACTOR = 3  # stop fetching once funds found >= factor * target
+
+_executor = ThreadPoolExecutor(max_workers=MAX_WORKERS, thread_name_prefix="utxos")
+
+
+@dataclass
+class Strategy:
+    """Set of possible coin selection strategies."""
+
+    largest_first = "largest_first"  # fewest inputs (smallest tx)
+    random_improve = "random_improve"  # change close to the payment, healthier utxo set
+
+
+def lovelace(utxo: UTxO) -> int:
+    """Return the lovelace held by a utxo."""
+    amount = utxo.output.amount
+    return amount if isinstance(amount, int) else amount.coin
+
+
+def fetch_utxos(
+    addresses: Iterable[str], fetch: Callable[[str], list[UTxO]], target: int
+) -> list[UTxO]:
+    """Fetch the utxos of `addresses` (in order) until they cover the target.
+
+    Requests run concurrently in the shared thread pool, at most `MAX_WORKERS` at once.
+    Addresses are consumed lazily (e.g. from a paginator), and no more are requested
+    once the funds found reach `EARLY_STOP_FACTOR * target`.
+
+    Args:
+        addresses: pay addresses in bech32 format.
+        fetch: function returning the utxos of an address.
+        target: lovelace to cover.
+    """
+    addresses = iter(addresses)
+    utxos, total, pending = [], 0, set()
+    try:
+        while True:
+            if total < EARLY_STOP_FACTOR * target:
+                for address in islice(addresses, MAX_WORKERS - len(pending)):
+                    pending.add(_executor.submit(fetch, address))
+
+            if not pending:
+                return utxos
+
+            done, pending = wait(pending, return_when=FIRST_COMPLETED)
+            for future in done:
+                address_utxos = future.result()
+                utxos += address_utxos
+                total += sum(lovelace(utxo) for utxo in address_utxos)
+
+            if total >= EARLY_STOP_FACTOR * target:
+                return utxos
+    finally:
+        for future in pending:
+            future.cancel()
+
+
+def largest_first(utxos: list[UTxO], target: int) -> list[UTxO]:
+    """Select the largest utxos until the target is covered (empty if it can't)."""
+    selected, total = [], 0
+    for utxo in sorted(utxos, key=lovelace, reverse=True):
+        if total >= target:
+            break
+        selected.append(utxo)
+        total += lovelace(utxo)
+
+    return selected if total >= target else []
+
+
+def random_improve(utxos: list[UTxO], target: int) -> list[UTxO]:
+    """Select random utxos until the target is covered, then improve the selection.
+
+    Improvement adds more random utxos while they bring the selected funds closer to
+    twice the target (never above three times), so the change is about the size of the
+    payment (empty if the target can't be covered).
+    """
+    available = random.sample(utxos, len(utxos))
+
+    selected, total = [], 0
+    while total < target and available:
+        utxo = available.pop()
+        selected.append(utxo)
+        total += lovelace(utxo)
+
+    if total < target:
+        return []
+
+    ideal, maximum = 2 * target, 3 * target
+    for utxo in available:
+        candidate = total + lovelace(utxo)
+        if candidate <= maximum and abs(ideal - candidate) < abs(ideal - total):
+            selected.append(utxo)
+            total = candidate
+
+    return selected
+
+
+STRATEGIES = {
+    Strategy.largest_first: largest_first,
+    Strategy.random_improve: random_improve,
+}
+
+
+def select(utxos: list[UTxO], target: int, strategy: str) -> list[UTxO]:
+    """Select the utxos covering `target` lovelace with `strategy` (see `Strategy`)."""
+    return STRATEGIES[strategy](utxos, target)
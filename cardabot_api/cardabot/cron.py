@@ -2,9 +2,14 @@ from cardabot_api.cardabot.models import Chat
 from apscheduler.schedulers.background import BackgroundScheduler
 from datetime import datetime
 from cardabot_api.cardabot.utils import Scheduler
+from cardabot_api.cardabot import chat_cache
 
 def _reset_fn():
-    return Chat.objects.filter(tmp_token__isnull=False).update(tmp_token=None)
+    chats = Chat.objects.filter(tmp_token__isnull=False)
+    chat_ids = list(chats.values_list("chat_id", flat=True))
+    reset = chats.update(tmp_token=None)
+    chat_cache.invalidate(chat_ids)  # bulk updates don't send signals
+    return reset
 
 def reset_cardabot_tmp_token_cron():
     """Reset all chats' temporary tokens."""
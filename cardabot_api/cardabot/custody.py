@@ -0,0 +1,202 @@
+"""Keep the ledger of the utxos held by the custody wallet (`CustodyUtxo` rows).
+
+Tips to non-connected chats are sent to the custody wallet (`CARDABOT_STAKE_KEY`) with
+the receivers' chat ids in a label 674 message, one per custody output (in order). The
+sync job reads the transactions of the custody addresses since the last processed
+block: outputs with such a message are added to the ledger, and ledger utxos used as
+inputs are marked as spent. Claimable balances and claim inputs are then a single
+indexed query.
+
+The last `REORG_MARGIN` blocks are read again on every run and reconciled with the
+ledger first: utxos of rolled back txs are deleted, and utxos spent by rolled back txs
+are unspent (unless reserved by a pending payout, see `claims.py`). The cursor advances
+with every processed tx, so a failed run resumes where it stopped.
+"""
+
+import logging
+import os
+from concurrent.futures import ThreadPoolExecutor
+from datetime import datetime
+
+from django.core.cache import cache
+from django.db import transaction
+
+from . import tx, tx_tracker
+from .models import CustodyUtxo, SyncCursor, TrackedTransaction
+from .utils import Scheduler, iter_items
+
+CURSOR = "custody_ledger"
+REORG_MARGIN = 10  # blocks re-read on every run, in case of a rollback
+SYNC_INTERVAL = 60  # seconds
+MAX_WORKERS = 8  # concurrent tx requests
+
+_executor = ThreadPoolExecutor(max_workers=MAX_WORKERS, thread_name_prefix="custody")
+
+
+def _custody_txs(addresses: set[str], from_block: int, to_block: int) -> dict:
+    """Return the custody transactions in a block range, in chain order.
+
+    Returns:
+        A dict of tx hash -> block height.
+    """
+    txs = {}
+    for address in addresses:
+        for item in iter_items(
+            tx.ChainContext.api.address_transactions,
+            address,
+            from_block=str(from_block),
+            to_block=str(to_block),
+        ):
+            txs[item.tx_hash] = (item.block_height, item.tx_index)
+
+    return {tx_hash: txs[tx_hash][0] for tx_hash in sorted(txs, key=txs.get)}
+
+
+def _tx_data(tx_hash: str) -> tuple:
+    """Return the utxos and the metadata (json) of a transaction (see `tx_cache.py`)."""
+    return (
+        tx.ChainContext.api.transaction_utxos(tx_hash),
+        tx.ChainContext.api.transaction_metadata(tx_hash, return_type="json"),
+    )
+
+
+def _apply_tx(
+    tx_hash: str, block_height: int, utxos, metadata: list, addresses: set[str]
+) -> None:
+    """Add the custody outputs of a tx to the ledger and mark its inputs as spent."""
+    for item in utxos.inputs:
+        if item.address in addresses and not getattr(item, "collateral", False):
+            CustodyUtxo.objects.filter(
+                tx_hash=item.tx_hash, index=item.output_index
+            ).update(spent=True, spent_by=tx_hash, spent_block_height=block_height)
+
+    chat_ids = tx.metadata_chat_ids(metadata)
+    if not chat_ids:
+        return
+
+    outputs = [
+        (index, item)
+        for index, item in enumerate(utxos.outputs)
+        if item.address in addresses
+    ]
+    if len(chat_ids) == 1:
+        chat_ids *= len(outputs)  # a single chat owns all custody outputs
+    elif len(chat_ids) != len(outputs):
+        logging.warning(
+            repr(
+                {
+                    "message": "Custody outputs don't match their chat ids.",
+                    "data": {"tx_hash": tx_hash},
+                }
+            )
+        )
+        return
+
+    for (index, item), chat_id in zip(outputs, chat_ids):
+        if any(amount.unit != "lovelace" for amount in item.amount):
+            continue  # native assets can't be claimed (yet)
+
+        CustodyUtxo.objects.update_or_create(  # its block may change on a rollback
+            tx_hash=tx_hash,
+            index=index,
+            defaults={
+                "chat_id": chat_id,
+                "lovelace": tx.amounts_to_lovelace(item.amount),
+                "block_height": block_height,
+            },
+        )
+
+
+def _reconcile(txs: dict, from_block: int) -> tuple[int, int]:
+    """Undo the ledger changes of the txs since `from_block` no longer on chain.
+
+    Args:
+        txs: the custody txs since `from_block` (see `_custody_txs`).
+
+    Returns:
+        The number of utxos deleted and unspent.
+    """
+    deleted, _ = (
+        CustodyUtxo.objects.filter(block_height__gte=from_block)
+        .exclude(tx_hash__in=txs)
+        .delete()
+    )
+
+    rolled_back = CustodyUtxo.objects.filter(
+        spent_block_height__gte=from_block
+    ).exclude(spent_by__in=txs)
+    # pending payouts keep their utxos reserved, they are released once settled
+    payouts = TrackedTransaction.objects.filter(status__in=tx_tracker.OPEN).values_list(
+        "pk", flat=True
+    )
+    rolled_back.filter(spent_by__in=payouts).update(spent_block_height=None)
+    unspent = rolled_back.update(spent=False, spent_by=None, spent_block_height=None)
+    return deleted, unspent
+
+
+def sync_custody_ledger(
+    stake_addr: str = os.environ.get("CARDABOT_STAKE_KEY"),
+) -> int:
+    """Process the custody transactions since the last processed block.
+
+    Returns:
+        The number of transactions processed.
+    """
+    lock_key = f"{CURSOR}:sync:lock"
+    if not cache.add(lock_key, True, timeout=SYNC_INTERVAL * 10):
+        return 0  # another worker is syncing
+
+    try:
+        cursor, _ = SyncCursor.objects.get_or_create(name=CURSOR)
+        tip = tx.ChainContext.api.block_latest().height
+        from_block = max(cursor.block_height - REORG_MARGIN, 0)
+
+        addresses = set(tx.iter_pay_addr_from_stake_addr(stake_addr))
+        txs = _custody_txs(addresses, from_block, tip)
+        with transaction.atomic():
+            deleted, unspent = _reconcile(txs, from_block)
+        if deleted or unspent:
+            logging.warning(
+                repr(
+                    {
+                        "message": "Custody ledger rolled back.",
+                        "data": {"deleted": deleted, "unspent": unspent},
+                    }
+                )
+            )
+
+        # tx data is requested concurrently, but applied in chain order
+        for (tx_hash, block_height), (utxos, metadata) in zip(
+            txs.items(), _executor.map(_tx_data, txs)
+        ):
+            with transaction.atomic():
+                _apply_tx(tx_hash, block_height, utxos, metadata, addresses)
+                cursor.block_height = block_height
+                cursor.save()
+
+        cursor.block_height = tip
+        cursor.save()
+    finally:
+        cache.delete(lock_key)
+
+    logging.debug(
+        repr(
+            {
+                "message": "Custody ledger synced.",
+                "data": {"txs": len(txs), "block_height": tip},
+            }
+        )
+    )
+    return len(txs)
+
+
+def sync_custody_ledger_cron():
+    """Sync the custody ledger periodically."""
+
+    Scheduler.queue.add_job(
+        sync_custody_ledger,
+        "interval",
+        seconds=SYNC_INTERVAL,
+        start_date=datetime.now(),
+        id="sync_custody_ledger",
+    )
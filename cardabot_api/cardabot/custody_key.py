@@ -0,0 +1,53 @@
+"""Signing key of the CardaBot (custody) wallet.
+
+The key is read from its file (`SKEY`) once, on first use, and then kept in memory.
+It never leaves `SigningKeyHolder`: callers get witnesses, not the key, and the holder
+can't be printed or pickled (e.g. into the cache or a log).
+"""
+
+import os
+import threading
+
+from pycardano import (
+    PaymentSigningKey,
+    PaymentVerificationKey,
+    TransactionBody,
+    VerificationKeyWitness,
+)
+
+
+class SigningKeyHolder:
+    """Lazily load a payment signing key, and sign with it."""
+
+    def __init__(self, path: str) -> None:
+        self._path = path
+        self._lock = threading.Lock()
+        self._sk = None
+        self._vk = None
+
+    def _keys(self) -> tuple[PaymentSigningKey, PaymentVerificationKey]:
+        if self._sk is None:
+            with self._lock:
+                if self._sk is None:
+                    sk = PaymentSigningKey.load(self._path)
+                    self._vk = PaymentVerificationKey.from_signing_key(sk)
+                    self._sk = sk
+        return self._sk, self._vk
+
+    @property
+    def verification_key(self) -> PaymentVerificationKey:
+        return self._keys()[1]
+
+    def witness(self, tx_body: TransactionBody) -> VerificationKeyWitness:
+        """Sign a transaction body, return the witness."""
+        sk, vk = self._keys()
+        return VerificationKeyWitness(vk, sk.sign(tx_body.hash()))
+
+    def __repr__(self) -> str:
+        return f"<{type(self).__name__} {'loaded' if self._sk else 'not loaded'}>"
+
+    def __reduce__(self):
+        raise TypeError("A signing key can't be pickled.")
+
+
+CUSTODY_KEY = SigningKeyHolder(os.environ.get("SKEY"))
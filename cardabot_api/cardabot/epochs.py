@@ -0,0 +1,120 @@
+"""Sync the (immutable) chain data of each epoch into `EpochSnapshot` rows.
+
+Ada pots and protocol params of an epoch are stored as soon as it starts, its block,
+tx and fee counts once it is finished; rows are rewritten until the epoch is settled
+(see `CHAIN_TIME.settled`), and never updated afterwards. Missing epochs are
+backfilled (newest first) a few at a time, so the indexer is never flooded.
+"""
+
+import logging
+from datetime import datetime
+
+from .chain_time import CHAIN_TIME
+from .graphql_client import GRAPHQL
+from .models import EpochSnapshot
+from .utils import Scheduler
+
+FIRST_EPOCH = CHAIN_TIME.genesis.shelley_start_epoch + 1  # first epoch with ada pots
+SYNC_BATCH = 10  # max epochs synced per run (one graphql round trip)
+SYNC_INTERVAL = 60 * 10  # seconds
+
+
+def _start_fields(adaPot: dict, netParams: dict) -> dict:
+    """Return the fields of an epoch fixed at its start."""
+    pots = adaPot["epochs"][0]["adaPots"]
+    params = netParams["epochs"][0]["protocolParams"]
+    return {
+        "treasury": int(pots["treasury"]),
+        "reserves": int(pots["reserves"]),
+        "rewards": int(pots["rewards"]),
+        "utxo": int(pots["utxo"]),
+        "deposits": int(pots["deposits"]),
+        "pot_fees": int(pots["fees"]),
+        "a0": params["a0"],
+        "min_pool_cost": int(params["minPoolCost"]),
+        "min_utxo_value": int(params["minUTxOValue"]),
+        "n_opt": params["nOpt"],
+        "rho": params["rho"],
+        "tau": params["tau"],
+    }
+
+
+def _end_fields(epochDetails: dict) -> dict:
+    """Return the fields of an epoch fixed once it is finished."""
+    details = epochDetails["epochs"][0]
+    return {
+        "blocks": int(details["blocksCount"]),
+        "txs": int(details["transactionsCount"]),
+        "fees": int(details["fees"]),
+    }
+
+
+def epochs_to_sync(this_epoch: int) -> list[int]:
+    """Return the epochs whose row is missing, incomplete or unsettled (newest first)."""
+    finished = set(
+        EpochSnapshot.objects.filter(blocks__isnull=False).values_list(
+            "epoch", flat=True
+        )
+    )
+    missing = [
+        epoch
+        for epoch in range(this_epoch - 1, FIRST_EPOCH - 1, -1)
+        if epoch not in finished or not CHAIN_TIME.settled(epoch)
+    ]
+    if not EpochSnapshot.objects.filter(epoch=this_epoch).exists():
+        missing.insert(0, this_epoch)
+
+    return missing[:SYNC_BATCH]
+
+
+def sync_epoch_snapshots() -> int:
+    """Store the rows of the epochs returned by `epochs_to_sync`.
+
+    Returns:
+        The number of rows stored.
+    """
+    this_epoch = CHAIN_TIME.epoch()
+    epochs = epochs_to_sync(this_epoch)
+    if not epochs:
+        return 0
+
+    queries = []
+    for epoch in epochs:
+        queries += [
+            ("adaPot.graphql", {"epoch": epoch}),
+            ("netParams.graphql", {"epoch": epoch}),
+        ]
+        if epoch < this_epoch:
+            queries.append(("epochDetailsByNumber.graphql", {"number": epoch}))
+    responses = iter(res.get("data") for res in GRAPHQL.batch(queries))
+
+    synced = 0
+    for epoch in epochs:
+        adaPot, netParams = next(responses), next(responses)
+        epochDetails = next(responses) if epoch < this_epoch else None
+        try:
+            fields = _start_fields(adaPot, netParams)
+            if epochDetails is not None:
+                fields.update(_end_fields(epochDetails))
+        except (IndexError, KeyError, TypeError, ValueError):  # not (fully) indexed yet
+            logging.warning(
+                repr({"message": "Epoch data not available.", "data": {"epoch": epoch}})
+            )
+            continue
+
+        EpochSnapshot.objects.update_or_create(epoch=epoch, defaults=fields)
+        synced += 1
+
+    return synced
+
+
+def sync_epoch_snapshots_cron():
+    """Sync the epoch snapshots periodically."""
+
+    Scheduler.queue.add_job(
+        sync_epoch_snapshots,
+        "interval",
+        seconds=SYNC_INTERVAL,
+        start_date=datetime.now(),
+        id="sync_epoch_snapshots",
+    )
@@ -0,0 +1,117 @@
+"""Estimate transaction fees without building (nor signing) the transaction.
+
+The fee only depends on the size of the signed transaction, and for simple payments
+(key witnesses, no scripts nor metadata) that size follows from the number of inputs
+and witnesses and the outputs, as encoded by pycardano:
+
+    transaction = [body, witness set, valid, auxiliary data]
+    body = {0: [input, ...], 1: [output, ...], 2: fee, 3: ttl (optional)}
+    input = [tx hash (32 bytes), index]
+    output = [address, amount]
+    witness set = {0: [[vkey (32 bytes), signature (64 bytes)], ...]}
+
+See the Alonzo CDDL: https://github.com/input-output-hk/cardano-ledger
+"""
+
+from pycardano import ChainContext, TransactionOutput
+from pycardano.utils import fee as min_fee
+
+MAX_FEE = 2**32 - 1  # lovelace, fees are always encoded in at most 5 bytes
+
+
+def _head_size(value: int) -> int:
+    """Size of a CBOR head (major type + argument), e.g. an uint or a length prefix."""
+    if value < 24:
+        return 1
+    if value < 2**8:
+        return 2
+    if value < 2**16:
+        return 3
+    if value < 2**32:
+        return 5
+    return 9
+
+
+def _bytes_size(length: int) -> int:
+    return _head_size(length) + length
+
+
+def _input_size(index: int) -> int:
+    return 1 + _bytes_size(32) + _head_size(index)
+
+
+def _output_size(output: TransactionOutput) -> int:
+    if not isinstance(output.amount, int) or output.datum_hash is not None:
+        return len(output.to_cbor("bytes"))  # not a simple payment
+    return 1 + _bytes_size(len(bytes(output.address))) + _head_size(output.amount)
+
+
+def payment_size(input_indexes: list[int], output: TransactionOutput) -> int:
+    """Return the size (bytes) of the inputs and the output of a payment in a tx."""
+    return sum(_input_size(index) for index in input_indexes) + _output_size(output)
+
+
+def tx_size(
+    input_indexes: list[int],
+    outputs: list[TransactionOutput],
+    witnesses: int = 1,
+    fee: int = MAX_FEE,
+    ttl: int = None,
+) -> int:
+    """Return the size (bytes) of a signed simple payment transaction.
+
+    Args:
+        input_indexes: output index of each input.
+        outputs: outputs of the tx.
+        witnesses: number of (key) witnesses, i.e. of distinct input keys.
+        fee: fee of the tx, defaults to an upper bound of its encoding.
+        ttl: validity limit (slot) of the tx, if any.
+    """
+    body = (
+        1  # map head
+        + 1
+        + _head_size(len(input_indexes))
+        + sum(_input_size(index) for index in input_indexes)
+        + 1
+        + _head_size(len(outputs))
+        + sum(_output_size(output) for output in outputs)
+        + 1
+        + _head_size(fee)
+        + (1 + _head_size(ttl) if ttl is not None else 0)
+    )
+    witness_set = (
+        1
+        + 1
+        + _head_size(witnesses)
+        + witnesses * (1 + _bytes_size(32) + _bytes_size(64))
+    )
+    return 1 + body + witness_set + 1 + 1  # array head, ..., valid, no aux data
+
+
+def estimate_fee(
+    context: ChainContext,
+    input_indexes: list[int],
+    outputs: list[TransactionOutput],
+    witnesses: int = 1,
+    ttl: int = None,
+) -> int:
+    """Return the minimum fee of a signed simple payment transaction (see `tx_size`).
+
+    The outputs amounts are taken as upper bounds (e.g. before subtracting the fee), so
+    the estimate may exceed the exact fee by a few bytes worth of lovelace, never less.
+    """
+    return min_fee(context, tx_size(input_indexes, outputs, witnesses, ttl=ttl))
+
+
+def split_fee(context: ChainContext, fee: int, sizes: list[int]) -> list[int]:
+    """Split the fee of a tx between its payments (see `payment_size`).
+
+    Each payment pays for its own bytes, plus an equal share of the rest (the constant
+    fee and the bytes shared by all payments), so it never pays more than as a tx of
+    its own.
+    """
+    shares = [size * context.protocol_param.min_fee_coefficient for size in sizes]
+    rest = fee - sum(shares)
+    shares = [share + rest // len(sizes) for share in shares]
+    shares[0] += rest % len(sizes)
+    return shares
@@ -1,9 +1,134 @@
+import hashlib
+import json
 import os
 import logging
+from dataclasses import dataclass
+from functools import lru_cache
 from types import NoneType
 from typing import Any
+
+import httpx
+from django.core.cache import cache
+from graphql import Visitor, parse, print_ast, visit
+from graphql.language import (
+    DocumentNode,
+    NameNode,
+    OperationDefinitionNode,
+    OperationType,
+    SelectionSetNode,
+    VariableNode,
+)
 from sgqlc.endpoint.http import HTTPEndpoint
 
+from .chain_time import CHAIN_TIME
+from .singleflight import SINGLE_FLIGHT, request_key
+from .utils import AsyncHTTPPool
+
+
+@dataclass
+class Freshness:
+    """Set of freshness policies for cached graphql responses."""
+
+    IMMUTABLE = "immutable"  # data from settled epochs, never changes
+    EPOCH = "epoch"  # data that only changes at the epoch boundary
+    SLOT = "slot"  # live chain data, changes with every new block
+
+
+# freshness policy of each query file, queries not listed here are never cached
+CACHE_POLICIES = {
+    "epochDetailsByNumber.graphql": Freshness.IMMUTABLE,
+    "netParams.graphql": Freshness.EPOCH,
+    "adaPot.graphql": Freshness.EPOCH,
+    "epochActiveStakeNOpt.graphql": Freshness.EPOCH,
+    "currentEpochTip.graphql": Freshness.SLOT,
+}
+
+SLOT_TTL = 20  # seconds, roughly the average time between two blocks
+
+
+@lru_cache(maxsize=None)
+def _read_query(path: str) -> str:
+    """Read (once) the text of a query file."""
+    with open(path) as f:
+        return f.read()
+
+
+class _Namespacer(Visitor):
+    """Prefix every variable of a graphql document with a namespace."""
+
+    def __init__(self, prefix: str) -> None:
+        super().__init__()
+        self.prefix = prefix
+
+    def enter_variable(self, node: VariableNode, *args) -> VariableNode:
+        return VariableNode(name=NameNode(value=self.prefix + node.name.value))
+
+
+def _namespace(index: int) -> str:
+    """Return the alias/variable prefix of the `index`-th query of a batch."""
+    return f"q{index}_"
+
+
+@lru_cache(maxsize=128)
+def _merge_documents(paths: tuple[str]) -> str:
+    """Merge several query files into a single graphql document.
+
+    Variables and top level fields of the `i`-th query are prefixed with
+    `_namespace(i)`, so queries using the same names do not collide.
+    """
+    variable_definitions, selections, fragments = [], [], {}
+    for i, path in enumerate(paths):
+        document = visit(parse(_read_query(path)), _Namespacer(_namespace(i)))
+        for definition in document.definitions:
+            if not isinstance(definition, OperationDefinitionNode):
+                fragments[definition.name.value] = definition
+                continue
+
+            variable_definitions.extend(definition.variable_definitions or [])
+            for selection in definition.selection_set.selections:
+                name = (selection.alias or selection.name).value
+                selection.alias = NameNode(value=_namespace(i) + name)
+                selections.append(selection)
+
+    operation = OperationDefinitionNode(
+        operation=OperationType.QUERY,
+        name=NameNode(value="batch"),
+        variable_definitions=variable_definitions,
+        directives=[],
+        selection_set=SelectionSetNode(selections=selections),
+    )
+    return print_ast(DocumentNode(definitions=[operation, *fragments.values()]))
+
+
+def _split_response(res: dict, n_queries: int) -> list[dict]:
+    """Split the response of a merged document back into one response per query."""
+    data, errors = res.get("data") or {}, res.get("errors") or []
+
+    responses = []
+    for i in range(n_queries):
+        prefix = _namespace(i)
+        response = {
+            "data": {
+                key[len(prefix) :]: value
+                for key, value in data.items()
+                if key.startswith(prefix)
+            }
+            or None
+        }
+
+        # errors without a path can't be traced back to a query, keep them in all
+        query_errors = [
+            error
+            for error in errors
+            if not error.get("path") or str(error["path"][0]).startswith(prefix)
+        ]
+        if query_errors:
+            response["errors"] = query_errors
+
+        responses.append(response)
+
+    return responses
+
 
 class GraphQLClient:
     def __init__(self, url: str, token: str = "") -> None:
@@ -20,17 +145,133 @@ class GraphQLClient:
         """Request data from a cardano graphql endpoint (EBS).
 
         Query text is obtained from `query_file` stored under the `graphql_queries` dir.
+        Responses are cached following the freshness policy of the query file (see
+        `CACHE_POLICIES`), and concurrent identical requests are sent only once.
         """
-        with open(os.path.join(graphql_queries, query_file)) as f:
-            query = f.read()
+        key = self._cache_key(query_file, variables)
+        res = cache.get(key) if key else None
+        if res is None:
+            res = SINGLE_FLIGHT.do(
+                request_key("graphql", query_file, variables),
+                lambda: self._send(query_file, variables, graphql_queries),
+            )
+            self._cache_set(query_file, variables, res)
+
+        return res
 
+    def _send(self, query_file: str, variables: dict, graphql_queries: str) -> dict:
+        """Send the query to the endpoint, bypassing the cache."""
+        query = _read_query(os.path.join(graphql_queries, query_file))
         return self.endpoint(query, variables)
 
+    def batch(
+        self,
+        queries: list[tuple[str, dict]],
+        graphql_queries: str = "graphql_queries",
+    ) -> list[dict]:
+        """Request several queries from the graphql endpoint in a single round trip.
+
+        Cached responses are reused; the remaining queries are merged into one aliased
+        document (see `_merge_documents`) and the response is split back per query.
+
+        Args:
+            queries: list of (query_file, variables) pairs.
+            graphql_queries (str): name of the dir where the query files are stored.
+
+        Returns:
+            A list with the response of each query, in the same order as `queries`.
+        """
+        keys = [self._cache_key(*query) for query in queries]
+        cached = cache.get_many([key for key in keys if key])
+        responses = [cached.get(key) for key in keys]
+
+        missing = [i for i, res in enumerate(responses) if res is None]
+        if not missing:
+            return responses
+
+        document, variables = self._batch_document(queries, missing, graphql_queries)
+        res = SINGLE_FLIGHT.do(
+            request_key("graphql", document, variables),
+            lambda: self.endpoint(document, variables),
+        )
+
+        for i, query_res in zip(missing, _split_response(res, len(missing))):
+            self._cache_set(*queries[i], query_res)
+            responses[i] = query_res
+
+        return responses
+
+    @staticmethod
+    def _batch_document(
+        queries: list[tuple[str, dict]], indexes: list[int], graphql_queries: str
+    ) -> tuple[str, dict]:
+        """Return the merged document and variables of the queries at `indexes`."""
+        document = _merge_documents(
+            tuple(os.path.join(graphql_queries, queries[i][0]) for i in indexes)
+        )
+        variables = {
+            _namespace(n) + name: value
+            for n, i in enumerate(indexes)
+            for name, value in queries[i][1].items()
+        }
+        return document, variables
+
+    @staticmethod
+    def _cache_key(query_file: str, variables: dict) -> str or None:
+        """Return the cache key of a query file and its variables.
+
+        Returns `None` if the query file has no freshness policy (not cached).
+        """
+        if query_file not in CACHE_POLICIES:
+            return None
+
+        digest = hashlib.sha256(
+            json.dumps(variables, sort_keys=True, default=str).encode()
+        ).hexdigest()
+        return f"graphql:{query_file}:{digest}"
+
+    def _cache_entry(self, query_file: str, variables: dict, res: dict) -> tuple:
+        """Return the cache (key, timeout) of a response, `None` if not cacheable.
+
+        Responses holding errors or no data are never cached.
+        """
+        key = self._cache_key(query_file, variables)
+        if not key:
+            return None
+
+        if res.get("errors") or not res.get("data"):
+            logging.warning(
+                repr({"message": "GraphQL response not cached.", "data": {"key": key}})
+            )
+            return None
+
+        return key, self._timeout(CACHE_POLICIES[query_file], variables)
+
+    def _cache_set(self, query_file: str, variables: dict, res: dict) -> None:
+        """Store a response in the cache, if cacheable."""
+        entry = self._cache_entry(query_file, variables, res)
+        if entry:
+            key, timeout = entry
+            cache.set(key, res, timeout=timeout)
+
+    def _timeout(self, policy: str, variables: dict) -> int or None:
+        """Return how long (seconds) a response can be cached, `None` means forever."""
+        if policy == Freshness.IMMUTABLE:
+            epoch = variables.get("number", variables.get("epoch"))
+            if epoch is not None and CHAIN_TIME.settled(int(epoch)):
+                return None  # settled epoch, never expires
+
+            policy = Freshness.SLOT  # ongoing (or just finished) epoch, still changing
+
+        if policy == Freshness.EPOCH:
+            return max(int(CHAIN_TIME.remaining_time()), 1)
+
+        return SLOT_TTL
+
     @property
     def this_epoch(self) -> int:
-        """Get the Cardano current epoch number."""
-        currentEpochTip = self._caller("currentEpochTip.graphql").get("data")
-        return int(currentEpochTip["cardano"]["currentEpoch"]["number"])
+        """Get the Cardano current epoch number (from the local chain clock)."""
+        return CHAIN_TIME.epoch()
 
     def __call__(self, *args: Any, **kwds: Any) -> dict:
         """Request data from a cardano graphql endpoint (EBS).
@@ -47,4 +288,85 @@ class GraphQLClient:
         return self._caller(*args, **kwds)
 
 
+class AsyncGraphQLClient(GraphQLClient):
+    """Async counterpart of `GraphQLClient`, sharing its cache.
+
+    Requests go through a pooled keep-alive http client (see `utils.AsyncHTTPPool`).
+    """
+
+    def __init__(self, url: str, token: str = "") -> None:
+        super().__init__(url, token)
+        self.pool = AsyncHTTPPool(timeout=httpx.Timeout(30.0, connect=5.0))
+
+    async def _caller(
+        self,
+        query_file: str,
+        variables: dict = {},
+        graphql_queries: str = "graphql_queries",
+    ) -> dict:
+        """Request data from a cardano graphql endpoint (EBS), see `GraphQLClient`."""
+        key = self._cache_key(query_file, variables)
+        res = await cache.aget(key) if key else None
+        if res is None:
+            res = await SINGLE_FLIGHT.ado(
+                request_key("graphql", query_file, variables),
+                lambda: self._send(query_file, variables, graphql_queries),
+            )
+            await self._cache_aset(query_file, variables, res)
+
+        return res
+
+    async def _send(
+        self, query_file: str, variables: dict, graphql_queries: str
+    ) -> dict:
+        """Send the query to the endpoint, bypassing the cache."""
+        query = _read_query(os.path.join(graphql_queries, query_file))
+        return await self._post(query, variables)
+
+    async def _post(self, query: str, variables: dict) -> dict:
+        """Post a graphql document; transport errors are returned as graphql errors."""
+        try:
+            res = await self.pool.client().post(
+                self.url, json={"query": query, "variables": variables}
+            )
+            return res.json()
+        except (httpx.HTTPError, ValueError) as e:
+            logging.error(repr({"message": "GraphQL request failed.", "data": repr(e)}))
+            return {"data": None, "errors": [{"message": repr(e)}]}
+
+    async def batch(
+        self,
+        queries: list[tuple[str, dict]],
+        graphql_queries: str = "graphql_queries",
+    ) -> list[dict]:
+        """Request several queries in a single round trip, see `GraphQLClient.batch`."""
+        keys = [self._cache_key(*query) for query in queries]
+        cached = await cache.aget_many([key for key in keys if key])
+        responses = [cached.get(key) for key in keys]
+
+        missing = [i for i, res in enumerate(responses) if res is None]
+        if not missing:
+            return responses
+
+        document, variables = self._batch_document(queries, missing, graphql_queries)
+        res = await SINGLE_FLIGHT.ado(
+            request_key("graphql", document, variables),
+            lambda: self._post(document, variables),
+        )
+
+        for i, query_res in zip(missing, _split_response(res, len(missing))):
+            await self._cache_aset(*queries[i], query_res)
+            responses[i] = query_res
+
+        return responses
+
+    async def _cache_aset(self, query_file: str, variables: dict, res: dict) -> None:
+        """Store a response in the cache, if cacheable."""
+        entry = self._cache_entry(query_file, variables, res)
+        if entry:
+            key, timeout = entry
+            await cache.aset(key, res, timeout=timeout)
+
+
 GRAPHQL = GraphQLClient(url=os.environ.get("GRAPHQL_URL"))
+ASYNC_GRAPHQL = AsyncGraphQLClient(url=os.environ.get("GRAPHQL_URL"))
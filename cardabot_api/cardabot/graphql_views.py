@@ -1,295 +1,144 @@
-from dataclasses import dataclass
-from datetime import datetime, timedelta
+import hashlib
 
-import requests
-from django.http import Http404
+from django.utils.cache import patch_vary_headers
+from django.utils.http import parse_etags
 from rest_framework import status
 from rest_framework.permissions import IsAuthenticated
 from rest_framework.response import Response
-from rest_framework.views import APIView
 
-from . import utils
-from .graphql_client import GRAPHQL
-from .views import QueryParameters
+from . import read_models, refresher, utils
+from .chain_time import CHAIN_TIME
+from .views import AsyncAPIView, QueryParameters
 
 
-@dataclass
-class Const:
-    """Set of constant variables."""
+def to_currency(data: dict, model: read_models.ReadModel, request) -> dict:
+    """Convert the lovelace fields of a read model payload to the requested currency."""
+    fields = model.lovelace_fields
+    values = utils.values_to_ada(
+        [data[field] for field in fields],
+        request.query_params.get(QueryParameters.currency_format),
+    )
+    return {**data, **dict(zip(fields, values))}
 
-    SLOTS_EPOCH = 432000  # total slots in one epoch
-    EPOCH_DURATION = 5  # days
 
+class ReadModelView(AsyncAPIView):
+    """Serve the latest snapshot of `read_model` (see `refresher.py`).
 
-class Epoch(APIView):
-    """Get information about the Cardano current epoch."""
-
-    permission_classes = (IsAuthenticated,)
-
-    def get(self, request, format=None):
-        # gql queries
-        currentEpochTip = GRAPHQL("currentEpochTip.graphql").get("data")
-        epochInfo = GRAPHQL(
-            "epochInfo.graphql",
-            {"epoch": currentEpochTip["cardano"]["currentEpoch"]["number"]},
-        ).get("data")
-
-        started_at = datetime.fromisoformat(
-            epochInfo["epochs"][0]["startedAt"][:-1]  # remove trailing "Z" timestamp
-        )
-
-        remaining_time = (
-            started_at + timedelta(days=Const.EPOCH_DURATION) - datetime.utcnow()
-        ).total_seconds()
-
-        percentage = (
-            currentEpochTip["cardano"]["tip"]["slotInEpoch"] / Const.SLOTS_EPOCH
-        )
-
-        # fmt: off
-        # convert lovelace values to ada if needed
-        fees_in_epoch, active_stake = utils.values_to_ada(
-            [
-                epochInfo["epochs"][0]["fees"],
-                epochInfo["epochs"][0]["activeStake_aggregate"]["aggregate"]["sum"]["amount"],
-            ],
-            request.query_params.get(QueryParameters.currency_format),
-        )
-
-        response = {
-            "percentage": percentage * 100,
-            "current_epoch": currentEpochTip["cardano"]["currentEpoch"]["number"],
-            "current_slot": currentEpochTip["cardano"]["tip"]["slotNo"],
-            "slot_in_epoch": currentEpochTip["cardano"]["tip"]["slotInEpoch"],
-            "txs_in_epoch": int(epochInfo["epochs"][0]["transactionsCount"]),
-            "fees_in_epoch": fees_in_epoch,
-            "active_stake": active_stake,
-            "n_active_stake_pools": int(epochInfo["stakePools_aggregate"]["aggregate"]["count"]),
-            "remaining_time": remaining_time,
-        }
-        # fmt: on
-
-        return Response({"data": response}, status=status.HTTP_200_OK)
-
-
-class StakePool(APIView):
-    """Get infos from a stake pool."""
+    Responses carry an `ETag` derived from the version of the snapshot (its epoch, tip
+    slot or build time) and a `Cache-Control` max-age matching its freshness (private,
+    as they are only served to authenticated users, and varying with the renderer).
+    Requests
+    whose `If-None-Match` matches get a 304, before any upstream or rendering work (per
+    epoch payloads are matched before the snapshot is even loaded).
+    """
 
     permission_classes = (
         IsAuthenticated,
     )  # only authenticated users can access this view
 
-    def get(self, request, pool_id: str, format=None):
-        """Retrieve info from a stake pool.
-
-        Args:
-            pool_id (path param): stake pool id (BECH32).
-            currency_format (query param): currency format (ADA or LOVELACE).
-
-        Returns:
-            A dict with the query result.
-
-        """
-        epoch = GRAPHQL.this_epoch
-
-        adaSupply = GRAPHQL("adaSupply.graphql").get("data")
-        activeStake = GRAPHQL(
-            "epochActiveStakeNOpt.graphql",
-            variables={"epoch": epoch},
-        ).get("data")
-
-        stakePoolDetails = GRAPHQL(
-            "stakePoolDetails.graphql",
-            variables={"pool": pool_id, "epoch": epoch},
-        ).get("data")
-
-        try:
-            url = stakePoolDetails["stakePools"][0]["url"]
-        except (IndexError, TypeError):  # pool not found
-            raise Http404
-
-        res = requests.get(url)  # get pool metadata
-        metadata = res.json() if res.json() else {}
-
-        # fmt: off
-        stake = stakePoolDetails["stakePools"][0]["activeStake_aggregate"]["aggregate"]["sum"]["amount"]
-        total_stake = activeStake["epochs"][0]["activeStake_aggregate"]["aggregate"]["sum"]["amount"]
-        circulating_supply = adaSupply["ada"]["supply"]["circulating"]
-        n_opt = activeStake["epochs"][0]["protocolParams"]["nOpt"]
-
-        controlled_stake_percentage = (int(stake) / int(total_stake)) * 100
-        saturation = utils.calc_pool_saturation(stake, circulating_supply, n_opt)
-
-        # convert values to ada if needed
-        fixed_cost, pledge, stake = utils.values_to_ada(
-            [
-                stakePoolDetails["stakePools"][0]["fixedCost"], 
-                stakePoolDetails["stakePools"][0]["pledge"],
-                stake,
-            ],
-            request.query_params.get(QueryParameters.currency_format),
+    read_model: read_models.ReadModel = None
+
+    async def get(self, request, format=None, **kwargs):
+        model, args = self.read_model, tuple(kwargs.values())
+
+        if model.per_epoch:
+            epoch = CHAIN_TIME.epoch()
+            etag = self._etag(request, args, str(epoch))
+            if self._not_modified(request, etag):
+                return self._response(None, etag, model.max_age({"epoch": epoch}))
+
+        snapshot = await refresher.latest(model, *args)
+        etag = self._etag(request, args, model.version(snapshot))
+        if self._not_modified(request, etag):
+            return self._response(None, etag, model.max_age(snapshot))
+
+        data = self.payload(to_currency(snapshot["data"], model, request))
+        return self._response({"data": data}, etag, model.max_age(snapshot))
+
+    def payload(self, data: dict) -> dict:
+        """Return the response payload of the snapshot `data`."""
+        return data
+
+    def _etag(self, request, args: tuple, version: str) -> str:
+        """Return the (weak) ETag of a snapshot version, as rendered for `request`."""
+        digest = hashlib.sha256(
+            repr(
+                (
+                    self.read_model.key(*args),
+                    version,
+                    request.query_params.get(QueryParameters.currency_format),
+                    request.accepted_renderer.format,
+                )
+            ).encode()
+        ).hexdigest()
+        return f'W/"{digest[:32]}"'
+
+    @staticmethod
+    def _not_modified(request, etag: str) -> bool:
+        """Check the `If-None-Match` header of the request against `etag`."""
+        etags = parse_etags(request.headers.get("If-None-Match", ""))
+        return "*" in etags or any(
+            e.removeprefix("W/") == etag.removeprefix("W/") for e in etags
         )
 
-        response = {
-            "ticker": metadata.get("ticker", "NOT FOUND."),
-            "name": metadata.get("name", "NOT FOUND."),
-            "description": metadata.get("description", "NOT FOUND."),
-            "homepage": metadata.get("homepage", "NOT FOUND."),
-            "pool_id": stakePoolDetails["stakePools"][0]["id"],
-            "pledge": pledge,
-            "fixed_cost": fixed_cost,
-            "margin": stakePoolDetails["stakePools"][0]["margin"] * 100,
-            "saturation": saturation * 100,  # !TODO: fix
-            "controlled_stake_percentage": controlled_stake_percentage,  # !TODO: fix
-            "active_stake_amount": stake,  # !TODO: fix
-            "delegators_count": int(stakePoolDetails["stakePools"][0]["activeStake_aggregate"]["aggregate"]["count"]),
-            "epoch_blocks_count": int(stakePoolDetails["blocksThisEpoch"][0]["blocks_aggregate"]["aggregate"]["count"]),
-            "lifetime_blocks_count": int(stakePoolDetails["lifetimeBlocks"][0]["blocks_aggregate"]["aggregate"]["count"]),
-        }
-        # fmt: on
-
-        return Response({"data": response}, status=status.HTTP_200_OK)
-
+    @staticmethod
+    def _response(data: dict or None, etag: str, max_age: int) -> Response:
+        if data is None:
+            response = Response(status=status.HTTP_304_NOT_MODIFIED)
+        else:
+            response = Response(data, status=status.HTTP_200_OK)
+        response["ETag"] = etag
+        response["Cache-Control"] = f"private, max-age={max_age}"
+        patch_vary_headers(response, ("Accept", "Authorization"))
+        return response
 
-class NetParams(APIView):
-    """Get network parameters."""
 
-    permission_classes = (
-        IsAuthenticated,
-    )  # only authenticated users can access this view
+class Epoch(ReadModelView):
+    """Get information about the Cardano current epoch."""
 
-    def get(self, request, format=None):
-        epoch = GRAPHQL.this_epoch
-        netParams = GRAPHQL("netParams.graphql", {"epoch": epoch}).get("data")[
-            "epochs"
-        ][0]
-
-        min_pool_cost, min_utxo_value = utils.values_to_ada(
-            [
-                int(netParams["protocolParams"]["minPoolCost"]),
-                int(netParams["protocolParams"]["minUTxOValue"]),
-            ],
-            request.query_params.get(QueryParameters.currency_format),
-        )
+    read_model = read_models.EPOCH
 
-        response = {
-            "a0": netParams["protocolParams"]["a0"],
-            "min_pool_cost": min_pool_cost,
-            "min_utxo_value": min_utxo_value,
-            "n_opt": netParams["protocolParams"]["nOpt"],
-            "rho": netParams["protocolParams"]["rho"],
-            "tau": netParams["protocolParams"]["tau"],
+    def payload(self, data: dict) -> dict:
+        # epoch progress at the tip of the snapshot, so it matches its ETag
+        genesis = CHAIN_TIME.genesis
+        slots_left = genesis.epoch_length - data["slot_in_epoch"]
+        return {
+            "percentage": data["slot_in_epoch"] / genesis.epoch_length * 100,
+            **data,
+            "remaining_time": slots_left * genesis.slot_length,
         }
 
-        return Response({"data": response}, status=status.HTTP_200_OK)
 
+class StakePool(ReadModelView):
+    """Get infos from a stake pool.
 
-class Pots(APIView):
-    """Get pot infos."""
-
-    permission_classes = (
-        IsAuthenticated,
-    )  # only authenticated users can access this view
+    Args:
+        pool_id (path param): stake pool id (BECH32).
+        currency_format (query param): currency format (ADA or LOVELACE).
+    """
 
-    def get(self, request, format=None):
-        epoch = GRAPHQL.this_epoch
-        adaPot = GRAPHQL("adaPot.graphql", {"epoch": epoch}).get("data")["epochs"][0]
-
-        treasury, reserves, fees, rewards, utxo, deposits = utils.values_to_ada(
-            [
-                int(adaPot["adaPots"]["treasury"]),
-                int(adaPot["adaPots"]["reserves"]),
-                int(adaPot["adaPots"]["fees"]),
-                int(adaPot["adaPots"]["rewards"]),
-                int(adaPot["adaPots"]["utxo"]),
-                int(adaPot["adaPots"]["deposits"]),
-            ],
-            request.query_params.get(QueryParameters.currency_format),
-        )
+    read_model = read_models.STAKE_POOL
 
-        response = {
-            "treasury": treasury,
-            "reserves": reserves,
-            "fees": fees,
-            "rewards": rewards,
-            "utxo": utxo,
-            "deposits": deposits,
-        }
 
-        return Response({"data": response}, status=status.HTTP_200_OK)
+class NetParams(ReadModelView):
+    """Get network parameters."""
 
+    read_model = read_models.NETPARAMS
 
-class Netstats(APIView):
-    """Get network stats."""
 
-    permission_classes = (
-        IsAuthenticated,
-    )  # only authenticated users can access this view
+class Pots(ReadModelView):
+    """Get pot infos."""
 
-    def get(self, request, format=None):
-        now = datetime.utcnow()
-        params = {
-            "epoch": GRAPHQL.this_epoch,
-            "time_15m": (now - timedelta(hours=0.25)).strftime("%Y-%m-%dT%H:%M:%SZ"),
-            "time_1h": (now - timedelta(hours=1)).strftime("%Y-%m-%dT%H:%M:%SZ"),
-            "time_24h": (now - timedelta(hours=24)).strftime("%Y-%m-%dT%H:%M:%SZ"),
-        }
-        netstats = GRAPHQL("netstats.graphql", params).get("data")
-
-        s = netstats["epochs"][0]["activeStake_aggregate"]["aggregate"]["sum"]["amount"]
-        stake_percentage = int(s) / int(netstats["ada"]["supply"]["circulating"]) * 100
-
-        max_block_size = netstats["epochs"][0]["protocolParams"]["maxBlockBodySize"]
-        block_size_avg_15m = netstats["blocks_avg_15m"]["aggregate"]["avg"]["size"]
-        block_size_avg_1h = netstats["blocks_avg_1h"]["aggregate"]["avg"]["size"]
-        block_size_avg_24h = netstats["blocks_avg_24h"]["aggregate"]["avg"]["size"]
-
-        response = {
-            "ada_in_circulation": utils.values_to_ada(
-                [int(netstats["ada"]["supply"]["circulating"])],
-                request.query_params.get(QueryParameters.currency_format),
-            )[0],
-            "percentage_in_stake": stake_percentage,
-            "stakepools": int(netstats["stakePools_aggregate"]["aggregate"]["count"]),
-            "delegations": int(
-                netstats["epochs"][0]["activeStake_aggregate"]["aggregate"]["count"]
-            ),
-            "load_15m": block_size_avg_15m / max_block_size * 100,
-            "load_1h": block_size_avg_1h / max_block_size * 100,
-            "load_24h": block_size_avg_24h / max_block_size * 100,
-        }
+    read_model = read_models.POTS
 
-        return Response({"data": response}, status=status.HTTP_200_OK)
 
-class EpochSummary(APIView):
-    """Get epoch summary."""
+class Netstats(ReadModelView):
+    """Get network stats."""
 
-    permission_classes = (
-        IsAuthenticated,
-    )  # only authenticated users can access this view
+    read_model = read_models.NETSTATS
 
-    def get(self, request, format=None):
-        epoch = GRAPHQL.this_epoch - 1
-        epoch_summary = GRAPHQL("epochDetailsByNumber.graphql", {"number": epoch}).get("data")["epochs"][0]
-
-        fees, rewards, reserves, treasury = utils.values_to_ada(
-            [
-                int(epoch_summary["fees"]),
-                int(epoch_summary["adaPots"]["rewards"]),
-                int(epoch_summary["adaPots"]["reserves"]),
-                int(epoch_summary["adaPots"]["treasury"]),
-            ],
-            request.query_params.get(QueryParameters.currency_format),
-        )
 
-        response = {
-            "epoch": epoch,
-            "blocks": epoch_summary["blocksCount"],
-            "txs": epoch_summary["transactionsCount"],
-            "fees": fees,
-            "rewards": rewards,
-            "reserves": reserves,
-            "treasury": treasury,
-        }
+class EpochSummary(ReadModelView):
+    """Get epoch summary."""
 
-        return Response({"data": response}, status=status.HTTP_200_OK)
+    read_model = read_models.EPOCH_SUMMARY
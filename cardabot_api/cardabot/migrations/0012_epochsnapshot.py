@@ -0,0 +1,38 @@
+# Generated by Django 4.0.3 on 2026-10-16 23:05
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ("cardabot", "0011_faqcategory_faqquestion"),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name="EpochSnapshot",
+            fields=[
+                (
+                    "epoch",
+                    models.PositiveIntegerField(primary_key=True, serialize=False),
+                ),
+                ("blocks", models.PositiveIntegerField(null=True)),
+                ("txs", models.PositiveBigIntegerField(null=True)),
+                ("fees", models.PositiveBigIntegerField(null=True)),
+                ("treasury", models.PositiveBigIntegerField()),
+                ("reserves", models.PositiveBigIntegerField()),
+                ("rewards", models.PositiveBigIntegerField()),
+                ("utxo", models.PositiveBigIntegerField()),
+                ("deposits", models.PositiveBigIntegerField()),
+                ("pot_fees", models.PositiveBigIntegerField()),
+                ("a0", models.FloatField()),
+                ("min_pool_cost", models.PositiveBigIntegerField()),
+                ("min_utxo_value", models.PositiveBigIntegerField()),
+                ("n_opt", models.PositiveIntegerField()),
+                ("rho", models.FloatField()),
+                ("tau", models.FloatField()),
+                ("synced_at", models.DateTimeField(auto_now=True)),
+            ],
+        ),
+    ]
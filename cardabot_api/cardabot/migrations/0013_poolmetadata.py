@@ -0,0 +1,35 @@
+# Generated by Django 4.0.3 on 2026-10-16 23:06
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ("cardabot", "0012_epochsnapshot"),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name="PoolMetadata",
+            fields=[
+                (
+                    "id",
+                    models.BigAutoField(
+                        auto_created=True,
+                        primary_key=True,
+                        serialize=False,
+                        verbose_name="ID",
+                    ),
+                ),
+                ("pool_id", models.CharField(max_length=56)),
+                ("metadata_hash", models.CharField(max_length=64)),
+                ("url", models.CharField(max_length=256)),
+                ("metadata", models.JSONField(null=True)),
+                ("fetched_at", models.DateTimeField(auto_now=True)),
+            ],
+            options={
+                "unique_together": {("pool_id", "metadata_hash")},
+            },
+        ),
+    ]
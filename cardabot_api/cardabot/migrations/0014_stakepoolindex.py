@@ -0,0 +1,32 @@
+# Generated by Django 4.0.3 on 2026-10-16 23:08
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ("cardabot", "0013_poolmetadata"),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name="StakePoolIndex",
+            fields=[
+                (
+                    "pool_id",
+                    models.CharField(max_length=56, primary_key=True, serialize=False),
+                ),
+                ("ticker", models.CharField(blank=True, db_index=True, max_length=16)),
+                ("name", models.CharField(blank=True, max_length=256)),
+                ("pledge", models.PositiveBigIntegerField()),
+                ("margin", models.FloatField()),
+                ("fixed_cost", models.PositiveBigIntegerField()),
+                ("active_stake", models.PositiveBigIntegerField()),
+                ("retiring_epoch", models.PositiveIntegerField(null=True)),
+                ("metadata_url", models.CharField(blank=True, max_length=256)),
+                ("metadata_hash", models.CharField(blank=True, max_length=64)),
+                ("epoch", models.PositiveIntegerField()),
+            ],
+        ),
+    ]
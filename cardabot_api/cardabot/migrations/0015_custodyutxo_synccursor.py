@@ -0,0 +1,53 @@
+# Generated by Django 4.0.3 on 2026-10-16 23:13
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ("cardabot", "0014_stakepoolindex"),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name="CustodyUtxo",
+            fields=[
+                (
+                    "id",
+                    models.BigAutoField(
+                        auto_created=True,
+                        primary_key=True,
+                        serialize=False,
+                        verbose_name="ID",
+                    ),
+                ),
+                ("tx_hash", models.CharField(max_length=64)),
+                ("index", models.PositiveIntegerField()),
+                ("chat_id", models.CharField(max_length=256)),
+                ("lovelace", models.PositiveBigIntegerField()),
+                ("spent", models.BooleanField(default=False)),
+                ("block_height", models.PositiveIntegerField()),
+            ],
+        ),
+        migrations.CreateModel(
+            name="SyncCursor",
+            fields=[
+                (
+                    "name",
+                    models.CharField(max_length=32, primary_key=True, serialize=False),
+                ),
+                ("block_height", models.PositiveIntegerField(default=0)),
+            ],
+        ),
+        migrations.AddIndex(
+            model_name="custodyutxo",
+            index=models.Index(
+                fields=["chat_id", "spent"], name="cardabot_cu_chat_id_a9eac4_idx"
+            ),
+        ),
+        migrations.AlterUniqueTogether(
+            name="custodyutxo",
+            unique_together={("tx_hash", "index")},
+        ),
+    ]
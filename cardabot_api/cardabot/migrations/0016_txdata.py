@@ -0,0 +1,34 @@
+# Generated by Django 4.0.3 on 2026-10-16 23:16
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ("cardabot", "0015_custodyutxo_synccursor"),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name="TxData",
+            fields=[
+                (
+                    "id",
+                    models.BigAutoField(
+                        auto_created=True,
+                        primary_key=True,
+                        serialize=False,
+                        verbose_name="ID",
+                    ),
+                ),
+                ("tx_hash", models.CharField(max_length=64)),
+                ("endpoint", models.CharField(max_length=32)),
+                ("data", models.JSONField()),
+                ("created_at", models.DateTimeField(auto_now_add=True)),
+            ],
+            options={
+                "unique_together": {("tx_hash", "endpoint")},
+            },
+        ),
+    ]
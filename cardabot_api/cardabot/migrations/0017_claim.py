@@ -0,0 +1,48 @@
+# Generated by Django 4.0.3 on 2026-10-16 23:21
+
+from django.db import migrations, models
+import uuid
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ("cardabot", "0016_txdata"),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name="Claim",
+            fields=[
+                (
+                    "ticket",
+                    models.UUIDField(
+                        default=uuid.uuid4,
+                        editable=False,
+                        primary_key=True,
+                        serialize=False,
+                    ),
+                ),
+                ("chat_id", models.CharField(max_length=256)),
+                ("receiver_address", models.CharField(max_length=256)),
+                (
+                    "status",
+                    models.CharField(
+                        choices=[
+                            ("PENDING", "Pending"),
+                            ("SUBMITTED", "Submitted"),
+                            ("FAILED", "Failed"),
+                        ],
+                        db_index=True,
+                        default="PENDING",
+                        max_length=16,
+                    ),
+                ),
+                ("amount", models.PositiveBigIntegerField(null=True)),
+                ("tx_id", models.CharField(blank=True, max_length=64, null=True)),
+                ("detail", models.CharField(blank=True, default="", max_length=256)),
+                ("created_at", models.DateTimeField(auto_now_add=True)),
+                ("updated_at", models.DateTimeField(auto_now=True)),
+            ],
+        ),
+    ]
@@ -0,0 +1,31 @@
+# Generated by Django 4.0.3 on 2026-10-16 23:23
+
+from django.db import migrations, models
+import django.db.models.deletion
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ("cardabot", "0017_claim"),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name="unsignedtransaction",
+            name="receiver_chats",
+            field=models.ManyToManyField(
+                blank=True, related_name="bulk_receiver_chat", to="cardabot.chat"
+            ),
+        ),
+        migrations.AlterField(
+            model_name="unsignedtransaction",
+            name="receiver_chat",
+            field=models.ForeignKey(
+                null=True,
+                on_delete=django.db.models.deletion.CASCADE,
+                related_name="receiver_chat",
+                to="cardabot.chat",
+            ),
+        ),
+    ]
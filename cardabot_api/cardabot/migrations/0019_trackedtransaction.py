@@ -0,0 +1,58 @@
+# Generated by Django 4.0.3 on 2026-10-16 23:24
+
+from django.db import migrations, models
+import django.db.models.deletion
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ("cardabot", "0018_unsignedtransaction_receiver_chats"),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name="TrackedTransaction",
+            fields=[
+                (
+                    "tx_id",
+                    models.CharField(max_length=64, primary_key=True, serialize=False),
+                ),
+                (
+                    "status",
+                    models.CharField(
+                        choices=[
+                            ("BUILT", "Built"),
+                            ("SIGNED", "Signed"),
+                            ("SUBMITTED", "Submitted"),
+                            ("IN_BLOCK", "In block"),
+                            ("CONFIRMED", "Confirmed"),
+                            ("EXPIRED", "Expired"),
+                            ("FAILED", "Failed"),
+                        ],
+                        db_index=True,
+                        default="BUILT",
+                        max_length=16,
+                    ),
+                ),
+                ("signed_cbor", models.TextField(blank=True, null=True)),
+                ("block_height", models.PositiveIntegerField(null=True)),
+                ("confirmations", models.PositiveIntegerField(default=0)),
+                ("output_amount", models.PositiveBigIntegerField(null=True)),
+                ("fees", models.PositiveBigIntegerField(null=True)),
+                ("detail", models.CharField(blank=True, default="", max_length=256)),
+                ("created_at", models.DateTimeField(auto_now_add=True)),
+                ("updated_at", models.DateTimeField(auto_now=True)),
+                (
+                    "unsigned_tx",
+                    models.OneToOneField(
+                        blank=True,
+                        null=True,
+                        on_delete=django.db.models.deletion.SET_NULL,
+                        related_name="tracking",
+                        to="cardabot.unsignedtransaction",
+                    ),
+                ),
+            ],
+        ),
+    ]
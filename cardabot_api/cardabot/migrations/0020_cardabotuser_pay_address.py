@@ -0,0 +1,23 @@
+# Generated by Django 4.0.3 on 2026-10-16 23:28
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ("cardabot", "0019_trackedtransaction"),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name="cardabotuser",
+            name="pay_address",
+            field=models.CharField(blank=True, max_length=256, null=True),
+        ),
+        migrations.AddField(
+            model_name="cardabotuser",
+            name="pay_address_updated_at",
+            field=models.DateTimeField(blank=True, null=True),
+        ),
+    ]
@@ -0,0 +1,38 @@
+# Generated by Django 4.0.3 on 2026-10-16 23:39
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ("cardabot", "0020_cardabotuser_pay_address"),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name="custodyutxo",
+            name="spent_by",
+            field=models.CharField(blank=True, db_index=True, max_length=64, null=True),
+        ),
+        migrations.AddField(
+            model_name="trackedtransaction",
+            name="ttl",
+            field=models.PositiveBigIntegerField(blank=True, null=True),
+        ),
+        migrations.AlterField(
+            model_name="claim",
+            name="status",
+            field=models.CharField(
+                choices=[
+                    ("PENDING", "Pending"),
+                    ("SUBMITTED", "Submitted"),
+                    ("CONFIRMED", "Confirmed"),
+                    ("FAILED", "Failed"),
+                ],
+                db_index=True,
+                default="PENDING",
+                max_length=16,
+            ),
+        ),
+    ]
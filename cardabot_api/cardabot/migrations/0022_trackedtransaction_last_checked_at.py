@@ -0,0 +1,18 @@
+# Generated by Django 4.0.3 on 2026-10-16 23:41
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ("cardabot", "0021_payout_settlement"),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name="trackedtransaction",
+            name="last_checked_at",
+            field=models.DateTimeField(blank=True, null=True),
+        ),
+    ]
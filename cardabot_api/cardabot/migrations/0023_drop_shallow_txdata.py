@@ -0,0 +1,18 @@
+from django.db import migrations
+
+
+def drop_transaction_details(apps, schema_editor):
+    """Details cached before `FINAL_DEPTH` (see `tx_cache.py`) may be rolled back."""
+    TxData = apps.get_model("cardabot", "TxData")
+    TxData.objects.filter(endpoint="transaction").delete()
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ("cardabot", "0022_trackedtransaction_last_checked_at"),
+    ]
+
+    operations = [
+        migrations.RunPython(drop_transaction_details, migrations.RunPython.noop),
+    ]
@@ -0,0 +1,18 @@
+# Generated by Django 4.0.3 on 2026-10-16 23:45
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ("cardabot", "0023_drop_shallow_txdata"),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name="custodyutxo",
+            name="spent_block_height",
+            field=models.PositiveIntegerField(blank=True, null=True),
+        ),
+    ]
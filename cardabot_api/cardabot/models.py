@@ -1,3 +1,5 @@
+import uuid
+
 from django.db import models
 from django.dispatch import receiver
 
@@ -5,6 +7,9 @@ from django.dispatch import receiver
 class CardaBotUser(models.Model):
     # https://cips.cardano.org/cips/cip19/#userfacingencoding
     stake_key = models.CharField(max_length=256, unique=True)
+    # first pay address of the stake key, cached (see `pay_addresses.py`)
+    pay_address = models.CharField(max_length=256, null=True, blank=True)
+    pay_address_updated_at = models.DateTimeField(null=True, blank=True)
 
     def __str__(self) -> str:
         return self.stake_key
@@ -65,14 +70,236 @@ class UnsignedTransaction(models.Model):
         Chat, on_delete=models.CASCADE, related_name="sender_chat"
     )
     receiver_chat = models.ForeignKey(
-        Chat, on_delete=models.CASCADE, related_name="receiver_chat"
+        Chat, on_delete=models.CASCADE, related_name="receiver_chat", null=True
+    )  # null for multi-receiver txs, see `receiver_chats`
+    receiver_chats = models.ManyToManyField(
+        Chat, related_name="bulk_receiver_chat", blank=True
     )
-    amount = models.DecimalField(max_digits=17, decimal_places=6)  # up to 45 bi ADA
+    amount = models.DecimalField(max_digits=17, decimal_places=6)  # per receiver (ADA)
     username_receiver = models.CharField(max_length=32, null=True, blank=True)
 
     def __str__(self) -> str:
         return self.tx_id
 
+class EpochSnapshot(models.Model):
+    """
+    Model of the (immutable) chain data of an epoch
+
+    Ada pots and protocol params are fixed at the start of the epoch, block, tx and fee
+    counts once the epoch is finished (they are null while it is ongoing).
+    """
+
+    epoch = models.PositiveIntegerField(primary_key=True)
+
+    # epoch details, values in lovelace
+    blocks = models.PositiveIntegerField(null=True)
+    txs = models.PositiveBigIntegerField(null=True)
+    fees = models.PositiveBigIntegerField(null=True)
+
+    # ada pots, values in lovelace
+    treasury = models.PositiveBigIntegerField()
+    reserves = models.PositiveBigIntegerField()
+    rewards = models.PositiveBigIntegerField()
+    utxo = models.PositiveBigIntegerField()
+    deposits = models.PositiveBigIntegerField()
+    pot_fees = models.PositiveBigIntegerField()
+
+    # protocol params
+    a0 = models.FloatField()
+    min_pool_cost = models.PositiveBigIntegerField()
+    min_utxo_value = models.PositiveBigIntegerField()
+    n_opt = models.PositiveIntegerField()
+    rho = models.FloatField()
+    tau = models.FloatField()
+
+    synced_at = models.DateTimeField(auto_now=True)
+
+    @property
+    def finished(self) -> bool:
+        return self.blocks is not None
+
+    def __str__(self) -> str:
+        return str(self.epoch)
+
+
+class PoolMetadata(models.Model):
+    """
+    Model of the (off-chain) metadata of a stake pool registration
+
+    `metadata` is null when it could not be fetched (retried later).
+    """
+
+    pool_id = models.CharField(max_length=56)  # bech32
+    metadata_hash = models.CharField(max_length=64)
+    url = models.CharField(max_length=256)
+    metadata = models.JSONField(null=True)
+    fetched_at = models.DateTimeField(auto_now=True)
+
+    def __str__(self) -> str:
+        return self.pool_id
+
+    class Meta:
+        unique_together = ("pool_id", "metadata_hash")
+
+
+class StakePoolIndex(models.Model):
+    """
+    Model of a registered stake pool, in the local pool index (see `pool_index.py`)
+    """
+
+    pool_id = models.CharField(max_length=56, primary_key=True)  # bech32
+    ticker = models.CharField(max_length=16, blank=True, db_index=True)
+    name = models.CharField(max_length=256, blank=True)
+    pledge = models.PositiveBigIntegerField()  # lovelace
+    margin = models.FloatField()
+    fixed_cost = models.PositiveBigIntegerField()  # lovelace
+    active_stake = models.PositiveBigIntegerField()  # lovelace
+    retiring_epoch = models.PositiveIntegerField(null=True)
+    metadata_url = models.CharField(max_length=256, blank=True)
+    metadata_hash = models.CharField(max_length=64, blank=True)
+    epoch = models.PositiveIntegerField()  # epoch of the last sync
+
+    @property
+    def retired(self) -> bool:
+        return self.retiring_epoch is not None and self.retiring_epoch <= self.epoch
+
+    def __str__(self) -> str:
+        return self.ticker or self.pool_id
+
+
+class CustodyUtxo(models.Model):
+    """
+    Model of a utxo held by the CardaBot (custody) wallet for a non-connected chat
+
+    Filled from the custody wallet transactions by `custody.py`.
+    """
+
+    tx_hash = models.CharField(max_length=64)
+    index = models.PositiveIntegerField()
+    chat_id = models.CharField(max_length=256)  # receiver, from the tx metadata
+    lovelace = models.PositiveBigIntegerField()
+    spent = models.BooleanField(default=False)
+    # tx spending the utxo (a payout reserves it until it settles, see `claims.py`)
+    spent_by = models.CharField(max_length=64, null=True, blank=True, db_index=True)
+    # block of the spending tx, once in the ledger (reconciled on rollbacks)
+    spent_block_height = models.PositiveIntegerField(null=True, blank=True)
+    block_height = models.PositiveIntegerField()
+
+    def __str__(self) -> str:
+        return f"{self.tx_hash}#{self.index}"
+
+    class Meta:
+        unique_together = ("tx_hash", "index")
+        indexes = [models.Index(fields=["chat_id", "spent"])]
+
+
+class SyncCursor(models.Model):
+    """
+    Model of the progress (last processed block) of a chain sync job
+    """
+
+    name = models.CharField(max_length=32, primary_key=True)
+    block_height = models.PositiveIntegerField(default=0)
+
+    def __str__(self) -> str:
+        return f"{self.name}@{self.block_height}"
+
+
+class TxData(models.Model):
+    """
+    Model of a (write-once) blockfrost response about a confirmed transaction
+
+    See `tx_cache.py`, `data` is the response in json format.
+    """
+
+    tx_hash = models.CharField(max_length=64)
+    endpoint = models.CharField(max_length=32)  # e.g. transaction_metadata
+    data = models.JSONField()
+    created_at = models.DateTimeField(auto_now_add=True)
+
+    def __str__(self) -> str:
+        return f"{self.endpoint}:{self.tx_hash}"
+
+    class Meta:
+        unique_together = ("tx_hash", "endpoint")
+
+
+class Claim(models.Model):
+    """
+    Model of a claim of the custody funds of a chat, paid out in batches (see `claims.py`)
+
+    The `ticket` is returned to the bot, to poll the status of the claim.
+    """
+
+    PENDING, SUBMITTED, CONFIRMED = "PENDING", "SUBMITTED", "CONFIRMED"
+    FAILED = "FAILED"
+    statuses = (
+        (PENDING, "Pending"),
+        (SUBMITTED, "Submitted"),
+        (CONFIRMED, "Confirmed"),
+        (FAILED, "Failed"),
+    )
+
+    ticket = models.UUIDField(primary_key=True, default=uuid.uuid4, editable=False)
+    chat_id = models.CharField(max_length=256)
+    receiver_address = models.CharField(max_length=256)
+    status = models.CharField(
+        max_length=16, choices=statuses, default=PENDING, db_index=True
+    )
+    amount = models.PositiveBigIntegerField(null=True)  # lovelace paid (fee excluded)
+    tx_id = models.CharField(max_length=64, null=True, blank=True)
+    detail = models.CharField(max_length=256, default="", blank=True)  # failure reason
+    created_at = models.DateTimeField(auto_now_add=True)
+    updated_at = models.DateTimeField(auto_now=True)
+
+    def __str__(self) -> str:
+        return f"{self.chat_id}:{self.status}"
+
+
+class TrackedTransaction(models.Model):
+    """
+    Model of the lifecycle of a transaction, from built to confirmed (see `tx_tracker.py`)
+    """
+
+    BUILT, SIGNED, SUBMITTED = "BUILT", "SIGNED", "SUBMITTED"
+    IN_BLOCK, CONFIRMED = "IN_BLOCK", "CONFIRMED"
+    EXPIRED, FAILED = "EXPIRED", "FAILED"
+    statuses = (
+        (BUILT, "Built"),
+        (SIGNED, "Signed"),
+        (SUBMITTED, "Submitted"),
+        (IN_BLOCK, "In block"),
+        (CONFIRMED, "Confirmed"),
+        (EXPIRED, "Expired"),
+        (FAILED, "Failed"),
+    )
+
+    tx_id = models.CharField(max_length=64, primary_key=True)
+    unsigned_tx = models.OneToOneField(
+        UnsignedTransaction,
+        on_delete=models.SET_NULL,
+        null=True,
+        blank=True,
+        related_name="tracking",
+    )  # null for txs built by CardaBot (e.g. claim payouts)
+    status = models.CharField(
+        max_length=16, choices=statuses, default=BUILT, db_index=True
+    )
+    signed_cbor = models.TextField(null=True, blank=True)  # to submit in background
+    ttl = models.PositiveBigIntegerField(null=True, blank=True)  # validity limit (slot)
+    block_height = models.PositiveIntegerField(null=True)
+    confirmations = models.PositiveIntegerField(default=0)
+    output_amount = models.PositiveBigIntegerField(null=True)  # lovelace
+    fees = models.PositiveBigIntegerField(null=True)  # lovelace
+    detail = models.CharField(max_length=256, default="", blank=True)  # failure reason
+    last_checked_at = models.DateTimeField(null=True, blank=True)  # last lookup
+    created_at = models.DateTimeField(auto_now_add=True)
+    updated_at = models.DateTimeField(auto_now=True)
+
+    def __str__(self) -> str:
+        return f"{self.tx_id}:{self.status}"
+
+
 class FaqCategory(models.Model):
     """ Model of the FAQ category """
     category = models.CharField(max_length=30, unique=True)
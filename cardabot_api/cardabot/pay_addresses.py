@@ -0,0 +1,144 @@
+"""Cache the resolution of stake addresses to (their first) pay addresses.
+
+Tips and claims are paid to the first pay address of the receiver's stake address,
+which almost never changes. It is stored on the `CardaBotUser` (warmed in background
+when the wallet connects) and read from there, so transfers don't wait for Blockfrost.
+Stake addresses which aren't CardaBot users (e.g. the CardaBot wallet) are kept in the
+shared cache instead.
+
+Any pay address of a stake address belongs to its wallet, so a stale one is still a
+valid receiver: stored addresses are revalidated in background every `REFRESH_AFTER`.
+"""
+
+import logging
+from concurrent.futures import ThreadPoolExecutor
+from datetime import datetime, timedelta
+
+from django.core.cache import cache
+from django.db.models import F, Q
+from django.utils import timezone
+
+from . import tx
+from .models import CardaBotUser
+from .utils import ApiError, Scheduler
+
+REFRESH_AFTER = timedelta(days=1)
+REVALIDATE_INTERVAL = 10 * 60  # seconds
+REVALIDATE_BATCH = 100  # users revalidated per run
+MAX_WORKERS = 8  # concurrent address requests
+
+_executor = ThreadPoolExecutor(max_workers=MAX_WORKERS, thread_name_prefix="pay_addr")
+
+
+def _resolve(stake_addr: str) -> str or None:
+    """Request the first pay address, `None` if the stake address isn't on chain yet."""
+    try:
+        return tx.get_pay_addr_from_stake_addr(stake_addr)
+    except ApiError as e:
+        if e.status_code == 404:
+            return None
+        raise
+
+
+def _store(stake_addrs: dict[str, str or None]) -> None:
+    """Store the resolved pay addresses (stake address -> pay address)."""
+    now = timezone.now()
+    users = list(CardaBotUser.objects.filter(stake_key__in=stake_addrs))
+    for user in users:
+        user.pay_address = stake_addrs[user.stake_key]
+        user.pay_address_updated_at = now
+    CardaBotUser.objects.bulk_update(users, ["pay_address", "pay_address_updated_at"])
+
+    for stake_addr in set(stake_addrs) - {user.stake_key for user in users}:
+        if stake_addrs[stake_addr] is not None:
+            cache.set(
+                f"pay_addr:{stake_addr}",
+                stake_addrs[stake_addr],
+                REFRESH_AFTER.total_seconds(),
+            )
+
+
+def warm(stake_addr: str) -> str or None:
+    """Resolve and store the pay address of a stake address, e.g. when it connects."""
+    pay_addr = _resolve(stake_addr)
+    _store({stake_addr: pay_addr})
+    return pay_addr
+
+
+def get_pay_addrs(stake_addrs: list[str]) -> dict[str, str or None]:
+    """Return the first pay address of each stake address.
+
+    Stored addresses are read from the database (or the cache), only the missing ones
+    are requested (concurrently) and stored.
+    """
+    stake_addrs = list(dict.fromkeys(stake_addrs))  # unique, in order
+    pay_addrs = dict(
+        CardaBotUser.objects.filter(
+            stake_key__in=stake_addrs, pay_address__isnull=False
+        ).values_list("stake_key", "pay_address")
+    )
+    missing = [addr for addr in stake_addrs if addr not in pay_addrs]
+    cached = cache.get_many([f"pay_addr:{addr}" for addr in missing])
+    for addr in missing:
+        if f"pay_addr:{addr}" in cached:
+            pay_addrs[addr] = cached[f"pay_addr:{addr}"]
+
+    missing = [addr for addr in missing if addr not in pay_addrs]
+    if missing:
+        resolved = dict(zip(missing, _executor.map(_resolve, missing)))
+        _store(resolved)
+        pay_addrs.update(resolved)
+
+    return {addr: pay_addrs[addr] for addr in stake_addrs}
+
+
+def get_pay_addr(stake_addr: str) -> str or None:
+    """Return the first pay address of a stake address (see `get_pay_addrs`)."""
+    return get_pay_addrs([stake_addr])[stake_addr]
+
+
+def revalidate() -> int:
+    """Resolve again the stale (or missing) pay addresses of the CardaBot users.
+
+    Returns:
+        The number of users revalidated.
+    """
+    lock_key = "pay_addresses:lock"
+    if not cache.add(lock_key, True, timeout=REVALIDATE_INTERVAL):
+        return 0  # another worker is revalidating
+
+    try:
+        stale_before = timezone.now() - REFRESH_AFTER
+        stake_addrs = list(
+            CardaBotUser.objects.filter(
+                Q(pay_address_updated_at__lt=stale_before)
+                | Q(pay_address_updated_at__isnull=True)
+            )
+            .order_by(F("pay_address_updated_at").asc(nulls_first=True))
+            .values_list("stake_key", flat=True)[:REVALIDATE_BATCH]
+        )
+        _store(dict(zip(stake_addrs, _executor.map(_resolve, stake_addrs))))
+    finally:
+        cache.delete(lock_key)
+
+    logging.debug(
+        repr(
+            {
+                "message": "Pay addresses revalidated.",
+                "data": {"users": len(stake_addrs)},
+            }
+        )
+    )
+    return len(stake_addrs)
+
+
+def revalidate_pay_addresses_cron():
+    """Revalidate the stored pay addresses periodically."""
+
+    Scheduler.queue.add_job(
+        revalidate,
+        "interval",
+        seconds=REVALIDATE_INTERVAL,
+        start_date=datetime.now(),
+        id="revalidate_pay_addresses",
+    )
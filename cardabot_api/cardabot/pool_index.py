@@ -0,0 +1,194 @@
+"""Keep a local index of all registered stake pools (`StakePoolIndex` rows).
+
+Pool parameters and active stake change (at most) once per epoch, so they are synced
+from graphql once per epoch, a page of pools per query. Right after the epoch boundary
+the indexer may not have the new active stake yet (all zero): the epoch is then synced
+again on the next run, and the previous stake is kept meanwhile.
+
+Tickers and names come from the pool metadata (see `pool_metadata.py`), fetched
+incrementally: only registrations whose metadata was never fetched, `METADATA_BATCH`
+at a time.
+"""
+
+import asyncio
+import logging
+from datetime import datetime
+
+from asgiref.sync import async_to_sync
+from django.core.cache import cache
+from django.db import transaction
+from django.db.models import Max, Q
+from django.utils import timezone
+
+from . import pool_metadata
+from .chain_time import CHAIN_TIME
+from .graphql_client import GRAPHQL
+from .models import PoolMetadata, StakePoolIndex
+from .utils import Scheduler
+
+PAGE_SIZE = 500  # pools per graphql query
+METADATA_BATCH = 500  # max metadata fetched per run
+METADATA_CONCURRENCY = 20
+SYNC_INTERVAL = 60 * 60  # seconds
+SYNC_FIELDS = (
+    "pledge",
+    "margin",
+    "fixed_cost",
+    "active_stake",
+    "retiring_epoch",
+    "metadata_url",
+    "metadata_hash",
+    "epoch",
+)
+
+
+def _fetch_pools(epoch: int) -> dict:
+    """Return the registered pools (by pool id) with their params and active stake."""
+    pools, offset = {}, 0
+    while True:
+        res = GRAPHQL(
+            "stakePoolIndex.graphql",
+            {"epoch": epoch, "limit": PAGE_SIZE, "offset": offset},
+        )
+        page = res.get("data")["stakePools"]
+        for pool in page:
+            pools[pool["id"]] = pool
+
+        if len(page) < PAGE_SIZE:
+            return pools
+        offset += PAGE_SIZE
+
+
+def _active_stake(pool: dict) -> int:
+    """Return the active stake of a pool from its graphql data (0 if none)."""
+    return int(pool["activeStake_aggregate"]["aggregate"]["sum"]["amount"] or 0)
+
+
+def _sync_fields(pool: dict, epoch: int) -> dict:
+    """Return the index fields of a pool from its graphql data."""
+    retirements = [r["inEffectFrom"] for r in pool.get("retirements") or []]
+    return {
+        "pledge": int(pool["pledge"]),
+        "margin": pool["margin"],
+        "fixed_cost": int(pool["fixedCost"]),
+        "active_stake": _active_stake(pool),
+        "retiring_epoch": max(retirements) if retirements else None,
+        "metadata_url": pool.get("url") or "",
+        "metadata_hash": pool.get("metadataHash") or "",
+        "epoch": epoch,
+    }
+
+
+@transaction.atomic
+def _store_pools(pools: dict, epoch: int) -> None:
+    """Insert the new pools and update the existing ones."""
+    existing = StakePoolIndex.objects.in_bulk(list(pools))
+    created, updated = [], []
+    for pool_id, pool in pools.items():
+        fields = _sync_fields(pool, epoch)
+        row = existing.get(pool_id)
+        if row is None:
+            created.append(StakePoolIndex(pool_id=pool_id, **fields))
+            continue
+
+        for field, value in fields.items():
+            setattr(row, field, value)
+        updated.append(row)
+
+    StakePoolIndex.objects.bulk_create(created, batch_size=PAGE_SIZE)
+    StakePoolIndex.objects.bulk_update(updated, SYNC_FIELDS, batch_size=PAGE_SIZE)
+
+
+def _fetch_missing_metadata() -> None:
+    """Fetch the metadata of the indexed pools never fetched (or failed a while ago)."""
+    fetched = set(
+        PoolMetadata.objects.filter(
+            Q(metadata__isnull=False)
+            | Q(fetched_at__gt=timezone.now() - pool_metadata.RETRY_AFTER)
+        ).values_list("pool_id", "metadata_hash")
+    )
+    missing = [
+        (pool_id, url, metadata_hash)
+        for pool_id, url, metadata_hash in StakePoolIndex.objects.exclude(
+            metadata_url=""
+        )
+        .exclude(metadata_hash="")
+        .values_list("pool_id", "metadata_url", "metadata_hash")
+        if (pool_id, metadata_hash) not in fetched
+    ][:METADATA_BATCH]
+
+    async def fetch_all():
+        semaphore = asyncio.Semaphore(METADATA_CONCURRENCY)
+
+        async def fetch(pool_id: str, url: str, metadata_hash: str):
+            async with semaphore:
+                await pool_metadata.get_metadata(pool_id, url, metadata_hash)
+
+        await asyncio.gather(*(fetch(*pool) for pool in missing))
+
+    if missing:
+        async_to_sync(fetch_all)()
+
+
+def _apply_metadata() -> None:
+    """Copy tickers and names from the stored pool metadata to the index."""
+    metadata = {
+        (pool_id, metadata_hash): data
+        for pool_id, metadata_hash, data in PoolMetadata.objects.filter(
+            metadata__isnull=False
+        ).values_list("pool_id", "metadata_hash", "metadata")
+    }
+
+    updated = []
+    for row in StakePoolIndex.objects.only(
+        "pool_id", "metadata_hash", "ticker", "name"
+    ):
+        data = metadata.get((row.pool_id, row.metadata_hash)) or {}
+        ticker, name = data.get("ticker", "")[:16], data.get("name", "")[:256]
+        if (ticker, name) != (row.ticker, row.name):
+            row.ticker, row.name = ticker, name
+            updated.append(row)
+
+    StakePoolIndex.objects.bulk_update(
+        updated, ("ticker", "name"), batch_size=PAGE_SIZE
+    )
+
+
+def sync_stake_pool_index() -> None:
+    """Sync the pool index: params once per epoch, then the missing metadata."""
+    lock_key = "pool_index:sync:lock"
+    if not cache.add(lock_key, True, timeout=SYNC_INTERVAL):
+        return  # another worker is syncing
+
+    try:
+        epoch = CHAIN_TIME.epoch()
+        if StakePoolIndex.objects.aggregate(Max("epoch"))["epoch__max"] != epoch:
+            pools = _fetch_pools(epoch)
+            if any(_active_stake(pool) for pool in pools.values()):
+                _store_pools(pools, epoch)
+            else:  # the indexer is still computing it, not synced until then
+                logging.warning(
+                    repr(
+                        {
+                            "message": "No active stake yet, pool index not synced.",
+                            "data": {"epoch": epoch},
+                        }
+                    )
+                )
+
+        _fetch_missing_metadata()
+        _apply_metadata()
+    finally:
+        cache.delete(lock_key)
+
+
+def sync_stake_pool_index_cron():
+    """Sync the stake pool index periodically."""
+
+    Scheduler.queue.add_job(
+        sync_stake_pool_index,
+        "interval",
+        seconds=SYNC_INTERVAL,
+        start_date=datetime.now(),
+        id="sync_stake_pool_index",
+    )
@@ -0,0 +1,147 @@
+"""Fetch and store the (off-chain) metadata of stake pools.
+
+Metadata is fetched from the pool operator's web server once per registration
+(pool id + metadata hash) and stored in `PoolMetadata` rows. Requests are bounded by
+strict timeouts and a size cap, so a slow or broken server can't hold a worker; failed
+fetches are stored too and only retried after `RETRY_AFTER`.
+"""
+
+import asyncio
+import json
+import logging
+from datetime import datetime, timedelta
+
+import httpx
+from asgiref.sync import async_to_sync, sync_to_async
+from django.utils import timezone
+
+from .graphql_client import GRAPHQL
+from .models import Chat, PoolMetadata
+from .singleflight import SINGLE_FLIGHT, request_key
+from .utils import AsyncHTTPPool, Scheduler
+
+MAX_SIZE = 512  # bytes, max size of pool metadata (CIP-6)
+FETCH_TIMEOUT = 5  # seconds, for the whole request
+RETRY_AFTER = timedelta(hours=6)  # before fetching a failed url again
+PREFETCH_INTERVAL = 60 * 60  # seconds
+FIELDS = ("ticker", "name", "description", "homepage")
+
+http = AsyncHTTPPool(
+    follow_redirects=True,
+    timeout=httpx.Timeout(3.0, connect=2.0),
+    limits=httpx.Limits(max_connections=20, max_keepalive_connections=5),
+)
+
+
+async def _fetch(url: str) -> dict or None:
+    """Fetch the metadata at `url`, `None` if it fails (slow, too large, invalid)."""
+
+    async def read() -> bytes:
+        body = b""
+        async with http.client().stream("GET", url) as res:
+            res.raise_for_status()
+            async for chunk in res.aiter_bytes():
+                body += chunk
+                if len(body) > MAX_SIZE:
+                    raise ValueError(f"Metadata larger than {MAX_SIZE} bytes.")
+        return body
+
+    try:
+        metadata = json.loads(await asyncio.wait_for(read(), FETCH_TIMEOUT))
+        if not isinstance(metadata, dict):
+            raise ValueError("Metadata is not a json object.")
+    except (httpx.HTTPError, asyncio.TimeoutError, ValueError) as e:
+        logging.warning(
+            repr(
+                {
+                    "message": "Pool metadata not available.",
+                    "data": {"url": url, "error": repr(e)},
+                }
+            )
+        )
+        return None
+
+    return {
+        field: metadata[field]
+        for field in FIELDS
+        if isinstance(metadata.get(field), str)
+    }
+
+
+@sync_to_async
+def _stored(pool_id: str, metadata_hash: str) -> PoolMetadata or None:
+    return PoolMetadata.objects.filter(
+        pool_id=pool_id, metadata_hash=metadata_hash
+    ).first()
+
+
+@sync_to_async
+def _store(pool_id: str, metadata_hash: str, url: str, metadata: dict or None) -> None:
+    PoolMetadata.objects.update_or_create(
+        pool_id=pool_id,
+        metadata_hash=metadata_hash,
+        defaults={"url": url, "metadata": metadata},
+    )
+
+
+def _is_fresh(stored: PoolMetadata) -> bool:
+    """Stored metadata never expires, failed fetches after `RETRY_AFTER`."""
+    return stored.metadata is not None or (
+        timezone.now() - stored.fetched_at < RETRY_AFTER
+    )
+
+
+async def get_metadata(pool_id: str, url: str, metadata_hash: str) -> dict:
+    """Return the metadata of a pool registration (empty if not available).
+
+    Args:
+        pool_id (str): stake pool id (BECH32).
+        url (str): metadata url of the pool registration.
+        metadata_hash (str): metadata hash of the pool registration.
+    """
+    stored = await _stored(pool_id, metadata_hash)
+    if stored is not None and _is_fresh(stored):
+        return stored.metadata or {}
+
+    async def fetch_and_store() -> dict or None:
+        metadata = await _fetch(url)
+        await _store(pool_id, metadata_hash, url, metadata)
+        return metadata
+
+    metadata = await SINGLE_FLIGHT.ado(
+        request_key("pool_metadata", pool_id, metadata_hash), fetch_and_store
+    )
+    return metadata or {}
+
+
+def prefetch_default_pools() -> None:
+    """Fetch the metadata of the chats' default pools, if not stored yet."""
+    pool_ids = list(Chat.objects.values_list("default_pool_id", flat=True).distinct())
+    if not pool_ids:
+        return
+
+    res = GRAPHQL("poolMetadataRefs.graphql", {"pools": pool_ids})
+    pools = (res.get("data") or {}).get("stakePools") or []
+
+    async def prefetch():
+        await asyncio.gather(
+            *(
+                get_metadata(pool["id"], pool["url"], pool["metadataHash"])
+                for pool in pools
+                if pool.get("url") and pool.get("metadataHash")
+            )
+        )
+
+    async_to_sync(prefetch)()
+
+
+def prefetch_default_pools_cron():
+    """Prefetch the metadata of the chats' default pools periodically."""
+
+    Scheduler.queue.add_job(
+        prefetch_default_pools,
+        "interval",
+        seconds=PREFETCH_INTERVAL,
+        start_date=datetime.now(),
+        id="prefetch_pool_metadata",
+    )
@@ -0,0 +1,156 @@
+"""Metrics of all stake pools, computed in one vectorized pass (NumPy).
+
+Metrics are computed from column arrays of the local pool index (`StakePoolIndex`)
+and the ada pots/protocol params of the current epoch (`EpochSnapshot`), then kept in
+memory until the next epoch (or `REBUILD_INTERVAL`, for late index syncs).
+
+ROA estimates follow the Shelley reward formula (see the Shelley delegation design
+spec, section 5.5.3), assuming every pool produces its expected blocks and meets its
+declared pledge.
+"""
+
+import threading
+import time
+from dataclasses import dataclass
+
+import numpy as np
+
+from .chain_time import CHAIN_TIME
+from .models import EpochSnapshot, StakePoolIndex
+
+MAX_SUPPLY = 45_000_000_000_000_000  # lovelace
+REBUILD_INTERVAL = 60 * 10  # seconds
+
+
+@dataclass
+class SortKeys:
+    """Set of possible leaderboard sort keys."""
+
+    roa = "roa"
+    active_stake = "active_stake"
+    saturation = "saturation"
+    stake_share = "stake_share"
+
+
+class PoolMetrics:
+    """Column arrays of pool data and their derived metrics (one entry per pool)."""
+
+    def __init__(self, pools: list[tuple], snapshot: EpochSnapshot) -> None:
+        self.epoch = snapshot.epoch
+        self.built_at = time.monotonic()
+
+        pool_ids, tickers, names, stake, pledge, margin, fixed_cost = (
+            zip(*pools) if pools else ((),) * 7
+        )
+        self.pool_ids = np.array(pool_ids, dtype=object)
+        self.tickers = np.array(tickers, dtype=object)
+        self.names = np.array(names, dtype=object)
+        self.active_stake = np.array(stake, dtype=np.float64)
+        self.pledge = np.array(pledge, dtype=np.float64)
+        self.margin = np.array(margin, dtype=np.float64)
+        self.fixed_cost = np.array(fixed_cost, dtype=np.float64)
+
+        total_supply = MAX_SUPPLY - snapshot.reserves
+        total_stake = self.active_stake.sum()
+        z0 = 1 / snapshot.n_opt  # saturation point, as a share of the total supply
+
+        self.stake_share = (
+            self.active_stake / total_stake
+            if total_stake
+            else np.zeros_like(self.active_stake)
+        )
+        self.saturation = self.active_stake / (total_supply * z0)
+
+        # optimal rewards of each pool (lovelace per epoch)
+        reward_pot = (snapshot.reserves * snapshot.rho + snapshot.pot_fees) * (
+            1 - snapshot.tau
+        )
+        sigma = np.minimum(self.active_stake / total_supply, z0)
+        s = np.minimum(self.pledge / total_supply, z0)
+        pool_rewards = (reward_pot / (1 + snapshot.a0)) * (
+            sigma + s * snapshot.a0 * (sigma - s * (z0 - sigma) / z0) / z0
+        )
+
+        # rewards left to the delegators, as an annual rate of their stake
+        member_rewards = np.maximum(pool_rewards - self.fixed_cost, 0) * (
+            1 - self.margin
+        )
+        epochs_per_year = 365 * 24 * 60 * 60 / CHAIN_TIME.epoch_duration
+        with np.errstate(divide="ignore", invalid="ignore"):
+            self.roa = np.where(
+                self.active_stake > 0,
+                member_rewards / self.active_stake * epochs_per_year * 100,
+                0,
+            )
+
+        # rank 1 is the highest ROA
+        self.rank = np.empty(len(self.pool_ids), dtype=np.int64)
+        self.rank[np.argsort(-self.roa, kind="stable")] = np.arange(
+            1, len(self.pool_ids) + 1
+        )
+
+    def top(self, n: int, key: str = SortKeys.roa) -> list[dict]:
+        """Return the `n` pools with the highest `key` (see `SortKeys`)."""
+        values = getattr(self, key)
+        if n < len(values):
+            indexes = np.argpartition(-values, n)[:n]
+        else:
+            indexes = np.arange(len(values))
+        indexes = indexes[np.argsort(-values[indexes], kind="stable")]
+
+        return [self.entry(i) for i in indexes]
+
+    def entry(self, i: int) -> dict:
+        """Return the metrics of the `i`-th pool."""
+        return {
+            "rank": int(self.rank[i]),
+            "pool_id": self.pool_ids[i],
+            "ticker": self.tickers[i],
+            "name": self.names[i],
+            "active_stake": int(self.active_stake[i]),
+            "stake_share": float(self.stake_share[i]) * 100,
+            "saturation": float(self.saturation[i]) * 100,
+            "roa": float(self.roa[i]),
+        }
+
+
+_lock = threading.Lock()
+_metrics = None
+
+
+def pool_metrics() -> PoolMetrics or None:
+    """Return the metrics of the current epoch, `None` if the data is not synced yet."""
+    global _metrics
+
+    epoch = CHAIN_TIME.epoch()
+    metrics = _metrics
+    if (
+        metrics is not None
+        and metrics.epoch == epoch
+        and time.monotonic() - metrics.built_at < REBUILD_INTERVAL
+    ):
+        return metrics
+
+    with _lock:
+        if _metrics is not metrics:  # rebuilt by another thread meanwhile
+            return _metrics
+
+        snapshot = EpochSnapshot.objects.filter(epoch=epoch).first()
+        if snapshot is None:
+            return None
+
+        pools = list(
+            StakePoolIndex.objects.filter(active_stake__gt=0)
+            .exclude(retiring_epoch__lte=epoch)
+            .values_list(
+                "pool_id",
+                "ticker",
+                "name",
+                "active_stake",
+                "pledge",
+                "margin",
+                "fixed_cost",
+            )
+        )
+        _metrics = PoolMetrics(pools, snapshot)
+        return _metrics
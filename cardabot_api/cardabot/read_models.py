@@ -0,0 +1,304 @@
+"""Read models of the chain-data endpoints (`graphql_views.py`).
+
+A read model builds the payload of an endpoint from upstream data, with every ADA value
+in lovelace (the views convert them to the requested `currency_format`). Payloads are
+served from snapshots kept up to date in the background (see `refresher.py`).
+
+Right after the epoch boundary, the local chain clock (`CHAIN_TIME`) is ahead of the
+indexer, which has no data of the new epoch yet: read models are built from the latest
+epoch the indexer has (see `latest_epoch`) until it catches up.
+"""
+
+import time
+from dataclasses import dataclass
+from datetime import datetime, timedelta
+from typing import Awaitable, Callable
+
+from asgiref.sync import sync_to_async
+from django.http import Http404
+
+from . import pool_metadata, utils
+from .chain_time import CHAIN_TIME
+from .graphql_client import ASYNC_GRAPHQL
+from .models import EpochSnapshot
+
+
+@dataclass(frozen=True)
+class ReadModel:
+    """A payload built from upstream data and refreshed every `interval` seconds."""
+
+    name: str
+    build: Callable[..., Awaitable[dict]]
+    interval: int  # seconds
+    per_epoch: bool = False  # payload only changes at the epoch boundary
+    lovelace_fields: tuple = ()  # fields holding ADA values (in lovelace)
+    version_field: str = None  # field versioning the payload (e.g. the tip slot)
+
+    def key(self, *args) -> str:
+        """Return the cache key of the snapshot of this model (for `args`)."""
+        return ":".join(["snapshot", self.name, *map(str, args)])
+
+    def version(self, snapshot: dict) -> str:
+        """Return the version of a snapshot: its epoch, slot or build time."""
+        if self.per_epoch:
+            return str(snapshot["epoch"])
+        if self.version_field:
+            return str(snapshot["data"][self.version_field])
+        return str(snapshot["updated_at"])
+
+    def max_age(self, snapshot: dict) -> int:
+        """Return how long (seconds) a snapshot is expected to stay the latest one."""
+        if self.per_epoch and snapshot["epoch"] == CHAIN_TIME.epoch():
+            return max(int(CHAIN_TIME.remaining_time()), 0)
+        # (snapshots of an epoch not indexed yet are rebuilt as usual)
+        return max(int(self.interval - (time.time() - snapshot["updated_at"])), 0)
+
+
+async def latest_epoch() -> int:
+    """Return the current epoch, or the latest one indexed if the indexer is behind."""
+    res = await ASYNC_GRAPHQL("currentEpochTip.graphql", {})
+    return min(CHAIN_TIME.epoch(), res.get("data")["cardano"]["currentEpoch"]["number"])
+
+
+async def _epoch_snapshot(epoch: int, finished: bool = False) -> EpochSnapshot:
+    """Return the stored snapshot of an epoch (see `epochs.py`), `None` if not synced."""
+    snapshots = EpochSnapshot.objects.filter(epoch=epoch)
+    if finished:
+        snapshots = snapshots.filter(blocks__isnull=False)
+    return await sync_to_async(snapshots.first)()
+
+
+async def _epoch() -> dict:
+    epoch = CHAIN_TIME.epoch()
+    currentEpochTip, epochInfo = (
+        res.get("data")
+        for res in await ASYNC_GRAPHQL.batch(
+            [
+                ("currentEpochTip.graphql", {}),
+                ("epochInfo.graphql", {"epoch": epoch}),
+            ]
+        )
+    )
+    if not epochInfo["epochs"]:  # new epoch not indexed yet
+        epoch = currentEpochTip["cardano"]["currentEpoch"]["number"]
+        res = await ASYNC_GRAPHQL("epochInfo.graphql", {"epoch": epoch})
+        epochInfo = res.get("data")
+
+    # fmt: off
+    return {
+        "current_epoch": epoch,
+        "current_slot": currentEpochTip["cardano"]["tip"]["slotNo"],
+        "slot_in_epoch": currentEpochTip["cardano"]["tip"]["slotInEpoch"],
+        "txs_in_epoch": int(epochInfo["epochs"][0]["transactionsCount"]),
+        "fees_in_epoch": int(epochInfo["epochs"][0]["fees"]),
+        "active_stake": int(epochInfo["epochs"][0]["activeStake_aggregate"]["aggregate"]["sum"]["amount"]),
+        "n_active_stake_pools": int(epochInfo["stakePools_aggregate"]["aggregate"]["count"]),
+    }
+    # fmt: on
+
+
+async def _stake_pool(pool_id: str) -> dict:
+    epoch = await latest_epoch()
+
+    adaSupply, activeStake, stakePoolDetails = (
+        res.get("data")
+        for res in await ASYNC_GRAPHQL.batch(
+            [
+                ("adaSupply.graphql", {}),
+                ("epochActiveStakeNOpt.graphql", {"epoch": epoch}),
+                ("stakePoolDetails.graphql", {"pool": pool_id, "epoch": epoch}),
+            ]
+        )
+    )
+
+    try:
+        pool = stakePoolDetails["stakePools"][0]
+    except (IndexError, TypeError):  # pool not found
+        raise Http404
+
+    metadata = (
+        await pool_metadata.get_metadata(pool_id, pool["url"], pool["metadataHash"])
+        if pool["url"] and pool["metadataHash"]
+        else {}
+    )
+
+    # fmt: off
+    stake = stakePoolDetails["stakePools"][0]["activeStake_aggregate"]["aggregate"]["sum"]["amount"]
+    total_stake = activeStake["epochs"][0]["activeStake_aggregate"]["aggregate"]["sum"]["amount"]
+    circulating_supply = adaSupply["ada"]["supply"]["circulating"]
+    n_opt = activeStake["epochs"][0]["protocolParams"]["nOpt"]
+
+    controlled_stake_percentage = (int(stake) / int(total_stake)) * 100
+    saturation = utils.calc_pool_saturation(stake, circulating_supply, n_opt)
+
+    return {
+        "ticker": metadata.get("ticker", "NOT FOUND."),
+        "name": metadata.get("name", "NOT FOUND."),
+        "description": metadata.get("description", "NOT FOUND."),
+        "homepage": metadata.get("homepage", "NOT FOUND."),
+        "pool_id": stakePoolDetails["stakePools"][0]["id"],
+        "pledge": int(stakePoolDetails["stakePools"][0]["pledge"]),
+        "fixed_cost": int(stakePoolDetails["stakePools"][0]["fixedCost"]),
+        "margin": stakePoolDetails["stakePools"][0]["margin"] * 100,
+        "saturation": saturation * 100,  # !TODO: fix
+        "controlled_stake_percentage": controlled_stake_percentage,  # !TODO: fix
+        "active_stake_amount": int(stake),  # !TODO: fix
+        "delegators_count": int(stakePoolDetails["stakePools"][0]["activeStake_aggregate"]["aggregate"]["count"]),
+        "epoch_blocks_count": int(stakePoolDetails["blocksThisEpoch"][0]["blocks_aggregate"]["aggregate"]["count"]),
+        "lifetime_blocks_count": int(stakePoolDetails["lifetimeBlocks"][0]["blocks_aggregate"]["aggregate"]["count"]),
+    }
+    # fmt: on
+
+
+async def _netparams() -> dict:
+    epoch = await latest_epoch()
+    snapshot = await _epoch_snapshot(epoch)
+    if snapshot is not None:
+        return {
+            "a0": snapshot.a0,
+            "min_pool_cost": snapshot.min_pool_cost,
+            "min_utxo_value": snapshot.min_utxo_value,
+            "n_opt": snapshot.n_opt,
+            "rho": snapshot.rho,
+            "tau": snapshot.tau,
+        }
+
+    res = await ASYNC_GRAPHQL("netParams.graphql", {"epoch": epoch})
+    netParams = res.get("data")["epochs"][0]
+
+    return {
+        "a0": netParams["protocolParams"]["a0"],
+        "min_pool_cost": int(netParams["protocolParams"]["minPoolCost"]),
+        "min_utxo_value": int(netParams["protocolParams"]["minUTxOValue"]),
+        "n_opt": netParams["protocolParams"]["nOpt"],
+        "rho": netParams["protocolParams"]["rho"],
+        "tau": netParams["protocolParams"]["tau"],
+    }
+
+
+async def _pots() -> dict:
+    epoch = await latest_epoch()
+    snapshot = await _epoch_snapshot(epoch)
+    if snapshot is not None:
+        return {
+            "treasury": snapshot.treasury,
+            "reserves": snapshot.reserves,
+            "fees": snapshot.pot_fees,
+            "rewards": snapshot.rewards,
+            "utxo": snapshot.utxo,
+            "deposits": snapshot.deposits,
+        }
+
+    res = await ASYNC_GRAPHQL("adaPot.graphql", {"epoch": epoch})
+    adaPot = res.get("data")["epochs"][0]
+
+    return {
+        "treasury": int(adaPot["adaPots"]["treasury"]),
+        "reserves": int(adaPot["adaPots"]["reserves"]),
+        "fees": int(adaPot["adaPots"]["fees"]),
+        "rewards": int(adaPot["adaPots"]["rewards"]),
+        "utxo": int(adaPot["adaPots"]["utxo"]),
+        "deposits": int(adaPot["adaPots"]["deposits"]),
+    }
+
+
+async def _netstats() -> dict:
+    # minute precision, so concurrent requests share the same upstream query
+    now = datetime.utcnow().replace(second=0, microsecond=0)
+    params = {
+        "epoch": await latest_epoch(),
+        "time_15m": (now - timedelta(hours=0.25)).strftime("%Y-%m-%dT%H:%M:%SZ"),
+        "time_1h": (now - timedelta(hours=1)).strftime("%Y-%m-%dT%H:%M:%SZ"),
+        "time_24h": (now - timedelta(hours=24)).strftime("%Y-%m-%dT%H:%M:%SZ"),
+    }
+    netstats = (await ASYNC_GRAPHQL("netstats.graphql", params)).get("data")
+
+    s = netstats["epochs"][0]["activeStake_aggregate"]["aggregate"]["sum"]["amount"]
+    stake_percentage = int(s) / int(netstats["ada"]["supply"]["circulating"]) * 100
+
+    max_block_size = netstats["epochs"][0]["protocolParams"]["maxBlockBodySize"]
+    block_size_avg_15m = netstats["blocks_avg_15m"]["aggregate"]["avg"]["size"]
+    block_size_avg_1h = netstats["blocks_avg_1h"]["aggregate"]["avg"]["size"]
+    block_size_avg_24h = netstats["blocks_avg_24h"]["aggregate"]["avg"]["size"]
+
+    return {
+        "ada_in_circulation": int(netstats["ada"]["supply"]["circulating"]),
+        "percentage_in_stake": stake_percentage,
+        "stakepools": int(netstats["stakePools_aggregate"]["aggregate"]["count"]),
+        "delegations": int(
+            netstats["epochs"][0]["activeStake_aggregate"]["aggregate"]["count"]
+        ),
+        "load_15m": block_size_avg_15m / max_block_size * 100,
+        "load_1h": block_size_avg_1h / max_block_size * 100,
+        "load_24h": block_size_avg_24h / max_block_size * 100,
+    }
+
+
+async def _epoch_summary() -> dict:
+    epoch = await latest_epoch() - 1
+    snapshot = await _epoch_snapshot(epoch, finished=True)
+    if snapshot is not None:
+        return {
+            "epoch": epoch,
+            "blocks": snapshot.blocks,
+            "txs": snapshot.txs,
+            "fees": snapshot.fees,
+            "rewards": snapshot.rewards,
+            "reserves": snapshot.reserves,
+            "treasury": snapshot.treasury,
+        }
+
+    res = await ASYNC_GRAPHQL("epochDetailsByNumber.graphql", {"number": epoch})
+    epoch_summary = res.get("data")["epochs"][0]
+
+    return {
+        "epoch": epoch,
+        "blocks": int(epoch_summary["blocksCount"]),
+        "txs": int(epoch_summary["transactionsCount"]),
+        "fees": int(epoch_summary["fees"]),
+        "rewards": int(epoch_summary["adaPots"]["rewards"]),
+        "reserves": int(epoch_summary["adaPots"]["reserves"]),
+        "treasury": int(epoch_summary["adaPots"]["treasury"]),
+    }
+
+
+EPOCH = ReadModel(
+    "epoch",
+    _epoch,
+    interval=20,
+    lovelace_fields=("fees_in_epoch", "active_stake"),
+    version_field="current_slot",
+)
+STAKE_POOL = ReadModel(
+    "pool",
+    _stake_pool,
+    interval=300,
+    lovelace_fields=("pledge", "fixed_cost", "active_stake_amount"),
+)
+NETPARAMS = ReadModel(
+    "netparams",
+    _netparams,
+    interval=600,
+    per_epoch=True,
+    lovelace_fields=("min_pool_cost", "min_utxo_value"),
+)
+POTS = ReadModel(
+    "pots",
+    _pots,
+    interval=600,
+    per_epoch=True,
+    lovelace_fields=("treasury", "reserves", "fees", "rewards", "utxo", "deposits"),
+)
+NETSTATS = ReadModel(
+    "netstats", _netstats, interval=60, lovelace_fields=("ada_in_circulation",)
+)
+EPOCH_SUMMARY = ReadModel(
+    "epochsummary",
+    _epoch_summary,
+    interval=600,
+    per_epoch=True,
+    lovelace_fields=("fees", "rewards", "reserves", "treasury"),
+)
+
+# read models without arguments, refreshed as they are
+READ_MODELS = (EPOCH, NETPARAMS, POTS, NETSTATS, EPOCH_SUMMARY)
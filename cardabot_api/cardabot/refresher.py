@@ -0,0 +1,110 @@
+"""Keep the snapshots of the read models (`read_models.py`) fresh in the background.
+
+Snapshots live in the shared cache, so every worker serves the same data. Hot read
+models are rebuilt every `interval` seconds on the scheduler, by a single worker at a
+time; requests only build a read model themselves on a cold miss (stale-while-revalidate).
+"""
+
+import logging
+import time
+from datetime import datetime
+
+from asgiref.sync import async_to_sync
+from django.core.cache import cache
+
+from .chain_time import CHAIN_TIME
+from .models import Chat
+from .read_models import READ_MODELS, STAKE_POOL, ReadModel, latest_epoch
+from .singleflight import SINGLE_FLIGHT, request_key
+from .utils import Scheduler
+
+STALE_FACTOR = 10  # snapshots are kept for `STALE_FACTOR` refresh intervals
+
+
+async def publish(model: ReadModel, *args) -> dict:
+    """Build a read model and store its snapshot in the cache.
+
+    Snapshots of `per_epoch` models hold the epoch of their data (see `latest_epoch`).
+    """
+    epoch = await latest_epoch() if model.per_epoch else CHAIN_TIME.epoch()
+    snapshot = {
+        "data": await model.build(*args),
+        "epoch": epoch,
+        "updated_at": time.time(),
+    }
+    await cache.aset(model.key(*args), snapshot, timeout=model.interval * STALE_FACTOR)
+    return snapshot
+
+
+async def latest(model: ReadModel, *args) -> dict:
+    """Return the latest snapshot of a read model.
+
+    A stale snapshot is served as is and refreshed in the background; snapshots from a
+    previous epoch of `per_epoch` models are discarded, unless the indexer doesn't have
+    a newer one yet. On a cold miss the read model is built right away (once for all
+    concurrent callers).
+    """
+    snapshot = await cache.aget(model.key(*args))
+    if snapshot is not None and model.per_epoch:
+        if snapshot["epoch"] != CHAIN_TIME.epoch():
+            if snapshot["epoch"] != await latest_epoch():
+                snapshot = None
+
+    if snapshot is None:
+        return await SINGLE_FLIGHT.ado(
+            request_key("snapshot", model.key(*args)), lambda: publish(model, *args)
+        )
+
+    if time.time() - snapshot["updated_at"] > model.interval:
+        Scheduler.queue.add_job(refresh, args=[model, *args])
+
+    return snapshot
+
+
+def refresh(model: ReadModel, *args) -> None:
+    """Rebuild the snapshot of a read model, unless another worker just did it."""
+    lock_key = f"refresher:{model.key(*args)}"
+    if not cache.add(lock_key, True, timeout=max(model.interval - 1, 1)):
+        return
+
+    try:
+        async_to_sync(publish)(model, *args)
+    except Exception as e:
+        cache.delete(lock_key)  # let the next run try again
+        logging.error(
+            repr(
+                {
+                    "message": "Read model refresh failed.",
+                    "data": {"key": model.key(*args), "error": repr(e)},
+                }
+            )
+        )
+
+
+def refresh_default_pools() -> None:
+    """Rebuild the stake pool snapshots of the chats' default pools."""
+    pool_ids = Chat.objects.values_list("default_pool_id", flat=True).distinct()
+    for pool_id in pool_ids:
+        refresh(STAKE_POOL, pool_id)
+
+
+def refresh_read_models_cron():
+    """Refresh the hot read models periodically."""
+
+    for model in READ_MODELS:
+        Scheduler.queue.add_job(
+            refresh,
+            "interval",
+            seconds=model.interval,
+            start_date=datetime.now(),
+            args=[model],
+            id=f"refresh_{model.name}",
+        )
+
+    Scheduler.queue.add_job(
+        refresh_default_pools,
+        "interval",
+        seconds=STAKE_POOL.interval,
+        start_date=datetime.now(),
+        id="refresh_default_pools",
+    )
@@ -1,6 +1,16 @@
+from decimal import Decimal
+
 from rest_framework import serializers
 
-from .models import CardaBotUser, Chat, UnsignedTransaction
+from .models import (
+    CardaBotUser,
+    Chat,
+    Claim,
+    EpochSnapshot,
+    StakePoolIndex,
+    TrackedTransaction,
+    UnsignedTransaction,
+)
 from .utils import check_pool_is_valid, check_stake_addr_is_valid
 
 
@@ -47,7 +57,12 @@ class TemporaryTokenSerializer(serializers.ModelSerializer):
 
 
 class UnsignedTransactionSerializer(serializers.ModelSerializer):
-    receiver_chat_id = serializers.CharField(source="receiver_chat.chat_id")
+    receiver_chat_id = serializers.CharField(
+        source="receiver_chat.chat_id", default=None
+    )  # None for multi-receiver txs
+    receiver_chat_ids = serializers.SlugRelatedField(
+        source="receiver_chats", slug_field="chat_id", many=True, read_only=True
+    )
 
     class Meta:
         model = UnsignedTransaction
@@ -57,6 +72,63 @@ class UnsignedTransactionSerializer(serializers.ModelSerializer):
             # "sender_chat",
             # "receiver_chat",
             "receiver_chat_id",
+            "receiver_chat_ids",
             "amount",
             "username_receiver",
         )
+
+
+class BulkUnsignedTransactionSerializer(serializers.Serializer):
+    """Body params of a tx to several receivers (see `views.BulkUnsignedTransaction`)."""
+
+    chat_ids_receiver = serializers.ListField(
+        child=serializers.CharField(), allow_empty=False
+    )
+    amount = serializers.DecimalField(
+        max_digits=17, decimal_places=6, min_value=Decimal("0.000001")
+    )  # per receiver (ADA)
+
+
+class EpochSnapshotSerializer(serializers.ModelSerializer):
+    class Meta:
+        model = EpochSnapshot
+        exclude = ("synced_at",)
+
+
+class StakePoolIndexSerializer(serializers.ModelSerializer):
+    class Meta:
+        model = StakePoolIndex
+        fields = (
+            "pool_id",
+            "ticker",
+            "name",
+            "pledge",
+            "margin",
+            "fixed_cost",
+            "active_stake",
+            "retiring_epoch",
+            "retired",
+            "epoch",
+        )
+
+
+class ClaimSerializer(serializers.ModelSerializer):
+    class Meta:
+        model = Claim
+        fields = ("ticket", "chat_id", "status", "amount", "tx_id", "detail")
+
+
+class TrackedTransactionSerializer(serializers.ModelSerializer):
+    class Meta:
+        model = TrackedTransaction
+        fields = (
+            "tx_id",
+            "status",
+            "block_height",
+            "confirmations",
+            "output_amount",
+            "fees",
+            "detail",
+            "created_at",
+            "updated_at",
+        )
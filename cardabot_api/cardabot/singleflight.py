@@ -0,0 +1,215 @@
+"""Coalesce concurrent identical upstream requests into a single request.
+
+Callers asking for the same key while a request is in flight wait for it and share its
+result, instead of sending their own. Within a process this is done with threading
+events (or asyncio tasks). Across processes (workers), only when the cache is redis,
+with a short-lived lock in the cache, the result being published there for the waiting
+workers: with the database cache that would cost more than the request itself.
+
+Waiting callers of a process give up after `WAIT_TIMEOUT` and send the request
+themselves. Waiting workers wait as long as the lock is held (at most `LOCK_TTL`), the
+request is sent again only once its worker failed.
+"""
+
+import asyncio
+import functools
+import hashlib
+import json
+import threading
+import time
+import uuid
+import weakref
+
+from django.core.cache import cache, caches
+from django.core.cache.backends.redis import RedisCache
+
+LOCK_TTL = 30  # seconds, max time a request can hold the cross-process lock
+RESULT_TTL = 5  # seconds, how long a result is kept for the waiting workers
+POLL_INTERVAL = 0.05  # seconds, how often waiting workers look for the result
+WAIT_TIMEOUT = 10  # seconds, max time a caller waits for the request of another
+
+SHARED = isinstance(caches["default"], RedisCache)  # coalesce across processes
+
+
+def request_key(*parts) -> str:
+    """Return a (short) key identifying a request by its parts."""
+    return hashlib.sha256(
+        json.dumps(parts, sort_keys=True, default=str).encode()
+    ).hexdigest()
+
+
+def _keys(key: str, flight: str = None) -> tuple[str, str]:
+    """Return the cache keys of the lock and of the result of a flight of `key`."""
+    return f"singleflight:{key}:lock", f"singleflight:{key}:{flight}"
+
+
+class _Call:
+    """A request in flight, shared by the threads waiting for it."""
+
+    def __init__(self) -> None:
+        self.done = threading.Event()
+        self.result = None
+        self.error = None
+
+
+class SingleFlight:
+    def __init__(self) -> None:
+        self._lock = threading.Lock()
+        self._calls = {}  # key -> _Call
+        self._tasks = weakref.WeakKeyDictionary()  # event loop -> {key: task}
+
+    def do(self, key: str, fn):
+        """Run `fn()` once for all concurrent callers of `key` and return its result.
+
+        Exceptions raised by `fn` are raised to every caller of this process.
+        """
+        with self._lock:
+            call = self._calls.get(key)
+            leader = call is None
+            if leader:
+                call = self._calls[key] = _Call()
+
+        if not leader:
+            if not call.done.wait(WAIT_TIMEOUT):
+                return fn()
+            if call.error is not None:
+                raise call.error
+            return call.result
+
+        try:
+            call.result = self._do_shared(key, fn) if SHARED else fn()
+            return call.result
+        except Exception as e:
+            call.error = e
+            raise
+        finally:
+            with self._lock:
+                del self._calls[key]
+            call.done.set()
+
+    def _do_shared(self, key: str, fn):
+        """Run `fn()` once across processes, using a lock in the shared cache.
+
+        The lock holds the id of the flight, which keys its result.
+        """
+        flight = uuid.uuid4().hex
+        lock_key, result_key = _keys(key, flight)
+        if cache.add(lock_key, flight, timeout=LOCK_TTL):
+            try:
+                result = fn()
+                cache.set(result_key, result, timeout=RESULT_TTL)
+                return result
+            finally:
+                cache.delete(lock_key)
+
+        flight = cache.get(lock_key)
+        lock_key, result_key = _keys(key, flight)
+        while flight is not None:  # until the lock is released (or expires)
+            time.sleep(POLL_INTERVAL)
+            found = cache.get_many([lock_key, result_key])
+            if result_key in found:
+                return found[result_key]
+            if found.get(lock_key) != flight:
+                break  # the other worker failed, no result to share
+
+        return fn()
+
+    async def ado(self, key: str, coro_fn):
+        """Async version of `do`: await `coro_fn()` once for all concurrent callers."""
+        tasks = self._tasks.setdefault(asyncio.get_running_loop(), {})
+        task = tasks.get(key)
+        leader = task is None
+        if leader:
+            task = tasks[key] = asyncio.ensure_future(
+                self._ado_shared(key, coro_fn) if SHARED else coro_fn()
+            )
+            task.add_done_callback(
+                lambda done: tasks.pop(key) if tasks.get(key) is done else None
+            )
+
+        # a cancelled caller must not cancel the request of the others
+        if leader:
+            return await asyncio.shield(task)
+        try:
+            return await asyncio.wait_for(asyncio.shield(task), WAIT_TIMEOUT)
+        except asyncio.TimeoutError:
+            return await coro_fn()
+
+    async def _ado_shared(self, key: str, coro_fn):
+        """Async version of `_do_shared`."""
+        flight = uuid.uuid4().hex
+        lock_key, result_key = _keys(key, flight)
+        if await cache.aadd(lock_key, flight, timeout=LOCK_TTL):
+            try:
+                result = await coro_fn()
+                await cache.aset(result_key, result, timeout=RESULT_TTL)
+                return result
+            finally:
+                await cache.adelete(lock_key)
+
+        flight = await cache.aget(lock_key)
+        lock_key, result_key = _keys(key, flight)
+        while flight is not None:  # until the lock is released (or expires)
+            await asyncio.sleep(POLL_INTERVAL)
+            found = await cache.aget_many([lock_key, result_key])
+            if result_key in found:
+                return found[result_key]
+            if found.get(lock_key) != flight:
+                break
+
+        return await coro_fn()
+
+
+SINGLE_FLIGHT = SingleFlight()
+
+
+class SingleFlightAPI:
+    """Proxy of a blockfrost api object coalescing concurrent identical reads.
+
+    Only the endpoints listed in `methods` are coalesced, everything else (e.g.
+    `transaction_submit`) goes straight to the wrapped api.
+    """
+
+    methods = frozenset(
+        (
+            "account_addresses",
+            "account_addresses_total",
+            "accounts",
+            "address",
+            "address_transactions",
+            "address_utxos",
+            "block_latest",
+            "epoch_latest",
+            "epoch_latest_parameters",
+            "genesis",
+            "pool",
+            "transaction",
+            "transaction_metadata",
+            "transaction_utxos",
+        )
+    )
+
+    def __init__(self, api, flight: SingleFlight = SINGLE_FLIGHT) -> None:
+        self._api = api
+        self._flight = flight
+
+    def __getattr__(self, name: str):
+        attr = getattr(self._api, name)
+        if name not in self.methods:
+            return attr
+
+        if asyncio.iscoroutinefunction(attr):
+
+            @functools.wraps(attr)
+            async def acall(*args, **kwargs):
+                key = request_key("blockfrost", name, args, kwargs)
+                return await self._flight.ado(key, lambda: attr(*args, **kwargs))
+
+            return acall
+
+        @functools.wraps(attr)
+        def call(*args, **kwargs):
+            key = request_key("blockfrost", name, args, kwargs)
+            return self._flight.do(key, lambda: attr(*args, **kwargs))
+
+        return call
@@ -1,3 +1,411 @@
+from datetime import timedelta
+from unittest import mock
+
+from blockfrost import ApiError
+from blockfrost.utils import convert_json_to_object
 from django.test import TestCase
+from django.utils import timezone
+from pycardano import (
+    Address,
+    ChainContext,
+    Network,
+    PaymentSigningKey,
+    ProtocolParameters,
+    Transaction,
+    TransactionBuilder,
+    TransactionInput,
+    TransactionOutput,
+    TransactionWitnessSet,
+    UTxO,
+    VerificationKeyWitness,
+)
+from pycardano.utils import fee as min_fee
+
+from . import claims, custody, fees, tx, tx_tracker
+from .models import Claim, CustodyUtxo, TrackedTransaction
+from .utils import BlockFrostAPI
+
+ADDRESS = "addr_test1vrm9x2zsux7va6w892g38tvchnzahvcd9tykqf3ygnmwtaqyfg52x"
+CUSTODY_ADDRESS = "addr_test1vz662tcgtrs6stzckudspaeyczdmvw6prfm4hz0ycaw206gj37fg9"
+
+
+class FakeChainContext(ChainContext):
+    """Chain context with the mainnet protocol parameters, without requests."""
+
+    def __init__(self, max_tx_size: int = 16384, slot: int = 1000) -> None:
+        self.max_tx_size = max_tx_size
+        self.slot = slot
+
+    @property
+    def protocol_param(self) -> ProtocolParameters:
+        return ProtocolParameters(
+            min_fee_constant=155381,
+            min_fee_coefficient=44,
+            max_tx_size=self.max_tx_size,
+            key_deposit=2000000,
+            pool_deposit=500000000,
+            min_utxo=34482,
+            price_mem=0.0577,
+            price_step=0.0000721,
+            max_tx_ex_mem=14000000,
+            max_tx_ex_steps=10000000000,
+            max_val_size=5000,
+            collateral_percent=150,
+            max_collateral_inputs=3,
+            coins_per_utxo_word=34482,
+        )
+
+    @property
+    def network(self) -> Network:
+        return Network.TESTNET
+
+    @property
+    def last_block_slot(self) -> int:
+        return self.slot
+
+
+def _tx_hash(i: int) -> str:
+    return f"{i:064x}"
+
+
+def _custody_utxo(i: int, chat_id: str, lovelace: int, **fields) -> CustodyUtxo:
+    return CustodyUtxo.objects.create(
+        tx_hash=_tx_hash(i),
+        index=0,
+        chat_id=chat_id,
+        lovelace=lovelace,
+        block_height=fields.pop("block_height", 1),
+        **fields,
+    )
+
+
+def _api_error(status_code: int) -> ApiError:
+    response = mock.Mock()
+    response.json.return_value = {
+        "status_code": status_code,
+        "error": "Not Found",
+        "message": "The requested component has not been found.",
+    }
+    return ApiError(response)
+
+
+class ClaimsBatchTestCase(TestCase):
+    def setUp(self):
+        self.context = FakeChainContext()
+        patcher = mock.patch.object(tx.ChainContext, "context", self.context)
+        patcher.start()
+        self.addCleanup(patcher.stop)
+
+    def _claim(self, chat_id: str) -> Claim:
+        return Claim.objects.create(chat_id=chat_id, receiver_address=ADDRESS)
+
+    def test_payout_spends_the_largest_utxos_up_to_max_inputs(self):
+        for i, lovelace in enumerate([2_000_000, 5_000_000, 3_000_000, 4_000_000]):
+            _custody_utxo(i, "1", lovelace)
+        claim = self._claim("1")
+
+        with mock.patch.object(claims, "MAX_INPUTS", 3):
+            batch, payouts = claims._batch([claim], ttl=2000)
+
+        self.assertEqual(batch, {"1": [claim]})
+        [(utxos, address)] = payouts
+        self.assertEqual(
+            [utxo.lovelace for utxo in utxos], [5_000_000, 4_000_000, 3_000_000]
+        )
+        self.assertEqual(address, ADDRESS)
+
+    def test_duplicate_claims_share_the_payout(self):
+        _custody_utxo(0, "1", 5_000_000)
+        first, second = self._claim("1"), self._claim("1")
+
+        batch, payouts = claims._batch([first, second], ttl=2000)
+
+        self.assertEqual(batch, {"1": [first, second]})
+        self.assertEqual(len(payouts), 1)
+
+    def test_claims_over_the_max_tx_size_wait_for_the_next_window(self):
+        _custody_utxo(0, "small", 5_000_000)
+        for i in range(1, 11):
+            _custody_utxo(i, "large", 5_000_000)
+        _custody_utxo(11, "last", 5_000_000)
+        small = self._claim("small")
+        large = self._claim("large")
+        last = self._claim("last")
+
+        # room for the payouts of "small" and "last", not for the one of "large"
+        output = TransactionOutput.from_primitive([ADDRESS, 5_000_000])
+        self.context.max_tx_size = claims.SIZE_MARGIN + fees.tx_size(
+            [0, 0], [output, output], ttl=2000
+        )
+        batch, payouts = claims._batch([small, large, last], ttl=2000)
+
+        self.assertEqual(list(batch), ["small", "last"])
+        self.assertEqual(len(payouts), 2)
+        large.refresh_from_db()
+        self.assertEqual(large.status, Claim.PENDING)
+
+    def test_claims_not_covering_the_fee_and_min_ada_fail(self):
+        _custody_utxo(0, "dust", tx.MIN_CHANGE + 100_000)  # less than the fee left
+        _custody_utxo(1, "spent", 5_000_000, spent=True)
+        dust, spent = self._claim("dust"), self._claim("spent")
+
+        batch, payouts = claims._batch([dust, spent], ttl=2000)
+
+        self.assertEqual((batch, payouts), ({}, []))
+        dust.refresh_from_db()
+        spent.refresh_from_db()
+        self.assertEqual(
+            (dust.status, dust.detail), (Claim.FAILED, "Funds don't cover the fee.")
+        )
+        self.assertEqual(
+            (spent.status, spent.detail), (Claim.FAILED, "No funds to claim.")
+        )
+
+    def test_claims_covering_the_fee_and_min_ada_are_paid(self):
+        fee = fees.estimate_fee(
+            self.context,
+            [0],
+            [TransactionOutput.from_primitive([ADDRESS, 2_000_000])],
+            ttl=2000,
+        )
+        _custody_utxo(0, "1", tx.MIN_CHANGE + fee)
+        claim = self._claim("1")
+
+        batch, _ = claims._batch([claim], ttl=2000)
+
+        self.assertEqual(batch, {"1": [claim]})
+
+
+class CustodyLedgerTestCase(TestCase):
+    addresses = {CUSTODY_ADDRESS}
+
+    def _utxos(self, inputs: list[tuple[int, int]], outputs: list[str]):
+        return convert_json_to_object(
+            {
+                "inputs": [
+                    {
+                        "address": CUSTODY_ADDRESS,
+                        "tx_hash": _tx_hash(i),
+                        "output_index": index,
+                        "amount": [{"unit": "lovelace", "quantity": "5000000"}],
+                    }
+                    for i, index in inputs
+                ],
+                "outputs": [
+                    {
+                        "address": address,
+                        "amount": [{"unit": "lovelace", "quantity": "2000000"}],
+                    }
+                    for address in outputs
+                ],
+            }
+        )
+
+    def _metadata(self, chat_ids: list[str]) -> list:
+        return [{"label": "674", "json_metadata": {"msg": chat_ids}}]
+
+    def test_apply_tx_adds_the_custody_outputs_and_spends_the_inputs(self):
+        _custody_utxo(0, "1", 5_000_000)
+        utxos = self._utxos([(0, 0)], [ADDRESS, CUSTODY_ADDRESS, CUSTODY_ADDRESS])
+
+        custody._apply_tx(
+            _tx_hash(1), 10, utxos, self._metadata(["a", "b"]), self.addresses
+        )
+
+        self.assertEqual(
+            list(
+                CustodyUtxo.objects.filter(tx_hash=_tx_hash(1))
+                .order_by("index")
+                .values_list("index", "chat_id", "lovelace", "block_height")
+            ),
+            [(1, "a", 2_000_000, 10), (2, "b", 2_000_000, 10)],
+        )
+        spent = CustodyUtxo.objects.get(tx_hash=_tx_hash(0))
+        self.assertEqual(
+            (spent.spent, spent.spent_by, spent.spent_block_height),
+            (True, _tx_hash(1), 10),
+        )
+
+    def test_reconcile_deletes_the_utxos_of_rolled_back_txs(self):
+        _custody_utxo(0, "1", 5_000_000, block_height=5)
+        _custody_utxo(1, "1", 5_000_000, block_height=12)  # rolled back
+        _custody_utxo(2, "1", 5_000_000, block_height=13)  # still on chain
+
+        deleted, unspent = custody._reconcile({_tx_hash(2): 13}, from_block=10)
+
+        self.assertEqual((deleted, unspent), (1, 0))
+        self.assertEqual(
+            set(CustodyUtxo.objects.values_list("tx_hash", flat=True)),
+            {_tx_hash(0), _tx_hash(2)},
+        )
+
+    def test_reconcile_unspends_the_inputs_of_rolled_back_txs(self):
+        _custody_utxo(
+            0, "1", 5_000_000, spent=True, spent_by=_tx_hash(9), spent_block_height=12
+        )
+
+        deleted, unspent = custody._reconcile({}, from_block=10)
+
+        self.assertEqual((deleted, unspent), (0, 1))
+        utxo = CustodyUtxo.objects.get()
+        self.assertEqual(
+            (utxo.spent, utxo.spent_by, utxo.spent_block_height), (False, None, None)
+        )
+
+    def test_reconcile_keeps_the_utxos_reserved_by_pending_payouts(self):
+        payout = tx_tracker.track_submitted(_tx_hash(9), ttl=2000)
+        _custody_utxo(
+            0, "1", 5_000_000, spent=True, spent_by=payout.tx_id, spent_block_height=12
+        )
+
+        custody._reconcile({}, from_block=10)
+
+        utxo = CustodyUtxo.objects.get()
+        self.assertEqual(
+            (utxo.spent, utxo.spent_by, utxo.spent_block_height),
+            (True, payout.tx_id, None),
+        )
+
+
+class TxTrackerTestCase(TestCase):
+    def setUp(self):
+        self.api = mock.Mock()
+        self.api.block_latest.return_value = convert_json_to_object(
+            {"height": 100, "slot": 5000}
+        )
+        self.api.transaction.side_effect = _api_error(404)  # not in a block
+        patcher = mock.patch.object(BlockFrostAPI, "api", self.api)
+        patcher.start()
+        self.addCleanup(patcher.stop)
+
+    def test_expired_payouts_release_their_utxos(self):
+        payout = tx_tracker.track_submitted(_tx_hash(9), ttl=4000)
+        _custody_utxo(0, "1", 5_000_000, spent=True, spent_by=payout.tx_id)
+        claim = Claim.objects.create(
+            chat_id="1",
+            receiver_address=ADDRESS,
+            status=Claim.SUBMITTED,
+            tx_id=payout.tx_id,
+        )
+
+        tx_tracker.track_transactions()
+
+        payout.refresh_from_db()
+        claim.refresh_from_db()
+        utxo = CustodyUtxo.objects.get()
+        self.assertEqual(payout.status, TrackedTransaction.EXPIRED)
+        self.assertEqual(claim.status, Claim.FAILED)
+        self.assertEqual((utxo.spent, utxo.spent_by), (False, None))
+
+    def test_payouts_within_their_ttl_keep_their_utxos(self):
+        payout = tx_tracker.track_submitted(_tx_hash(9), ttl=6000)
+        _custody_utxo(0, "1", 5_000_000, spent=True, spent_by=payout.tx_id)
+
+        tx_tracker.track_transactions()
+
+        payout.refresh_from_db()
+        self.assertEqual(payout.status, TrackedTransaction.SUBMITTED)
+        self.assertTrue(CustodyUtxo.objects.get().spent)
+
+    def test_built_txs_expire_after_a_while(self):
+        built = TrackedTransaction.objects.create(tx_id=_tx_hash(9))
+        TrackedTransaction.objects.filter(pk=built.pk).update(
+            updated_at=timezone.now() - tx_tracker.EXPIRE_AFTER - timedelta(minutes=1)
+        )
+
+        tx_tracker.track_transactions()
+
+        built.refresh_from_db()
+        self.assertEqual(built.status, TrackedTransaction.EXPIRED)
+
+    def test_txs_rolled_back_out_of_their_block_are_submitted_again(self):
+        tracked = tx_tracker.track_submitted(_tx_hash(9), ttl=6000)
+        TrackedTransaction.objects.filter(pk=tracked.pk).update(
+            status=TrackedTransaction.IN_BLOCK, block_height=95, confirmations=6
+        )
+
+        tx_tracker.track_transactions()
+
+        tracked.refresh_from_db()
+        self.assertEqual(
+            (tracked.status, tracked.block_height, tracked.confirmations),
+            (TrackedTransaction.SUBMITTED, None, 0),
+        )
+
+    def test_txs_deep_enough_are_confirmed(self):
+        tracked = tx_tracker.track_submitted(_tx_hash(9), ttl=6000)
+        self.api.transaction.side_effect = None
+        self.api.transaction.return_value = convert_json_to_object(
+            {
+                "block_height": 100 - tx_tracker.CONFIRMATIONS + 1,
+                "fees": "170000",
+                "output_amount": [{"unit": "lovelace", "quantity": "4830000"}],
+            }
+        )
+
+        tx_tracker.track_transactions()
+
+        tracked.refresh_from_db()
+        self.assertEqual(tracked.status, TrackedTransaction.CONFIRMED)
+        self.assertEqual(tracked.confirmations, tx_tracker.CONFIRMATIONS)
+
+
+class EstimateFeeTestCase(TestCase):
+    def setUp(self):
+        self.context = FakeChainContext()
+        self.signing_key = PaymentSigningKey.generate()
+        self.address = Address(
+            self.signing_key.to_verification_key().hash(), network=Network.TESTNET
+        )
+
+    def _signed_tx(self, input_indexes: list[int], amounts: list[int], ttl: int):
+        """Build (with pycardano's builder) and sign a payment to `ADDRESS`."""
+        builder = TransactionBuilder(self.context)
+        for i, index in enumerate(input_indexes):
+            builder.add_input(
+                UTxO(
+                    TransactionInput.from_primitive([_tx_hash(i), index]),
+                    TransactionOutput(self.address, 100_000_000),
+                )
+            )
+        for amount in amounts:
+            builder.add_output(TransactionOutput(Address.decode(ADDRESS), amount))
+        builder.ttl = ttl
+
+        body = builder.build(change_address=self.address)
+        witness = VerificationKeyWitness(
+            self.signing_key.to_verification_key(), self.signing_key.sign(body.hash())
+        )
+        return Transaction(body, TransactionWitnessSet(vkey_witnesses=[witness]))
+
+    def test_tx_size_matches_the_signed_tx(self):
+        for input_indexes, amounts, ttl in [
+            ([0], [2_000_000], 20),
+            ([0, 30, 300], [2_000_000, 50_000_000], 2000),
+            ([1] * 20, [1_000_000] * 10, 100_000),
+        ]:
+            signed_tx = self._signed_tx(input_indexes, amounts, ttl)
+            body = signed_tx.transaction_body
+
+            size = fees.tx_size(input_indexes, body.outputs, fee=body.fee, ttl=ttl)
+
+            self.assertEqual(size, len(signed_tx.to_cbor("bytes")))
+
+    def test_estimate_fee_covers_the_min_fee_of_the_signed_tx(self):
+        coefficient = self.context.protocol_param.min_fee_coefficient
+        for input_indexes, amounts, ttl in [
+            ([0], [2_000_000], 20),
+            ([0, 30, 300], [2_000_000, 50_000_000], 2000),
+            ([1] * 20, [1_000_000] * 10, 100_000),
+        ]:
+            signed_tx = self._signed_tx(input_indexes, amounts, ttl)
+            body = signed_tx.transaction_body
+
+            estimate = fees.estimate_fee(
+                self.context, input_indexes, body.outputs, ttl=ttl
+            )
+            minimum = min_fee(self.context, len(signed_tx.to_cbor("bytes")))
 
-# Create your tests here.
+            self.assertGreaterEqual(estimate, minimum)
+            self.assertLessEqual(estimate, body.fee)
+            self.assertLessEqual(estimate - minimum, 4 * coefficient)  # fee encoding
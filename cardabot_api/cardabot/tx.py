@@ -1,36 +1,92 @@
 import logging
 import os
+import threading
 
 # import re
 from dataclasses import dataclass
+from typing import Callable, Iterator
 
-import pycardano
 from pycardano import (
     Address,
+    Asset,
+    AssetName,
     BlockFrostChainContext,
+    DatumHash,
+    MultiAsset,
     Network,
-    PaymentSigningKey,
-    PaymentVerificationKey,
+    ScriptHash,
     Transaction,
     TransactionBody,
     TransactionBuilder,
     TransactionInput,
     TransactionOutput,
     TransactionWitnessSet,
-    VerificationKeyWitness,
+    UTxO,
+    Value,
 )
+from pycardano.hash import SCRIPT_HASH_SIZE
 from pycardano.metadata import AlonzoMetadata, AuxiliaryData, Metadata
+from pycardano.utils import min_lovelace
+
+from . import coin_selection, fees
+from .blockfrost_client import BLOCKFROST, Priority
+from .chain_context import CachingChainContext
+from .custody_key import CUSTODY_KEY
+from .models import CustodyUtxo
+from .singleflight import SingleFlightAPI
+from .tx_cache import TxCacheAPI
+from .utils import ApiError, AsyncBlockFrostAPI, iter_items
+
+
+class _lazy:
+    """Class attribute built on first access (not at import, e.g. by `manage.py`)."""
+
+    def __init__(self, build: Callable) -> None:
+        self.build = build
+        self.lock = threading.Lock()
+
+    def __set_name__(self, owner, name: str) -> None:
+        self.name = name
+
+    def __get__(self, instance, owner):
+        with self.lock:
+            value = owner.__dict__[self.name]
+            if value is self:
+                value = self.build(owner)
+                setattr(owner, self.name, value)  # replaces the descriptor
+        return value
+
+
+def _blockfrost_context(cls) -> BlockFrostChainContext:
+    context = BlockFrostChainContext(
+        os.environ.get("BLOCKFROST_ID"), network=cls.network
+    )
+    # shared client (high priority lane, see `blockfrost_client.py`), coalescing
+    # concurrent identical reads and caching the immutable ones (tx data)
+    context.api = TxCacheAPI(SingleFlightAPI(BLOCKFROST.lane(Priority.high)))
+    return context
 
 
 @dataclass
 class ChainContext:
-    """This class is used to store the context of the chain."""
+    """This class is used to store the context of the chain.
+
+    The contexts are built on first use, as building one requests the chain.
+    """
 
     network = Network.TESTNET if os.environ["NETWORK"] == "testnet" else Network.MAINNET
-    context = BlockFrostChainContext(os.environ.get("BLOCKFROST_ID"), network=network)
-    api = (
-        context.api
-    )  # blockfrost api obj, see: https://github.com/blockfrost/blockfrost-python
+    blockfrost_context = _lazy(_blockfrost_context)
+    # parameters and tip are cached, see `chain_context.py`
+    context = _lazy(lambda cls: CachingChainContext(cls.blockfrost_context))
+    # blockfrost api obj, see `BlockFrostClient`
+    api = _lazy(lambda cls: cls.context.api)
+    # async version of the above, only used for balances (low priority lane)
+    async_api = SingleFlightAPI(AsyncBlockFrostAPI(BLOCKFROST, Priority.low))
+
+
+MIN_CHANGE = 1_000_000  # lovelace, the change output must hold at least min ada
+MAX_RESELECTIONS = 3  # coin selections, as the change assets raise its min ada
+PAYOUT_TTL = 60 * 60  # slots (seconds), payouts not in a block by then are invalid
 
 
 def _to_llace(amount: float) -> int:
@@ -38,10 +94,8 @@ def _to_llace(amount: float) -> int:
     return int(round(amount, 6) * 1000000)
 
 
-def _addr_balance(address: str) -> int:
-    """Get the total balance (lovelace) of an address."""
-
-    amounts = ChainContext.api.address(address).amount
+def amounts_to_lovelace(amounts: list) -> int:
+    """Sum the lovelace quantities of a list of blockfrost amounts."""
     return sum(
         [
             int(amount.quantity)
@@ -51,19 +105,86 @@ def _addr_balance(address: str) -> int:
     )
 
 
+def _addr_balance(address: str) -> int:
+    """Get the total balance (lovelace) of an address."""
+
+    amounts = ChainContext.api.address(address).amount
+    return amounts_to_lovelace(amounts)
+
+
+def iter_pay_addr_from_stake_addr(stake_addr: str, order: str = "asc") -> Iterator[str]:
+    """Yield the pay addresses from a staking address, page by page."""
+    for item in iter_items(ChainContext.api.account_addresses, stake_addr, order=order):
+        yield item.address
+
+
 def get_all_pay_addr_from_stake_addr(stake_addr: str) -> list[str]:
     """Return all pay addresses from a staking address."""
-    pay_addresses = [
-        item.address
-        for item in ChainContext.api.account_addresses(stake_addr, gather_pages=True)
-    ]
-    return pay_addresses
+    return list(iter_pay_addr_from_stake_addr(stake_addr))
+
+
+def iter_addr_utxos(address: str) -> Iterator[UTxO]:
+    """Yield the utxos of a pay address, page by page."""
+    for item in iter_items(ChainContext.api.address_utxos, address):
+        yield _to_utxo(address, item)
+
+
+def _to_utxo(address: str, item) -> UTxO:
+    """Convert a blockfrost utxo to a pycardano one (as `BlockFrostChainContext`)."""
+    lovelace, multi_asset = 0, MultiAsset()
+    for amount in item.amount:
+        if amount.unit == "lovelace":
+            lovelace = int(amount.quantity)
+            continue
+
+        unit = bytes.fromhex(amount.unit)  # policy id + asset name
+        policy_id = ScriptHash(unit[:SCRIPT_HASH_SIZE])
+        multi_asset.setdefault(policy_id, Asset())[
+            AssetName(unit[SCRIPT_HASH_SIZE:])
+        ] = int(amount.quantity)
+
+    return UTxO(
+        TransactionInput.from_primitive([item.tx_hash, item.output_index]),
+        TransactionOutput(
+            Address.from_primitive(address),
+            amount=Value(lovelace, multi_asset) if multi_asset else lovelace,
+            datum_hash=DatumHash.from_primitive(item.data_hash)
+            if item.data_hash
+            else None,
+        ),
+    )
+
+
+def _totals_to_lovelace(totals) -> int:
+    """Balance (lovelace) of an account from its `addresses/total` sums."""
+    return amounts_to_lovelace(totals.received_sum) - amounts_to_lovelace(
+        totals.sent_sum
+    )
 
 
 def stake_addr_balance(stake_addr: str) -> int:
-    """Get the total balance (lovelace) of a staking address."""
-    addresses = get_all_pay_addr_from_stake_addr(stake_addr)
-    return sum(_addr_balance(pay_address) for pay_address in addresses)
+    """Get the total balance (lovelace) of a staking address.
+
+    The balance of all its pay addresses, from the account totals (a single request).
+    """
+    try:
+        totals = ChainContext.api.account_addresses_total(stake_addr)
+    except ApiError as e:
+        if e.status_code == 404:
+            return 0  # never seen on chain
+        raise
+    return _totals_to_lovelace(totals)
+
+
+async def astake_addr_balance(stake_addr: str) -> int:
+    """Async counterpart of `stake_addr_balance`."""
+    try:
+        totals = await ChainContext.async_api.account_addresses_total(stake_addr)
+    except ApiError as e:
+        if e.status_code == 404:
+            return 0  # never seen on chain
+        raise
+    return _totals_to_lovelace(totals)
 
 
 def get_pay_addr_from_stake_addr(stake_addr: str) -> str or None:
@@ -72,72 +193,87 @@ def get_pay_addr_from_stake_addr(stake_addr: str) -> str or None:
     return addresses[0].address if addresses else None
 
 
-def select_pay_addr(stake_addr: str, recipients: list[tuple[str, float]]) -> list[str]:
-    """Select pay addresses for the tx.
+def _change_min(utxos: list[UTxO]) -> int:
+    """Return the min lovelace of a change output holding the native assets of `utxos`."""
+    assets = Value()
+    for utxo in utxos:
+        if not isinstance(utxo.output.amount, int):
+            assets += Value(0, utxo.output.amount.multi_asset)
+
+    if not assets.multi_asset:
+        return MIN_CHANGE
+    return max(MIN_CHANGE, min_lovelace(assets, ChainContext.context))
 
-    Sort pay addresses by balance and return just the ones needed to complete the tx.
+
+def select_utxos(
+    stake_addr: str,
+    recipients: list[tuple[str, float]],
+    strategy: str = coin_selection.Strategy.largest_first,
+) -> list[UTxO]:
+    """Select the utxos (inputs) for the tx.
+
+    Utxos of the pay addresses are fetched concurrently, stopping once there are
+    enough funds, and selected with a coin selection strategy (see `coin_selection`).
+    The change must hold at least min ada (more if it holds native assets).
 
     Args:
         stake_addr: the staking address of the sender in bech32 format.
         recipients: list of recipients' addresses in bech32 format and amounts.
+        strategy: coin selection strategy, see `coin_selection.Strategy`.
 
     Returns:
-        A list of pay addresses necessary to complete the tx, in bech32 format.
+        A list of utxos covering the amount of the tx + fee (+ min change).
         If there aren't enough funds, returns empty list.
     """
 
-    pay_addresses = [
-        item.address
-        for item in ChainContext.api.account_addresses(
-            stake_addr, gather_pages=True, order="desc"
-        )
-    ]
+    # addresses are streamed, pages stop once coin selection is satisfied
+    pay_addresses = iter_pay_addr_from_stake_addr(stake_addr, order="desc")
 
     total_amount = sum([_to_llace(amount) for _, amount in recipients])
     fee = _to_llace(float(os.environ["FEE_UBOUND"]))
+    target = total_amount + fee + MIN_CHANGE
 
-    selected_addresses = []
-    accumulate_amount = 0
-    for pay_address in pay_addresses:
-        addr_balance = _addr_balance(pay_address)
-
-        # if the balance is greater than the total amount + fee, we can use this address
-        if addr_balance >= total_amount + fee:
-            return [pay_address]
+    utxos = coin_selection.fetch_utxos(
+        pay_addresses, lambda address: list(iter_addr_utxos(address)), target
+    )
 
-        # otherwise, we accumulate the balance and keep looking for more addresses
-        elif addr_balance > 0:
-            selected_addresses.append(pay_address)
-            accumulate_amount += addr_balance
+    selected = coin_selection.select(utxos, target, strategy)
+    for _ in range(MAX_RESELECTIONS):
+        if not selected:
+            break
 
-            # check if accumulated amount is enough to complete the tx
-            if accumulate_amount >= total_amount + fee:
-                return selected_addresses
+        target = total_amount + fee + _change_min(selected)
+        if sum(coin_selection.lovelace(utxo) for utxo in selected) >= target:
+            return selected
+        selected = coin_selection.select(utxos, target, strategy)
 
-    # if we reach this point, there aren't enough funds
     return []
 
 
 def build_unsigned_transaction(
-    sender_addresses: list[str],
+    inputs: list[UTxO],
     recipients: list[tuple[str, float]],
     metadata: dict = {},
 ) -> str:
     """Build an unsigned transaction.
 
-    The balance of each sender address must add up to the total amount of the tx + fee.
+    The inputs must add up to the total amount of the tx + fee + min change (see
+    `select_utxos`).
 
     Args:
-        sender_addresses: list of sender addresses in bech32 format.
+        inputs: list of utxos to spend.
         recipients: list of recipients' addresses in bech32 format and amounts.
         metadata: metadata to add to tx, use this in case the receiver is not connected.
 
     Returns:
         The unsigned transaction in cbor format.
 
+    Raises:
+        UTxOSelectionException: if the inputs don't cover the outputs, fee and change.
+        InvalidTransactionException: if the tx exceeds the max tx size.
+
     """
-    input_addresses = [Address.decode(sender) for sender in sender_addresses]
-    change_address = input_addresses[0]  # return change to the first sender address
+    change_address = inputs[0].output.address  # return change to the first input
 
     output_addresses = [
         TransactionOutput(Address.decode(recipient), _to_llace(amount))
@@ -146,8 +282,8 @@ def build_unsigned_transaction(
 
     builder = TransactionBuilder(ChainContext.context)
 
-    for input_address in input_addresses:
-        builder.add_input_address(input_address)
+    for utxo in inputs:
+        builder.add_input(utxo)
     for transaction_output in output_addresses:
         builder.add_output(transaction_output)
 
@@ -164,7 +300,7 @@ def build_unsigned_transaction(
             {
                 "message": "Unsigned tx successfully built.",
                 "data": {
-                    "inputs:": input_addresses,
+                    "inputs:": [utxo.input for utxo in inputs],
                     "outputs:": output_addresses,
                     "change:": change_address,
                 },
@@ -197,102 +333,79 @@ def compose_signed_transaction(unsigned_tx: str, witness: str) -> str:
     return tx.to_cbor()
 
 
-def filter_utxos_by_metadata(
-    chat_id: str, address: str = os.environ.get("CARDABOT_STAKE_KEY")
-) -> list[pycardano.transaction.UTxO]:
-    """Filter utxos by chat_id in metadata."""
-
-    addresses = [
-        item.address
-        for item in ChainContext.api.account_addresses(
-            address, gather_pages=True, order="desc"
-        )
-    ]  # get all addresses from stake key
-
-    utxos = []
-    for addr in addresses:
-        for utxo in ChainContext.context.utxos(addr):
-            meta = ChainContext.api.transaction_metadata(
-                utxo.input.transaction_id, return_type="json"
-            )
-
-            # filter by metadata
-            if (
-                meta
-                and meta[0].get("label") == "674"
-                and meta[0].get("json_metadata").get("msg")[0] == chat_id
-            ):
-                utxos.append(utxo)
-
-    return utxos
+def custody_metadata(chat_ids: list[str]) -> dict:
+    """Return the metadata of a tx to non-connected chats (label 674 message).
 
+    The tx has one custody output per chat, in the same order as `chat_ids`.
+    """
+    return {674: {"msg": [str(chat_id) for chat_id in chat_ids]}}
 
-def get_payment_sk_vk():
-    sk = PaymentSigningKey.load(os.environ.get("SKEY"))
-    vk = PaymentVerificationKey.from_signing_key(sk)
-    return sk, vk
 
+def metadata_chat_ids(meta: list) -> list[str]:
+    """Return the chat ids a tx is addressed to (label 674 message, see above)."""
+    try:
+        message = meta[0]
+        if message.get("label") == "674":
+            return [str(chat_id) for chat_id in message.get("json_metadata").get("msg")]
+    except (AttributeError, IndexError, KeyError, TypeError):
+        pass
 
-def calculate_tx_fee(
-    inputs: list[TransactionInput], outputs: list[TransactionOutput], max_fee: int
-) -> int:
+    return []
 
-    tx_body = TransactionBody(inputs=inputs, outputs=outputs, fee=max_fee)
 
-    sk, vk = get_payment_sk_vk()
-    signature = sk.sign(tx_body.hash())
-    vk_witnesses = [VerificationKeyWitness(vk, signature)]
+def payout_ttl() -> int:
+    """Return the validity limit (slot) of a payout tx built now."""
+    return ChainContext.context.last_block_slot + PAYOUT_TTL
 
-    signed_tx = Transaction(tx_body, TransactionWitnessSet(vkey_witnesses=vk_witnesses))
 
-    fee = pycardano.utils.fee(ChainContext.context, len(signed_tx.to_cbor("bytes")))
-    return fee
+def build_payout_transaction(
+    payouts: list[tuple[list[CustodyUtxo], str]], ttl: int
+) -> tuple[Transaction, list[int]]:
+    """Build and sign a tx paying custody utxos out, one output per receiver.
 
+    The fee is split between the receivers (see `fees.split_fee`).
 
-def claim_user_funds(chat_id: str, receiver_address: str = None) -> dict:
-    """Claim user funds.
+    Args:
+        payouts: list of the custody utxos to pay out and the receiver's address.
+        ttl: validity limit (slot) of the tx (see `payout_ttl`), so that a payout
+            which doesn't make it into a block can be safely released.
 
     Returns:
-        Dict with tx_id if successful, empty dict otherwise.
-
-    Raises:
-        InvalidArgumentException: When the transaction is invalid.
-        TransactionFailedException: When fails to submit the transaction to blockchain.
-
+        The signed transaction and the lovelace paid to each receiver.
     """
-    utxos = filter_utxos_by_metadata(chat_id)
-    if not utxos:
-        return {}
-
-    inputs = [
-        TransactionInput(utxo.input.transaction_id, utxo.input.index) for utxo in utxos
-    ]
-    amount = sum(utxo.output.amount for utxo in utxos)
-
-    max_fee = pycardano.utils.max_tx_fee(ChainContext.context)
-    fee = calculate_tx_fee(
-        inputs=inputs,
-        outputs=[
-            TransactionOutput.from_primitive([receiver_address, amount - max_fee])
-        ],
-        max_fee=max_fee,
-    )
+    inputs, input_indexes, outputs, sizes = [], [], [], []
+    for utxos, receiver_address in payouts:
+        amount = sum(utxo.lovelace for utxo in utxos)
+        output = TransactionOutput.from_primitive([receiver_address, amount])
+
+        inputs += [
+            TransactionInput.from_primitive([utxo.tx_hash, utxo.index])
+            for utxo in utxos
+        ]
+        input_indexes += [utxo.index for utxo in utxos]
+        outputs.append(output)
+        sizes.append(fees.payment_size([utxo.index for utxo in utxos], output))
 
-    tx_body = TransactionBody(
-        inputs=inputs,
-        # recalculate output amount to consider fee
-        outputs=[TransactionOutput.from_primitive([receiver_address, amount - fee])],
-        fee=fee,
-    )
+    # the fee follows from the tx size, see `fees.py`
+    fee = fees.estimate_fee(ChainContext.context, input_indexes, outputs, ttl=ttl)
+    for output, share in zip(outputs, fees.split_fee(ChainContext.context, fee, sizes)):
+        output.amount -= share
 
-    sk, vk = get_payment_sk_vk()
-    signature = sk.sign(tx_body.hash())
-    vk_witnesses = [VerificationKeyWitness(vk, signature)]
+    tx_body = TransactionBody(inputs=inputs, outputs=outputs, fee=fee, ttl=ttl)
 
+    vk_witnesses = [CUSTODY_KEY.witness(tx_body)]
     signed_tx = Transaction(tx_body, TransactionWitnessSet(vkey_witnesses=vk_witnesses))
 
-    ChainContext.context.submit_tx(signed_tx.to_cbor())
-    return {"tx_id": str(signed_tx.id)}
+    logging.debug(
+        repr(
+            {
+                "message": "Payout tx successfully built.",
+                "data": {"tx_id": signed_tx.id, "receivers": len(outputs), "fee": fee},
+            }
+        )
+    )
+
+    return signed_tx, [output.amount for output in outputs]
 
 
 if __name__ == "__main__":
@@ -0,0 +1,120 @@
+"""Permanent cache of the blockfrost responses about confirmed transactions.
+
+Once a transaction is on-chain its details, utxos and metadata never change, so these
+responses are stored forever (`TxData` rows, write-once) and kept in a small in-process
+LRU in front of the table. Repeated lookups (e.g. `CheckTransaction` polls, or the
+custody ledger re-reading its reorg margin) then don't cost any blockfrost request.
+
+Errors (e.g. a transaction not found) and responses that may still change are never
+cached: empty results, and the details of a transaction less than `FINAL_DEPTH` blocks
+deep (its block may still be rolled back). Utxos and metadata are part of the
+transaction body (keyed by its hash), so they never change.
+"""
+
+import functools
+import threading
+import time
+from collections import OrderedDict
+
+from blockfrost.utils import convert_json_to_object
+
+from .models import TxData
+
+LRU_SIZE = 2048  # responses kept in memory (per process)
+FINAL_DEPTH = 2160  # blocks, the security parameter k (no rollback is deeper)
+TIP_TTL = 20  # seconds
+
+
+class _LRU:
+    """Thread-safe least recently used mapping, holding at most `size` entries."""
+
+    def __init__(self, size: int) -> None:
+        self.size = size
+        self._lock = threading.Lock()
+        self._items = OrderedDict()
+
+    def get(self, key):
+        with self._lock:
+            if key not in self._items:
+                return None
+            self._items.move_to_end(key)
+            return self._items[key]
+
+    def set(self, key, value) -> None:
+        with self._lock:
+            self._items[key] = value
+            self._items.move_to_end(key)
+            if len(self._items) > self.size:
+                self._items.popitem(last=False)
+
+
+class TxCacheAPI:
+    """Proxy of a blockfrost api object serving tx-hash-keyed reads from the cache.
+
+    Only the endpoints listed in `methods` are cached, everything else goes straight to
+    the wrapped api. Responses are returned in the requested `return_type`, as
+    blockfrost does.
+    """
+
+    methods = frozenset(("transaction", "transaction_metadata", "transaction_utxos"))
+
+    def __init__(self, api, size: int = LRU_SIZE) -> None:
+        self._api = api
+        self._lru = _LRU(size)
+        self._tip = (0, float("-inf"))  # height, time
+
+    def _is_final(self, endpoint: str, data) -> bool:
+        """Check whether a response is about a confirmed transaction (safe to cache)."""
+        if endpoint == "transaction":
+            block_height = data.get("block_height")
+            return (
+                block_height is not None
+                and self._tip_height() - block_height >= FINAL_DEPTH
+            )
+        if endpoint == "transaction_utxos":
+            return bool(data.get("outputs"))
+        return bool(data)  # metadata, no labels may just mean not found (yet)
+
+    def _tip_height(self) -> int:
+        """Return the height of the tip, refreshed every `TIP_TTL` seconds."""
+        height, updated_at = self._tip
+        if time.monotonic() - updated_at > TIP_TTL:
+            height = self._api.block_latest().height
+            self._tip = (height, time.monotonic())
+        return height
+
+    def __getattr__(self, name: str):
+        attr = getattr(self._api, name)
+        if name not in self.methods:
+            return attr
+
+        @functools.wraps(attr)
+        def call(hash: str, return_type: str = "object", **kwargs):
+            data = self.get(name, hash)
+            if data is None:
+                data = attr(hash, return_type="json", **kwargs)
+                if self._is_final(name, data):
+                    self.set(name, hash, data)
+
+            return data if return_type == "json" else convert_json_to_object(data)
+
+        return call
+
+    def get(self, endpoint: str, tx_hash: str) -> dict or list or None:
+        """Return the cached response (json) of an endpoint, `None` if not cached."""
+        data = self._lru.get((endpoint, tx_hash))
+        if data is None:
+            row = TxData.objects.filter(tx_hash=tx_hash, endpoint=endpoint).first()
+            if row is None:
+                return None
+            data = row.data
+            self._lru.set((endpoint, tx_hash), data)
+
+        return data
+
+    def set(self, endpoint: str, tx_hash: str, data: dict or list) -> None:
+        """Cache the response (json) of an endpoint, once and for all."""
+        TxData.objects.get_or_create(
+            tx_hash=tx_hash, endpoint=endpoint, defaults={"data": data}
+        )
+        self._lru.set((endpoint, tx_hash), data)
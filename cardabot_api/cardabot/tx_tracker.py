@@ -0,0 +1,205 @@
+"""Track the lifecycle of transactions (`TrackedTransaction` rows).
+
+Transactions are tracked from the moment they are built (`UnsignedTransaction`) or
+submitted (claim payouts): signed, submitted (optionally by CardaBot, in background),
+in a block, and confirmed once `CONFIRMATIONS` blocks deep. Transactions that don't
+make it into a block within `EXPIRE_AFTER` (or by their `ttl`, if any) are expired.
+Transactions reaching a final status (confirmed, expired or failed) are announced with
+the `tx_settled` signal (see `claims.py`).
+
+A single job polls the pending transactions in batches, least recently checked first
+(and the tip, for the confirmations of all of them at once), so the bot reads their
+status from the database instead of polling blockfrost for each one. Pending
+transactions only expire after a lookup didn't find them, and transactions in a block
+are looked up again until confirmed: a rolled back one is pending again.
+"""
+
+import logging
+from concurrent.futures import ThreadPoolExecutor
+from datetime import datetime, timedelta
+
+from django.core.cache import cache
+from django.db.models import F
+from django.dispatch import Signal
+from django.utils import timezone
+
+from . import tx
+from .models import TrackedTransaction, UnsignedTransaction
+from .utils import ApiError, BlockFrostAPI, Scheduler
+
+TRACK_INTERVAL = 20  # seconds
+LOOKUP_BATCH = 50  # pending txs looked up per run
+CONFIRMATIONS = 10  # blocks (tx's included) to consider a tx confirmed
+EXPIRE_AFTER = timedelta(hours=2)  # for txs built without ttl
+MAX_WORKERS = 8  # concurrent tx requests
+
+PENDING = (TrackedTransaction.SIGNED, TrackedTransaction.SUBMITTED)
+OPEN = (TrackedTransaction.BUILT, *PENDING, TrackedTransaction.IN_BLOCK)
+LOOKED_UP = (*PENDING, TrackedTransaction.IN_BLOCK)  # until confirmed (rollbacks)
+
+_executor = ThreadPoolExecutor(max_workers=MAX_WORKERS, thread_name_prefix="tracker")
+
+# sent with `tx_ids` and their final `status` (`CONFIRMED`, `EXPIRED` or `FAILED`)
+tx_settled = Signal()
+
+
+def _settle(tx_ids: list[str], status: str) -> None:
+    """Set the final status of transactions, and announce it."""
+    if tx_ids:
+        TrackedTransaction.objects.filter(pk__in=tx_ids).update(status=status)
+        tx_settled.send(sender=TrackedTransaction, tx_ids=tx_ids, status=status)
+
+
+def track_built(unsigned_tx: UnsignedTransaction) -> TrackedTransaction:
+    """Start tracking an unsigned transaction."""
+    tracked, _ = TrackedTransaction.objects.update_or_create(
+        tx_id=unsigned_tx.tx_id,
+        defaults={"unsigned_tx": unsigned_tx, "status": TrackedTransaction.BUILT},
+    )  # the same tx may be built twice (no ttl)
+    return tracked
+
+
+def track_signed(
+    unsigned_tx: UnsignedTransaction, signed_cbor: str, submit: bool = False
+) -> TrackedTransaction:
+    """Mark a transaction as signed, submitting it in background if `submit`."""
+    tracked, _ = TrackedTransaction.objects.update_or_create(
+        tx_id=unsigned_tx.tx_id,
+        defaults={
+            "unsigned_tx": unsigned_tx,
+            "status": TrackedTransaction.SIGNED,
+            "signed_cbor": signed_cbor if submit else None,
+        },
+    )
+    if submit:
+        Scheduler.queue.add_job(submit_transaction, args=[tracked.tx_id])
+    return tracked
+
+
+def track_submitted(tx_id: str, ttl: int = None) -> TrackedTransaction:
+    """Start tracking a transaction submitted by CardaBot, valid until slot `ttl`."""
+    tracked, _ = TrackedTransaction.objects.update_or_create(
+        tx_id=tx_id, defaults={"status": TrackedTransaction.SUBMITTED, "ttl": ttl}
+    )
+    return tracked
+
+
+def submit_transaction(tx_id: str) -> None:
+    """Submit a signed transaction (see `track_signed`)."""
+    tracked = TrackedTransaction.objects.get(pk=tx_id)
+    try:
+        tx.ChainContext.context.submit_tx(tracked.signed_cbor)
+    except Exception as e:
+        logging.exception(
+            repr({"message": "Tx submission failed.", "data": {"tx_id": tx_id}})
+        )
+        tracked.detail = repr(e)[:256]
+        tracked.save()
+        _settle([tx_id], TrackedTransaction.FAILED)
+    else:
+        tracked.status = TrackedTransaction.SUBMITTED
+        tracked.save()
+
+
+def _lookup(tx_id: str):
+    """Return the transaction details, `None` if it isn't in a block (yet)."""
+    try:
+        return BlockFrostAPI.api.transaction(tx_id)
+    except ApiError as e:
+        if e.status_code == 404:
+            return None
+        raise
+
+
+def _expired(tracked: TrackedTransaction, tip_slot: int, now: datetime) -> bool:
+    """Check whether a tx not found in a block (just looked up) won't ever land."""
+    if tracked.ttl is not None:
+        return tip_slot > tracked.ttl
+    return tracked.updated_at < now - EXPIRE_AFTER  # no ttl, give up after a while
+
+
+def track_transactions() -> int:
+    """Update the status of the open transactions (see module docstring).
+
+    Returns:
+        The number of transactions found in a block.
+    """
+    lock_key = "tx_tracker:lock"
+    if not cache.add(lock_key, True, timeout=TRACK_INTERVAL * 10):
+        return 0  # another worker is tracking
+
+    try:
+        # built txs aren't looked up (they may never be signed), they just expire
+        expired = TrackedTransaction.objects.filter(
+            status=TrackedTransaction.BUILT,
+            updated_at__lt=timezone.now() - EXPIRE_AFTER,
+        )
+        _settle(list(expired.values_list("pk", flat=True)), TrackedTransaction.EXPIRED)
+
+        # the tip is taken before the lookups: a tx missing past its ttl never lands
+        tip = BlockFrostAPI.api.block_latest()
+        now = timezone.now()
+        pending = list(
+            TrackedTransaction.objects.filter(status__in=LOOKED_UP).order_by(
+                F("last_checked_at").asc(nulls_first=True)
+            )[:LOOKUP_BATCH]
+        )
+        found, expired, verified = 0, [], []
+        for tracked, info in zip(
+            pending, _executor.map(_lookup, [tracked.tx_id for tracked in pending])
+        ):
+            tracked.last_checked_at = now
+            if info is None and tracked.status == TrackedTransaction.IN_BLOCK:
+                # rolled back, back to the mempool (or to expire)
+                tracked.status = TrackedTransaction.SUBMITTED
+                tracked.block_height, tracked.confirmations = None, 0
+                tracked.save()
+                continue
+            if info is None:
+                if _expired(tracked, tip.slot, now):
+                    expired.append(tracked.tx_id)
+                tracked.save(update_fields=["last_checked_at"])
+                continue
+
+            found += tracked.status != TrackedTransaction.IN_BLOCK
+            tracked.status = TrackedTransaction.IN_BLOCK
+            tracked.block_height = info.block_height  # may change after a rollback
+            tracked.fees = int(info.fees)
+            tracked.output_amount = tx.amounts_to_lovelace(info.output_amount)
+            tracked.save()
+            verified.append(tracked.tx_id)
+
+        _settle(expired, TrackedTransaction.EXPIRED)
+
+        # confirmations of all txs in a block, from the tip, confirmed once deep enough
+        # and (just) found again in their block
+        in_block = TrackedTransaction.objects.filter(status=TrackedTransaction.IN_BLOCK)
+        in_block.update(confirmations=tip.height - F("block_height") + 1)
+        confirmed = in_block.filter(pk__in=verified, confirmations__gte=CONFIRMATIONS)
+        _settle(
+            list(confirmed.values_list("pk", flat=True)), TrackedTransaction.CONFIRMED
+        )
+    finally:
+        cache.delete(lock_key)
+
+    logging.debug(
+        repr(
+            {
+                "message": "Transactions tracked.",
+                "data": {"pending": len(pending), "found": found, "tip": tip.height},
+            }
+        )
+    )
+    return found
+
+
+def track_transactions_cron():
+    """Track the open transactions periodically."""
+
+    Scheduler.queue.add_job(
+        track_transactions,
+        "interval",
+        seconds=TRACK_INTERVAL,
+        start_date=datetime.now(),
+        id="track_transactions",
+    )
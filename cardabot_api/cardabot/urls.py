@@ -17,14 +17,21 @@ urlpatterns = [
     path("chats/<str:chat_id>/", views.ChatDetail.as_view()),
     path("chats/<str:chat_id>/token/", views.TemporaryChatToken.as_view()),
     path("chats/<str:chat_id>/balance/", views.ChatIdBalance.as_view()),
+    path("chats/<str:chat_id>/txs/", views.ChatTransactions.as_view()),
+    path("balances/", views.Balances.as_view()),
     path("users/", views.CardaBotUserList.as_view()),
     path("users/<int:pk>/", views.CardaBotUserDetail.as_view()),
     path("connect/", views.CreateAndConnectUser.as_view()),
     path("unsignedtx/", views.UnsignedTransaction.as_view()),
+    path("unsignedtx/bulk/", views.BulkUnsignedTransaction.as_view()),
     path("unsignedtx/<str:pk>/", views.UnsignedTransaction.as_view()),
     path("tx/", views.Transaction.as_view()),
     path("checktx/<tx_id>/", views.CheckTransaction.as_view()),
     path("claim/", views.ClaimUserFunds.as_view()),
+    path("claim/<uuid:ticket>/", views.ClaimUserFunds.as_view()),
+    path("epochs/", views.EpochSnapshotList.as_view()),
+    path("pools/", views.StakePoolList.as_view()),
+    path("pools/top/", views.StakePoolLeaderboard.as_view()),
     *graphql_urls,
 ]
 
@@ -1,20 +1,141 @@
 """Helper functions for the cardabot endpoints."""
 
-import os
+import asyncio
+import weakref
+from concurrent.futures import ThreadPoolExecutor
 from dataclasses import dataclass
+from typing import Callable, Iterator
 
+import httpx
 from apscheduler.schedulers.background import BackgroundScheduler
-from blockfrost import ApiError, ApiUrls, BlockFrostApi
+from blockfrost import ApiError
+from blockfrost.utils import convert_json_to_object
+from django.core.cache import cache
+
+from . import addresses
+from .blockfrost_client import (
+    BLOCKFROST,
+    MAX_RETRIES,
+    BlockFrostClient,
+    Priority,
+    retry_delay,
+)
+from .models import StakePoolIndex
+from .singleflight import SingleFlightAPI
+from .tx_cache import TxCacheAPI
+
+POOL_EXISTS_TTL = 24 * 60 * 60  # seconds, pools are retired, not deleted
+POOL_MISSING_TTL = 5 * 60  # seconds, a pool may be registered meanwhile
+
+
+class AsyncHTTPPool:
+    """Pooled keep-alive `httpx.AsyncClient`s, one per event loop.
+
+    Connections can't be shared between event loops, and sync workers run every async
+    view in a new loop, so each loop gets its own client. A client is closed when its
+    loop shuts down (which cancels the tasks left, see `_close_on_shutdown`).
+    """
+
+    def __init__(self, **client_kwargs) -> None:
+        self.client_kwargs = {
+            "limits": httpx.Limits(max_connections=100, max_keepalive_connections=20),
+            **client_kwargs,
+        }
+        self._clients = weakref.WeakKeyDictionary()
+        self._closers = set()  # tasks must be referenced until done
+
+    def client(self) -> httpx.AsyncClient:
+        """Return the http client of the running event loop."""
+        loop = asyncio.get_running_loop()
+        if loop not in self._clients:
+            self._clients[loop] = httpx.AsyncClient(**self.client_kwargs)
+            closer = loop.create_task(self._close_on_shutdown(self._clients[loop]))
+            self._closers.add(closer)
+            closer.add_done_callback(self._closers.discard)
+        return self._clients[loop]
+
+    @staticmethod
+    async def _close_on_shutdown(client: httpx.AsyncClient) -> None:
+        """Wait until cancelled (by the loop shutdown), then close the client."""
+        try:
+            await asyncio.Future()
+        finally:
+            await client.aclose()
+
+
+class AsyncBlockFrostAPI:
+    """Async wrapper for the Blockfrost endpoints used in `tx.py`.
+
+    Responses are converted the same way `blockfrost.BlockFrostApi` does (objects with
+    attribute access) and failed requests raise `ApiError`. Requests share the rate
+    limiter of `api` (see `blockfrost_client.py`), in the `priority` lane.
+    """
+
+    def __init__(self, api: BlockFrostClient, priority: str = Priority.low) -> None:
+        self.url = api.url
+        self.limiter = api.limiter
+        self.priority = priority
+        self.pool = AsyncHTTPPool(
+            headers=api.default_headers, timeout=httpx.Timeout(20.0, connect=5.0)
+        )
+
+    async def _get(self, path: str, **params) -> list or dict:
+        for attempt in range(MAX_RETRIES + 1):
+            await self.limiter.aacquire(self.priority)
+            res = await self.pool.client().get(
+                f"{self.url}{path}",
+                params={
+                    key: value for key, value in params.items() if value is not None
+                },
+            )
+            if res.status_code != 429 or attempt == MAX_RETRIES:
+                break
+            self.limiter.pause(retry_delay(res, attempt))
+
+        if res.status_code != 200:
+            raise ApiError(res)
+        return res.json()
+
+    async def _get_pages(self, path: str, count: int = 100, **params) -> list:
+        """Gather all pages of a list endpoint."""
+        items, page = [], 1
+        while True:
+            page_items = await self._get(path, count=count, page=page, **params)
+            items.extend(page_items)
+            if len(page_items) < count:
+                return items
+            page += 1
+
+    async def address(self, address: str):
+        return convert_json_to_object(await self._get(f"/addresses/{address}"))
+
+    async def address_utxos(self, address: str):
+        return convert_json_to_object(
+            await self._get_pages(f"/addresses/{address}/utxos")
+        )
+
+    async def account_addresses(self, stake_address: str, order: str = None):
+        return convert_json_to_object(
+            await self._get_pages(f"/accounts/{stake_address}/addresses", order=order)
+        )
+
+    async def account_addresses_total(self, stake_address: str):
+        return convert_json_to_object(
+            await self._get(f"/accounts/{stake_address}/addresses/total")
+        )
+
+    async def transaction(self, hash: str):
+        return convert_json_to_object(await self._get(f"/txs/{hash}"))
+
+    async def transaction_metadata(self, hash: str, return_type: str = "object"):
+        metadata = await self._get(f"/txs/{hash}/metadata")
+        return metadata if return_type == "json" else convert_json_to_object(metadata)
 
 
 @dataclass
 class BlockFrostAPI:
-    base_url = (
-        ApiUrls.testnet.value
-        if os.environ["NETWORK"] == "testnet"
-        else ApiUrls.mainnet.value
-    )
-    api = BlockFrostApi(project_id=os.environ.get("BLOCKFROST_ID"), base_url=base_url)
+    # reads for display, low priority lane of the shared client
+    api = TxCacheAPI(SingleFlightAPI(BLOCKFROST.lane(Priority.low)))
 
 
 class Scheduler:
@@ -22,6 +143,47 @@ class Scheduler:
     queue.start()  # start scheduler
 
 
+PAGE_SIZE = 100  # items per page, blockfrost max
+_page_prefetcher = ThreadPoolExecutor(max_workers=8, thread_name_prefix="pages")
+
+
+def iter_pages(endpoint: Callable, *args, count: int = PAGE_SIZE, **kwargs) -> Iterator:
+    """Yield the pages of a paginated blockfrost endpoint, one at a time.
+
+    The next page is requested (in a background thread) while the caller works on the
+    current one; pages are only requested while the caller keeps iterating, so it can
+    stop as soon as it is done.
+
+    Args:
+        endpoint: blockfrost api method, e.g. `BlockFrostAPI.api.account_addresses`.
+        count: items per page.
+        args, kwargs: arguments of the endpoint (but `page` and `gather_pages`).
+    """
+    page = 1
+    future = _page_prefetcher.submit(endpoint, *args, count=count, page=page, **kwargs)
+    try:
+        while future is not None:
+            items = future.result()
+            page += 1
+            future = (
+                _page_prefetcher.submit(
+                    endpoint, *args, count=count, page=page, **kwargs
+                )
+                if len(items) == count
+                else None
+            )
+            yield items
+    finally:
+        if future is not None:
+            future.cancel()  # caller stopped early, drop the prefetched page
+
+
+def iter_items(endpoint: Callable, *args, **kwargs) -> Iterator:
+    """Yield the items of a paginated blockfrost endpoint, see `iter_pages`."""
+    for items in iter_pages(endpoint, *args, **kwargs):
+        yield from items
+
+
 def lovelace_to_ada(lovelace_value: int) -> float:
     """Take a value in lovelace and return it in ADA."""
     constant = 1e6
@@ -46,20 +208,37 @@ def calc_pool_saturation(pool_stake: int, circulating_supply: int, n_opt: int) -
 
 
 def check_pool_is_valid(pool_id: str) -> bool:
-    """Check if pool_id points to a valid pool or not."""
+    """Check if pool_id points to a valid (registered) pool or not.
 
-    try:
-        BlockFrostAPI.api.pool(pool_id=pool_id)
-        return True
-    except ApiError:
+    Malformed pool ids are rejected offline (see `addresses.py`). Well-formed ones are
+    looked up in the local pool index, then in the cache, and Blockfrost is only asked
+    about pools missing in both (e.g. registered after the last sync).
+    """
+    if not addresses.is_valid_pool_id(pool_id):
         return False
 
+    if StakePoolIndex.objects.filter(pool_id=pool_id).exists():
+        return True
+
+    key = f"pool_exists:{pool_id}"
+    exists = cache.get(key)
+    if exists is None:
+        try:
+            BlockFrostAPI.api.pool(pool_id=pool_id)
+            exists = True
+        except ApiError as e:
+            if e.status_code != 404:
+                return False  # unknown, don't cache it
+            exists = False
+        cache.set(key, exists, POOL_EXISTS_TTL if exists else POOL_MISSING_TTL)
+
+    return exists
+
 
 def check_stake_addr_is_valid(stake_addr: str) -> bool:
-    """Check if stake_addr points to a valid stake address or not."""
+    """Check if stake_addr is a valid stake address (of the network) or not.
 
-    try:
-        BlockFrostAPI.api.account_addresses(stake_addr)
-        return True
-    except ApiError:
-        return False
+    The check is offline (see `addresses.py`): the address doesn't need to be seen on
+    chain yet, e.g. for a new wallet.
+    """
+    return addresses.is_valid_stake_address(stake_addr)
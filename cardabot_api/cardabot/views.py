@@ -1,22 +1,53 @@
+import asyncio
 import os
 import secrets
 from dataclasses import dataclass
 
+from asgiref.sync import sync_to_async
+from django.db.models import Q
 from django.http import Http404
 from django.shortcuts import get_object_or_404
-from pycardano import Address, Network, VerificationKeyHash
+from pycardano import (
+    Address,
+    InvalidTransactionException,
+    Network,
+    UTxOSelectionException,
+    VerificationKeyHash,
+)
 from rest_framework import status
 from rest_framework.permissions import IsAuthenticated, IsAuthenticatedOrReadOnly
 from rest_framework.response import Response
 from rest_framework.views import APIView
 
-from . import tx, utils
-from .models import CardaBotUser, Chat
+from . import (
+    balances,
+    chat_cache,
+    claims,
+    pay_addresses,
+    pool_metrics,
+    tx,
+    tx_tracker,
+    utils,
+)
+from .chain_time import CHAIN_TIME
+from .models import (
+    CardaBotUser,
+    Chat,
+    Claim,
+    EpochSnapshot,
+    StakePoolIndex,
+    TrackedTransaction,
+)
 from .models import UnsignedTransaction as UnsignedTx
 from .serializers import (
+    BulkUnsignedTransactionSerializer,
     CardaBotUserSerializer,
     ChatSerializer,
+    ClaimSerializer,
+    EpochSnapshotSerializer,
+    StakePoolIndexSerializer,
     TemporaryTokenSerializer,
+    TrackedTransactionSerializer,
     UnsignedTransactionSerializer,
 )
 
@@ -27,6 +58,12 @@ class QueryParameters:
 
     client_filter = "client_filter"
     currency_format = "currency_format"
+    epoch_from = "from"
+    epoch_to = "to"
+    pool_ids = "ids"
+    search = "search"
+    top_n = "n"
+    sort = "sort"
 
 
 @dataclass
@@ -35,6 +72,49 @@ class BodyParameters:
 
     cardabot_user = "cardabot_user"  # holds user's stake address
     tmp_token = "tmp_token"
+    submit = "submit"
+
+
+class AsyncAPIView(APIView):
+    """An `APIView` whose handlers are coroutines (`async def get(...)`).
+
+    The view is flagged as a coroutine function, so Django awaits it natively under
+    ASGI (and runs it in an event loop under WSGI). Authentication and permission
+    checks (database access) run in a worker thread.
+    """
+
+    @classmethod
+    def as_view(cls, **initkwargs):
+        view = super().as_view(**initkwargs)
+        view._is_coroutine = asyncio.coroutines._is_coroutine
+        return view
+
+    async def dispatch(self, request, *args, **kwargs):
+        """Async version of `APIView.dispatch`."""
+        self.args = args
+        self.kwargs = kwargs
+        request = self.initialize_request(request, *args, **kwargs)
+        self.request = request
+        self.headers = self.default_response_headers
+
+        try:
+            await sync_to_async(self.initial)(request, *args, **kwargs)
+
+            if request.method.lower() in self.http_method_names:
+                handler = getattr(
+                    self, request.method.lower(), self.http_method_not_allowed
+                )
+            else:
+                handler = self.http_method_not_allowed
+
+            response = handler(request, *args, **kwargs)
+            if asyncio.iscoroutine(response):
+                response = await response
+        except Exception as exc:
+            response = self.handle_exception(exc)
+
+        self.response = self.finalize_response(request, response, *args, **kwargs)
+        return self.response
 
 
 class CardaBotUserList(APIView):
@@ -136,14 +216,18 @@ class ChatDetail(APIView):
 
     def delete(self, request, chat_id: str, format=None):
         chat = self._get_object_by_chat_id(
-            chat_id, request.query_params.get(QueryParameters.client_filter)
+            chat_id,
+            request.query_params.get(QueryParameters.client_filter),
+            cached=False,
         )
         chat.delete()
         return Response(status=status.HTTP_204_NO_CONTENT)
 
     def patch(self, request, chat_id: str, format=None):
         chat = self._get_object_by_chat_id(
-            chat_id, request.query_params.get(QueryParameters.client_filter)
+            chat_id,
+            request.query_params.get(QueryParameters.client_filter),
+            cached=False,
         )
 
         cardabot_user = request.data.get(BodyParameters.cardabot_user)
@@ -170,18 +254,20 @@ class ChatDetail(APIView):
             raise Http404("CardaBotUser not found.")
 
         chat.cardabot_user = CardaBotUser.objects.get(stake_key=stake_address)
-        chat.save()
+        chat.save(update_fields=["cardabot_user"])
         return chat
 
     @staticmethod
-    def _get_object_by_chat_id(chat_id: str, client: str = None):
-        """Return chat object by chat_id and client (if provided)."""
-        chats = Chat.objects.all()
-        if client is not None:
-            chats = chats.filter(client=client)
+    def _get_object_by_chat_id(chat_id: str, client: str = None, cached: bool = True):
+        """Return chat object by chat_id and client (if provided).
 
+        Chats are read through a cache (see `chat_cache.py`), unless not `cached` (to
+        be updated).
+        """
         try:
-            return chats.get(chat_id=chat_id)
+            if not cached:
+                return chat_cache.load_chat(chat_id, client)
+            return chat_cache.get_chat(chat_id, client)
             # !TODO: how to deal with MultipleObjectsReturned?
         except Chat.DoesNotExist:
             raise Http404
@@ -195,7 +281,9 @@ class TemporaryChatToken(APIView):
     def get(self, request, chat_id: str, format=None):
         """Generate a temporary token for this chat_id."""
         chat = ChatDetail._get_object_by_chat_id(
-            chat_id, request.query_params.get(QueryParameters.client_filter)
+            chat_id,
+            request.query_params.get(QueryParameters.client_filter),
+            cached=False,
         )
 
         tmp_token = secrets.token_urlsafe(nbytes=32)
@@ -276,6 +364,9 @@ class CreateAndConnectUser(APIView):
         chat.tmp_token = None  # reset token
         chat.save()
 
+        # resolve the pay address in background, before the first tip or claim
+        utils.Scheduler.queue.add_job(pay_addresses.warm, args=[staking_address])
+
         return Response(
             {
                 "success": f"CardaBotUser `{staking_address}` connected to chat `{chat.chat_id}`",
@@ -302,6 +393,19 @@ class UnsignedTransaction(APIView):
 
     permission_classes = (IsAuthenticatedOrReadOnly,)
 
+    @staticmethod
+    def _build_error_response(e: Exception) -> Response:
+        """Return the response to a tx that failed to build (see `tx.py`)."""
+        if isinstance(e, UTxOSelectionException):  # no room left for the change
+            return Response(
+                {"detail": "Sender doesn't have enough funds to complete the tx."},
+                status=status.HTTP_406_NOT_ACCEPTABLE,
+            )
+        return Response(  # over the max tx size
+            {"detail": "The tx is too large, try with fewer receivers."},
+            status=status.HTTP_400_BAD_REQUEST,
+        )
+
     def get(self, request, pk: str, format=None):
         """Get (unsigned) transaction details."""
         unsigtx_obj = get_object_or_404(UnsignedTx, pk=pk)
@@ -328,8 +432,9 @@ class UnsignedTransaction(APIView):
         Raises:
             - Http406 if sender or receiver is not connect (no wallet registered)
             - Http406 if sender doesn't have enough balance for tx
+            - Http406 if a receiver wallet has no on-chain address yet
             - Http404 if chat_id (sender or receiver) does not exist
-            - Http500 if unsigned tx fails to build
+            - Http400 if the tx exceeds the max tx size
         """
         sender_chat = ChatDetail._get_object_by_chat_id(
             chat_id=request.data.get("chat_id_sender"),
@@ -350,30 +455,38 @@ class UnsignedTransaction(APIView):
         if not receiver_chat.cardabot_user:
             # receiver is not connected, hold their assets temporarily
             receiver_addr = os.environ.get("CARDABOT_STAKE_KEY")
-            metadata = {674: {"msg": [f"{request.data.get('chat_id_receiver')}"]}}
+            metadata = tx.custody_metadata([request.data.get("chat_id_receiver")])
         else:
             receiver_addr = receiver_chat.cardabot_user.stake_key
             metadata = {}
 
         sender_addr = sender_chat.cardabot_user.stake_key
-        receiver_payaddr = tx.get_pay_addr_from_stake_addr(receiver_addr)
+        receiver_payaddr = pay_addresses.get_pay_addr(receiver_addr)
+        if receiver_payaddr is None:
+            return Response(
+                {"detail": "Receiver wallet has no on-chain address yet."},
+                status=status.HTTP_406_NOT_ACCEPTABLE,
+            )
 
-        sel_addrs = tx.select_pay_addr(
+        inputs = tx.select_utxos(
             stake_addr=sender_addr,
             recipients=[(receiver_payaddr, float(request.data.get("amount")))],
         )
 
-        if not sel_addrs:
+        if not inputs:
             return Response(
                 {"detail": "Sender doesn't have enough funds to complete the tx."},
                 status=status.HTTP_406_NOT_ACCEPTABLE,
             )
 
-        unsigtx = tx.build_unsigned_transaction(
-            sel_addrs,
-            recipients=[(receiver_payaddr, float(request.data.get("amount")))],
-            metadata=metadata,
-        )
+        try:
+            unsigtx = tx.build_unsigned_transaction(
+                inputs,
+                recipients=[(receiver_payaddr, float(request.data.get("amount")))],
+                metadata=metadata,
+            )
+        except (UTxOSelectionException, InvalidTransactionException) as e:
+            return UnsignedTransaction._build_error_response(e)
 
         # store tx info in db
         unsigtx_obj = UnsignedTx(
@@ -385,6 +498,155 @@ class UnsignedTransaction(APIView):
             username_receiver=request.data.get("username_receiver"),
         )
         unsigtx_obj.save()
+        tx_tracker.track_built(unsigtx_obj)
+
+        return Response(
+            UnsignedTransactionSerializer(unsigtx_obj).data,
+            status=status.HTTP_201_CREATED,
+        )
+
+
+class BulkUnsignedTransaction(APIView):
+    """
+    Create a new tx to several receivers ("tip rain").
+    """
+
+    MAX_RECEIVERS = 100  # one output each, the tx must fit in the max tx size
+
+    permission_classes = (IsAuthenticated,)
+
+    def post(self, request, format=None):
+        """Build a new unsigned tx, paying `amount` to each receiver.
+
+        The tx has one output per receiver. Non-connected receivers get theirs in the
+        CardaBot wallet, tracked by the chat ids in the tx metadata (see `custody.py`).
+
+        Body params:
+            - chat_id_sender (str): the chat id of the sender
+            - chat_ids_receiver (list[str]): the chat ids of the receivers, at most
+              `MAX_RECEIVERS`
+            - amount (float): amount in ADA, per receiver
+            - client (str or None): client app (TELEGRAM, DISCORD, etc)
+
+        Returns:
+            - a json with the transaction id `tx_id` (201 status code).
+
+        Raises:
+            - Http406 if sender is not connect (no wallet registered)
+            - Http406 if sender doesn't have enough balance for tx
+            - Http406 if a receiver wallet has no on-chain address yet
+            - Http404 if chat_id (sender or receivers) does not exist
+            - Http400 if the receivers or amount are invalid, or too many receivers
+            - Http400 if the tx exceeds the max tx size
+            - Http503 if the CardaBot wallet (for non-connected receivers) is unavailable
+        """
+        serializer = BulkUnsignedTransactionSerializer(data=request.data)
+        if not serializer.is_valid():
+            return Response(serializer.errors, status=status.HTTP_400_BAD_REQUEST)
+
+        chat_ids = list(dict.fromkeys(serializer.validated_data["chat_ids_receiver"]))
+        if len(chat_ids) > self.MAX_RECEIVERS:
+            return Response(
+                {"detail": f"At most {self.MAX_RECEIVERS} receivers are allowed."},
+                status=status.HTTP_400_BAD_REQUEST,
+            )
+        amount = serializer.validated_data["amount"]
+
+        sender_chat = ChatDetail._get_object_by_chat_id(
+            chat_id=request.data.get("chat_id_sender"),
+            client=request.data.get("client"),
+        )
+
+        if not sender_chat.cardabot_user:
+            return Response(
+                {"detail": "Sender is not connected!"},
+                status=status.HTTP_406_NOT_ACCEPTABLE,
+            )
+
+        # all receivers in one query
+        chats = Chat.objects.filter(chat_id__in=chat_ids).select_related(
+            "cardabot_user"
+        )
+        if request.data.get("client") is not None:
+            chats = chats.filter(client=request.data.get("client"))
+        receiver_chats = {chat.chat_id: chat for chat in chats}
+
+        missing = [chat_id for chat_id in chat_ids if chat_id not in receiver_chats]
+        if missing:
+            return Response(
+                {"detail": f"Chats do not exist: {missing}."},
+                status=status.HTTP_404_NOT_FOUND,
+            )
+
+        receiver_chats = [receiver_chats[chat_id] for chat_id in chat_ids]
+        connected = [chat for chat in receiver_chats if chat.cardabot_user]
+        not_connected = [chat for chat in receiver_chats if not chat.cardabot_user]
+
+        # pay addresses (and the CardaBot wallet's), missing ones requested concurrently
+        custody_addr = os.environ.get("CARDABOT_STAKE_KEY") if not_connected else None
+        pay_addrs = pay_addresses.get_pay_addrs(
+            [chat.cardabot_user.stake_key for chat in connected]
+            + ([custody_addr] if custody_addr else [])
+        )
+        if not_connected and pay_addrs.get(custody_addr) is None:
+            return Response(
+                {
+                    "detail": "CardaBot wallet is unavailable, receivers not connected: "
+                    f"{[chat.chat_id for chat in not_connected]}."
+                },
+                status=status.HTTP_503_SERVICE_UNAVAILABLE,
+            )
+
+        no_address = [
+            chat.chat_id
+            for chat in connected
+            if pay_addrs[chat.cardabot_user.stake_key] is None
+        ]
+        if no_address:
+            return Response(
+                {
+                    "detail": "Receiver wallets have no on-chain address yet: "
+                    f"{no_address}."
+                },
+                status=status.HTTP_406_NOT_ACCEPTABLE,
+            )
+
+        recipients = [
+            (pay_addrs[chat.cardabot_user.stake_key], float(amount))
+            for chat in connected
+        ] + [(pay_addrs[custody_addr], float(amount)) for _ in not_connected]
+        metadata = (
+            tx.custody_metadata([chat.chat_id for chat in not_connected])
+            if not_connected
+            else {}
+        )
+
+        inputs = tx.select_utxos(
+            stake_addr=sender_chat.cardabot_user.stake_key, recipients=recipients
+        )
+
+        if not inputs:
+            return Response(
+                {"detail": "Sender doesn't have enough funds to complete the tx."},
+                status=status.HTTP_406_NOT_ACCEPTABLE,
+            )
+
+        try:
+            unsigtx = tx.build_unsigned_transaction(
+                inputs, recipients=recipients, metadata=metadata
+            )
+        except (UTxOSelectionException, InvalidTransactionException) as e:
+            return UnsignedTransaction._build_error_response(e)
+
+        # store tx info in db
+        unsigtx_obj = UnsignedTx.objects.create(
+            tx_id=str(unsigtx.id),
+            tx_cbor=str(unsigtx.to_cbor()),
+            sender_chat=sender_chat,
+            amount=amount,
+        )
+        unsigtx_obj.receiver_chats.set(receiver_chats)
+        tx_tracker.track_built(unsigtx_obj)
 
         return Response(
             UnsignedTransactionSerializer(unsigtx_obj).data,
@@ -394,11 +656,22 @@ class UnsignedTransaction(APIView):
 
 class Transaction(APIView):
     def post(self, request, format=None):
-        """Compose a signed transaction using using the witness."""
+        """Compose a signed transaction using using the witness.
+
+        Body params:
+            - tx_id (str): the id of the unsigned tx
+            - witness (str): witness returned after signing tx, in cbor format
+            - submit (bool): submit the tx in background (default: False)
+        """
         unsigtx_obj = get_object_or_404(UnsignedTx, pk=request.data.get("tx_id"))
         signed_tx = tx.compose_signed_transaction(
             unsigned_tx=unsigtx_obj.tx_cbor, witness=request.data.get("witness")
         )
+        tx_tracker.track_signed(
+            unsigtx_obj,
+            signed_tx,
+            submit=str(request.data.get(BodyParameters.submit)).lower() == "true",
+        )
 
         return Response({"tx": signed_tx}, status=status.HTTP_200_OK)
 
@@ -409,7 +682,28 @@ class CheckTransaction(APIView):
     permission_classes = (IsAuthenticated,)
 
     def get(self, request, tx_id: str, format=None):
-        """Get info about a transaction."""
+        """Get info about a transaction.
+
+        Transactions followed by the tracker (see `tx_tracker.py`) are read from the
+        database, any other one (e.g. built, or expired) from Blockfrost.
+        """
+        tracked = TrackedTransaction.objects.filter(
+            pk=tx_id, status__in=(*tx_tracker.LOOKED_UP, TrackedTransaction.CONFIRMED)
+        ).first()
+        if tracked is not None:
+            if tracked.block_height is None:
+                return Response(
+                    {
+                        "detail": "Transaction not found: not in a block yet.",
+                        "status": tracked.status,
+                    },
+                    status=status.HTTP_404_NOT_FOUND,
+                )
+
+            return Response(
+                TrackedTransactionSerializer(tracked).data, status=status.HTTP_200_OK
+            )
+
         try:
             tx_info = utils.BlockFrostAPI.api.transaction(tx_id)
         except utils.ApiError as e:
@@ -434,7 +728,35 @@ class CheckTransaction(APIView):
         return Response(res, status=status.HTTP_200_OK)
 
 
-class ChatIdBalance(APIView):
+class ChatTransactions(APIView):
+    """List the open (not yet confirmed) transactions of a chat, sent or received.
+
+    Query params:
+        - client_filter (str): client app (TELEGRAM, DISCORD, etc).
+    """
+
+    permission_classes = (IsAuthenticated,)
+
+    def get(self, request, chat_id: str, format=None):
+        chat = ChatDetail._get_object_by_chat_id(
+            chat_id, request.query_params.get(QueryParameters.client_filter)
+        )
+        txs = (
+            TrackedTransaction.objects.filter(
+                Q(unsigned_tx__sender_chat=chat)
+                | Q(unsigned_tx__receiver_chat=chat)
+                | Q(unsigned_tx__receiver_chats=chat),
+                status__in=tx_tracker.OPEN,
+            )
+            .distinct()
+            .order_by("-created_at")
+        )
+
+        serializer = TrackedTransactionSerializer(txs, many=True)
+        return Response(serializer.data, status=status.HTTP_200_OK)
+
+
+class ChatIdBalance(AsyncAPIView):
     """Returns ADA balance associated with a `chat_id`.
 
     There are two possible types of balances:
@@ -446,10 +768,10 @@ class ChatIdBalance(APIView):
 
     permission_classes = (IsAuthenticated,)
 
-    def get(self, request, chat_id: str, format=None):
+    async def get(self, request, chat_id: str, format=None):
         """Get chat_id balance."""
         try:
-            chat = ChatDetail._get_object_by_chat_id(
+            stake_key = await self._get_stake_key(
                 chat_id=chat_id,
                 client=request.query_params.get(QueryParameters.client_filter),
             )
@@ -459,35 +781,78 @@ class ChatIdBalance(APIView):
                 status=status.HTTP_404_NOT_FOUND,
             )
 
-        # get user controlled balance
-        if chat.cardabot_user:
-            controlled_amount = utils.lovelace_to_ada(
-                tx.stake_addr_balance(chat.cardabot_user.stake_key)
-            )
-        else:
-            controlled_amount = 0.0  # user not connected
+        balance = (await balances.abalances({chat_id: stake_key}))[chat_id]
+
+        res = {
+            "controlled_amount": utils.lovelace_to_ada(balance["controlled"]),
+            "claimable_amount": utils.lovelace_to_ada(balance["claimable"]),
+        }
+
+        return Response(res, status=status.HTTP_200_OK)
+
+    @staticmethod
+    @sync_to_async
+    def _get_stake_key(chat_id: str, client: str = None) -> str or None:
+        """Return the stake key of the user connected to a chat (`None` if any)."""
+        chat = ChatDetail._get_object_by_chat_id(chat_id=chat_id, client=client)
+        return chat.cardabot_user.stake_key if chat.cardabot_user else None
+
 
-        # get user claimable balance (from CardaBot wallet)
-        claimable_utxos = tx.filter_utxos_by_metadata(chat_id)
-        if claimable_utxos:
-            claimable_amount = utils.lovelace_to_ada(
-                sum(utxo.output.amount for utxo in claimable_utxos)
+class Balances(AsyncAPIView):
+    """Returns the ADA balances (see `ChatIdBalance`) of many chats at once.
+
+    Body params:
+        - chat_ids (list[str]): the chat ids, at most `MAX_CHAT_IDS`
+        - client (str): client app (TELEGRAM, DISCORD, etc). Optional.
+
+    Returns:
+        - Http200 with the balances by chat id, and the chat ids not found
+        - Http400 if there are no chat ids, or too many
+    """
+
+    MAX_CHAT_IDS = 500
+
+    permission_classes = (IsAuthenticated,)
+
+    async def post(self, request, format=None):
+        chat_ids = list(dict.fromkeys(request.data.get("chat_ids") or []))
+        if not chat_ids or len(chat_ids) > self.MAX_CHAT_IDS:
+            return Response(
+                {"detail": f"Between 1 and {self.MAX_CHAT_IDS} chat ids are needed."},
+                status=status.HTTP_400_BAD_REQUEST,
             )
-        else:
-            claimable_amount = 0.0  # no claimable utxos
+
+        stake_keys = await self._get_stake_keys(chat_ids, request.data.get("client"))
+        chat_balances = await balances.abalances(stake_keys)
 
         res = {
-            "controlled_amount": controlled_amount,
-            "claimable_amount": claimable_amount,
+            "balances": {
+                chat_id: {
+                    "controlled_amount": utils.lovelace_to_ada(balance["controlled"]),
+                    "claimable_amount": utils.lovelace_to_ada(balance["claimable"]),
+                }
+                for chat_id, balance in chat_balances.items()
+            },
+            "not_found": [chat_id for chat_id in chat_ids if chat_id not in stake_keys],
         }
 
         return Response(res, status=status.HTTP_200_OK)
 
+    @staticmethod
+    @sync_to_async
+    def _get_stake_keys(chat_ids: list[str], client: str = None) -> dict:
+        """Return the stake key of the user connected to each chat (single query)."""
+        chats = Chat.objects.filter(chat_id__in=chat_ids)
+        if client is not None:
+            chats = chats.filter(client=client)
+        return dict(chats.values_list("chat_id", "cardabot_user__stake_key"))
+
 
 class ClaimUserFunds(APIView):
     """Claim user funds.
 
-    Claim user funds that are being held temporarily.
+    Claim user funds that are being held temporarily. Claims are queued and paid out in
+    batches (see `claims.py`), the response has a `ticket` to poll the claim with.
 
     Body params:
         - chat_id_receiver (str): the chat id of the user
@@ -495,8 +860,8 @@ class ClaimUserFunds(APIView):
     Raises:
         - Http406 if sender or receiver is not connect (no wallet registered)
         - Http406 if sender doesn't have enough balance for tx
+        - Http406 if receiver wallet has no on-chain address yet
         - Http404 if chat_id (receiver) does not exist
-        - Http500 if unsigned tx fails to build
     """
 
     permission_classes = (IsAuthenticated,)
@@ -519,19 +884,204 @@ class ClaimUserFunds(APIView):
                 status=status.HTTP_406_NOT_ACCEPTABLE,
             )
 
-        receiver_payaddr = tx.get_pay_addr_from_stake_addr(
+        receiver_payaddr = pay_addresses.get_pay_addr(
             receiver_chat.cardabot_user.stake_key
         )
+        if receiver_payaddr is None:
+            return Response(
+                {"detail": "Receiver wallet has no on-chain address yet."},
+                status=status.HTTP_406_NOT_ACCEPTABLE,
+            )
 
-        res = tx.claim_user_funds(
+        claim = claims.enqueue_claim(
             chat_id=request.data.get("chat_id_receiver"),
             receiver_address=receiver_payaddr,
         )
 
-        if not res:
+        if not claim:
             return Response(
                 {"detail": "User doesn't have any funds to claim."},
                 status=status.HTTP_406_NOT_ACCEPTABLE,
             )
 
-        return Response({"tx_id": res.get("tx_id")}, status=status.HTTP_200_OK)
+        serializer = ClaimSerializer(claim)
+        return Response(serializer.data, status=status.HTTP_202_ACCEPTED)
+
+    def get(self, request, ticket: str, format=None):
+        """Get the status of a claim (`PENDING`, `SUBMITTED`, `CONFIRMED`, `FAILED`)."""
+        claim = get_object_or_404(Claim, ticket=ticket)
+        serializer = ClaimSerializer(claim)
+        return Response(serializer.data, status=status.HTTP_200_OK)
+
+
+class EpochSnapshotList(APIView):
+    """List the stored chain data of a range of epochs (see `epochs.py`).
+
+    Query params:
+        - from (int): first epoch of the range (default: 10 epochs before `to`).
+        - to (int): last epoch of the range (default: current epoch).
+        - currency_format (str): currency format (ADA or LOVELACE).
+    """
+
+    permission_classes = (IsAuthenticated,)
+
+    max_range = 100  # epochs
+    lovelace_fields = (
+        "fees",
+        "treasury",
+        "reserves",
+        "rewards",
+        "utxo",
+        "deposits",
+        "pot_fees",
+        "min_pool_cost",
+        "min_utxo_value",
+    )
+
+    def get(self, request, format=None):
+        try:
+            epoch_to = int(
+                request.query_params.get(QueryParameters.epoch_to, CHAIN_TIME.epoch())
+            )
+            epoch_from = int(
+                request.query_params.get(QueryParameters.epoch_from, epoch_to - 9)
+            )
+        except ValueError:
+            return Response(
+                {"detail": "Query params `from` and `to` must be epoch numbers."},
+                status=status.HTTP_400_BAD_REQUEST,
+            )
+
+        if epoch_from > epoch_to or epoch_to - epoch_from >= self.max_range:
+            return Response(
+                {"detail": f"Invalid epoch range (max {self.max_range} epochs)."},
+                status=status.HTTP_400_BAD_REQUEST,
+            )
+
+        snapshots = EpochSnapshot.objects.filter(
+            epoch__gte=epoch_from, epoch__lte=epoch_to
+        ).order_by("epoch")
+        data = EpochSnapshotSerializer(snapshots, many=True).data
+
+        currency = request.query_params.get(QueryParameters.currency_format)
+        for epoch in data:
+            fields = [f for f in self.lovelace_fields if epoch[f] is not None]
+            epoch.update(
+                zip(fields, utils.values_to_ada([epoch[f] for f in fields], currency))
+            )
+
+        return Response({"data": data}, status=status.HTTP_200_OK)
+
+
+class StakePoolList(APIView):
+    """List stake pools from the local pool index (see `pool_index.py`).
+
+    Query params:
+        - ids (str): comma separated pool ids (BECH32), to get several pools at once.
+        - search (str): ticker or name prefix (case insensitive), to find a pool.
+        - currency_format (str): currency format (ADA or LOVELACE).
+    """
+
+    permission_classes = (IsAuthenticated,)
+
+    max_ids = 100
+    max_results = 20  # search results
+    lovelace_fields = ("pledge", "fixed_cost", "active_stake")
+
+    def get(self, request, format=None):
+        ids = request.query_params.get(QueryParameters.pool_ids)
+        search = request.query_params.get(QueryParameters.search, "").strip()
+
+        if ids:
+            ids = [pool_id.strip() for pool_id in ids.split(",") if pool_id.strip()]
+            if len(ids) > self.max_ids:
+                return Response(
+                    {"detail": f"Too many pool ids (max {self.max_ids})."},
+                    status=status.HTTP_400_BAD_REQUEST,
+                )
+            pools = StakePoolIndex.objects.filter(pool_id__in=ids)
+        elif search:
+            pools = self._search(search)
+        else:
+            return Response(
+                {"detail": "Query param `ids` or `search` is required."},
+                status=status.HTTP_400_BAD_REQUEST,
+            )
+
+        data = StakePoolIndexSerializer(pools, many=True).data
+
+        currency = request.query_params.get(QueryParameters.currency_format)
+        for pool in data:
+            pool.update(
+                zip(
+                    self.lovelace_fields,
+                    utils.values_to_ada(
+                        [pool[f] for f in self.lovelace_fields], currency
+                    ),
+                )
+            )
+
+        return Response({"data": data}, status=status.HTTP_200_OK)
+
+    def _search(self, prefix: str) -> list:
+        """Return the pools whose ticker (first) or name starts with `prefix`."""
+        by_stake = StakePoolIndex.objects.order_by("-active_stake")
+        pools = list(by_stake.filter(ticker__istartswith=prefix)[: self.max_results])
+        if len(pools) < self.max_results:
+            pools += by_stake.filter(name__istartswith=prefix).exclude(
+                ticker__istartswith=prefix
+            )[: self.max_results - len(pools)]
+        return pools
+
+
+class StakePoolLeaderboard(APIView):
+    """List the top stake pools by a metric (see `pool_metrics.py`).
+
+    Query params:
+        - n (int): number of pools (default: 10, max: 100).
+        - sort (str): roa (default), active_stake, saturation or stake_share.
+        - currency_format (str): currency format (ADA or LOVELACE).
+    """
+
+    permission_classes = (IsAuthenticated,)
+
+    max_n = 100
+    sort_keys = (
+        pool_metrics.SortKeys.roa,
+        pool_metrics.SortKeys.active_stake,
+        pool_metrics.SortKeys.saturation,
+        pool_metrics.SortKeys.stake_share,
+    )
+
+    def get(self, request, format=None):
+        sort = request.query_params.get(QueryParameters.sort, pool_metrics.SortKeys.roa)
+        try:
+            n = int(request.query_params.get(QueryParameters.top_n, 10))
+        except ValueError:
+            n = 0
+
+        if not 0 < n <= self.max_n or sort not in self.sort_keys:
+            return Response(
+                {
+                    "detail": f"Query param `n` must be between 1 and {self.max_n}, "
+                    f"`sort` one of {', '.join(self.sort_keys)}."
+                },
+                status=status.HTTP_400_BAD_REQUEST,
+            )
+
+        metrics = pool_metrics.pool_metrics()
+        if metrics is None:
+            return Response(
+                {"detail": "Pool metrics are not available yet."},
+                status=status.HTTP_503_SERVICE_UNAVAILABLE,
+            )
+
+        data = metrics.top(n, sort)
+        currency = request.query_params.get(QueryParameters.currency_format)
+        stakes = utils.values_to_ada([pool["active_stake"] for pool in data], currency)
+        for pool, stake in zip(data, stakes):
+            pool["active_stake"] = stake
+
+        return Response(
+            {"epoch": metrics.epoch, "data": data}, status=status.HTTP_200_OK
+        )